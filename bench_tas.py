@@ -0,0 +1,339 @@
+"""
+Microbenchmarks for the controller and engine hot paths.
+
+Runs without the game (the engine benchmarks use an in memory hook).
+
+Usage:
+    python bench_tas.py                     run everything and print the times
+    python bench_tas.py --save base.json    also save the times as a baseline
+    python bench_tas.py --compare base.json compare against a saved baseline
+    python bench_tas.py --quick             skip the 1M frame file benchmarks
+    python bench_tas.py -k file             only run benchmarks matching 'file'
+
+Each benchmark is timed with timeit: the number of loops is calibrated
+to take at least 0.2 seconds and the best of several repeats is kept,
+which is the most stable measure on a busy machine.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import timeit
+
+from ds_tas.basics import a, b, run, wait, sprint, aim_up
+from ds_tas.controller import KeyPress, KeySequence
+from ds_tas.engine.hooks import BaseHook, ProcessMemory
+from ds_tas.engine.scheduler import FrameScheduler
+from ds_tas.engine.simulated import SimulatedHook
+from ds_tas.engine.tas_engine import TAS
+from ds_tas.engine.xinput import compile_inputs, pack_state, unpack_state
+
+benchmarks = []
+
+
+def benchmark(name, repeat=7, min_time=0.2, sizes=(None,)):
+    """
+    Register a benchmark.
+
+    The decorated function does any setup and returns the function to
+    time. With sizes, it is called once for each size.
+    """
+    def register(setup):
+        for size in sizes:
+            full_name = name if size is None else f'{name}[{size}]'
+            benchmarks.append((full_name, setup, size, repeat, min_time))
+        return setup
+    return register
+
+
+def synthetic_sequence(frames, seed=0):
+    """
+    A recording like sequence of random presses held for 1 to 30 frames.
+    """
+    rng = random.Random(seed)
+    pool = [a, b, run, wait, sprint, aim_up, run & a, wait & aim_up]
+    presses = []
+    total = 0
+    while total < frames:
+        press = rng.choice(pool) * min(rng.randint(1, 30), frames - total)
+        presses.append(press)
+        total += press.frames
+    return KeySequence(presses)
+
+
+class NullProcess(ProcessMemory):
+    """
+    Process with no memory, FakeHook never reads or writes it.
+    """
+    def open(self, window_name):
+        pass
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        return False
+
+    def module_base(self, module_name):
+        return 0
+
+    def read(self, address, length):
+        return bytes(length)
+
+    def write(self, address, data):
+        pass
+
+
+class FakeHook(BaseHook):
+    """
+    Hook with no game behind it where every IGT read is a new frame,
+    so the engine never waits and only its own overhead is timed.
+    """
+    WINDOW_NAME = 'Benchmark'
+
+    def __init__(self):
+        self._igt = 0
+        self.last_input = None
+        super().__init__(process=NullProcess())
+
+    def acquire(self):
+        pass
+
+    def release(self):
+        pass
+
+    def igt(self):
+        self._igt += 33
+        return self._igt
+
+    def frame_count(self):
+        return self._igt // 33
+
+    def controller(self, state):
+        pass
+
+    def background_input(self, state):
+        pass
+
+    def disable_mouse(self, state):
+        pass
+
+    def write_packed_input(self, data):
+        self.last_input = data
+
+
+# KeyPress
+@benchmark('keypress_construct')
+def _():
+    return lambda: KeyPress(a=1, l_thumb_y=32767, r_thumb_x=-200)
+
+
+@benchmark('keypress_from_list')
+def _():
+    state = [0] * 16 + [100, -200, 300, -400]
+    return lambda: KeyPress.from_list(state)
+
+
+@benchmark('keypress_and')
+def _():
+    return lambda: run & b & aim_up
+
+
+@benchmark('keypress_mul')
+def _():
+    return lambda: a * 30
+
+
+@benchmark('keypress_eq_hash', sizes=(300,))
+def _(size):
+    first = KeyPress(size, a=1)
+    second = KeyPress(size, a=1)
+    return lambda: first == second and hash(first) == hash(second)
+
+
+# KeySequence
+@benchmark('keysequence_add', sizes=(1000,))
+def _(size):
+    presses = [a, wait, b, run] * (size // 4)
+
+    def build():
+        seq = KeySequence()
+        for press in presses:
+            seq += press
+        return seq.framecount
+    return build
+
+
+@benchmark('keysequence_condense', sizes=(10000,))
+def _(size):
+    states = synthetic_sequence(size).keylist
+    return lambda: KeySequence.from_list(states).condense()
+
+
+@benchmark('keysequence_keylist', sizes=(10000,))
+def _(size):
+    seq = synthetic_sequence(size)
+    return lambda: seq.keylist
+
+
+@benchmark('keysequence_frame_lookup', sizes=(100000,))
+def _(size):
+    seq = synthetic_sequence(size)
+    frames = seq.frames
+    frame = size // 2
+    return lambda: frames[frame]
+
+
+# File round trips
+def _round_trip(size, save, load, suffix):
+    seq = synthetic_sequence(size)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+
+    def round_trip():
+        save(seq, path)
+        return load(path).framecount
+    round_trip.cleanup = lambda: os.remove(path)
+    return round_trip
+
+
+file_sizes = (10000, 100000, 1000000)
+
+
+@benchmark('file_json_round_trip', repeat=3, min_time=0, sizes=file_sizes)
+def _(size):
+    return _round_trip(
+        size, KeySequence.to_file, KeySequence.from_file, '.json'
+    )
+
+
+@benchmark('file_binary_round_trip', repeat=3, min_time=0, sizes=file_sizes)
+def _(size):
+    return _round_trip(
+        size, KeySequence.to_binary_file, KeySequence.from_file, '.dstas'
+    )
+
+
+# Input packing
+@benchmark('pack_state')
+def _():
+    state = (sprint & aim_up).state
+    return lambda: pack_state(state)
+
+
+@benchmark('unpack_state')
+def _():
+    data = pack_state((sprint & aim_up).state)
+    return lambda: unpack_state(data)
+
+
+@benchmark('hook_write_input')
+def _():
+    hook = SimulatedHook(step=0.0)
+    state = list((sprint & aim_up).state)
+    return lambda: hook.write_input(state)
+
+
+@benchmark('hook_read_input')
+def _():
+    hook = SimulatedHook(step=0.0)
+    return hook.read_input
+
+
+# Engine
+@benchmark('compile_inputs', sizes=(10000,))
+def _(size):
+    seq = synthetic_sequence(size)
+    return lambda: compile_inputs(seq)
+
+
+@benchmark('execute_loop', repeat=5, sizes=(10000,))
+def _(size):
+    seq = synthetic_sequence(size)
+    tas = TAS(hook=FakeHook(), scheduler=FrameScheduler(poll_interval=0))
+
+    def execute():
+        tas._execute(frames=tas._packed_frames(seq))
+    return execute
+
+
+def time_benchmark(setup, size, repeat, min_time):
+    """
+    :return: best time per call in seconds
+    """
+    function = setup() if size is None else setup(size)
+    try:
+        timer = timeit.Timer(function)
+        number = 1
+        if min_time:
+            while True:
+                elapsed = timer.timeit(number)
+                if elapsed >= min_time:
+                    break
+                number *= 10 if elapsed < min_time / 10 else 2
+        return min(timer.repeat(repeat, number)) / number
+    finally:
+        cleanup = getattr(function, 'cleanup', None)
+        if cleanup:
+            cleanup()
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3f}{unit}'
+    return f'{seconds / 1e-9:.1f}ns'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results with a saved baseline')
+    parser.add_argument('--quick', action='store_true',
+                        help='skip the 1M frame file benchmarks')
+    parser.add_argument('-k', metavar='NAME', dest='pattern',
+                        help='only run benchmarks with NAME in their name')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as indata:
+            baseline = json.load(indata)['results']
+
+    results = {}
+    print(f'{"benchmark":<40}{"time":>12}{"baseline":>12}{"change":>10}')
+    for name, setup, size, repeat, min_time in benchmarks:
+        if args.pattern and args.pattern not in name:
+            continue
+        if args.quick and size == 1000000:
+            continue
+        seconds = time_benchmark(setup, size, repeat, min_time)
+        results[name] = seconds
+
+        line = f'{name:<40}{format_time(seconds):>12}'
+        if name in baseline:
+            change = (seconds - baseline[name]) / baseline[name] * 100
+            line += f'{format_time(baseline[name]):>12}{change:>+9.1f}%'
+        print(line, flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as outdata:
+            json.dump(
+                {
+                    'python': sys.version,
+                    'platform': platform.platform(),
+                    'results': results,
+                },
+                outdata,
+                indent=2,
+            )
+        print(f'Saved baseline to {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,28 @@
 Launch a Dark Souls TAS Console with helpful commands pre-loaded.
 
 Uses the STDLIB 'code' module to launch the terminal.
+
+The game is hooked the first time the TAS is used, so the console can
+be started before the game. Extension modules are imported when first
+used.
+
+Run with --profile-startup to print the time taken by each stage of
+setting up the console before it opens. The time taken by the imports
+is shown by running with python -X importtime.
 """
-import code
-import pydoc
+import importlib
 import sys
 import textwrap
+import time
 
 from ds_tas import KeySequence, KeyPress, basics
 from ds_tas.engine import TAS
-from ds_tas.scripts import timers
-from ds_tas.scripts.ptde import glitches, menus
 
 __version__ = '3.0.1'
 
+# Time of each stage of starting the console, from the end of the imports
+_startup = [('imports', time.perf_counter())]
+
 # Variable names to skip
 skip_vars = ['sys', 'code', 'copy', 'textwrap',
              'raw_banner', 'banner', 'skip_vars']
@@ -35,7 +44,8 @@ raw_banner = f"""
     
     Recording and Playback:
         Functions:
-            record, playback, save, load
+            record, playback, save, load,
+            start_recording, stop_recording
         Current Sequence:
             recording
     
@@ -66,6 +76,32 @@ raw_banner = f"""
 
 banner = textwrap.dedent(raw_banner).strip()
 
+
+class LazyModule:
+    """
+    Stand in for a module that imports it when it is first used.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        if self._module is None:
+            return f"<module '{self._name}' (not yet imported)>"
+        return repr(self._module)
+
+
 # Define base_locals globally so recording works as intended
 base_locals = {
     key: getattr(basics, key) for key in basics.__all__
@@ -73,13 +109,16 @@ base_locals = {
 
 base_locals['KeySequence'] = KeySequence
 base_locals['KeyPress'] = KeyPress
-base_locals['menus'] = menus
-base_locals['glitches'] = glitches
-base_locals['timers'] = timers
+base_locals['menus'] = LazyModule('ds_tas.scripts.ptde.menus')
+base_locals['glitches'] = LazyModule('ds_tas.scripts.ptde.glitches')
+base_locals['timers'] = LazyModule('ds_tas.scripts.timers')
+# The game is hooked on first use
 base_locals['tas'] = TAS()
 
 base_locals['recording'] = basics.select + basics.right + basics.a
 
+_startup.append(('console locals', time.perf_counter()))
+
 
 class Helper:
     """
@@ -95,13 +134,17 @@ class Helper:
             print(f"{obj}\nType '<name>.execute()' "
                   f"to perform this action in game.")
         else:
+            import pydoc
+            if isinstance(obj, LazyModule):
+                obj = obj._load()
             pydoc.help(obj)
 
     def __repr__(self):
         return "Help Method - use help(item) to get information on the item."
 
 
-def record(start_delay=5, record_time=None, button_wait=True):
+def record(start_delay=5, record_time=None, button_wait=True,
+           stream_to=None):
     """
     Record the input and store a global KeySequence.
 
@@ -111,11 +154,48 @@ def record(start_delay=5, record_time=None, button_wait=True):
     :param record_time: Length of time to record for (in seconds),
                         None will record indefinitely.
     :param button_wait: Wait for a button input before starting recording
+    :param stream_to: File to save the recording to while recording,
+                      it can be loaded with load() even after a crash.
+    """
+    global base_locals
+    base_locals['recording'] = base_locals['tas'].record(
+        start_delay, record_time, button_wait, stream_to=stream_to
+    )
+    print('Recording stored as `recording`')
+
+
+def start_recording(record_time=None):
+    """
+    Start recording the input in the background, the console can still
+    be used while recording.
+
+    Call stop_recording() or press start and select at the same time to
+    stop, then stop_recording() stores the global KeySequence.
+
+    :param record_time: Length of time to record for (in seconds),
+                        None will record until stopped.
+    """
+    global base_locals
+    base_locals['recorder'] = base_locals['tas'].start_recording(record_time)
+    print('Recording started, use stop_recording() to stop.')
+
+
+def stop_recording():
+    """
+    Stop a background recording and store it as a global KeySequence.
     """
     global base_locals
-    base_locals['recording'] = base_locals['tas'].record(start_delay,
-                                                         record_time,
-                                                         button_wait)
+    recorder = base_locals.pop('recorder', None)
+    if recorder is None:
+        print('No recording in progress')
+        return
+    recorder.stop()
+    if recorder.error:
+        print(f'Recording stopped early: {recorder.error}')
+    missed = recorder.missed_frames()
+    if missed:
+        print(f'Missed frames before: {[idx for idx, _ in missed]}')
+    base_locals['recording'] = recorder.to_sequence()
     print('Recording stored as `recording`')
 
 
@@ -130,19 +210,27 @@ def playback(start_delay=None, igt_wait=False):
     base_locals['tas'].run(base_locals['recording'], start_delay, igt_wait)
 
 
-def save(filename):
+def save(filename, binary=False, compression=None):
     """
     Save the current recording to the path given.
 
     :param filename: Recording output path
+    :param binary: Save in the compact binary format instead of JSON
+    :param compression: Compression for the binary format
+                        (None, 'zlib' or 'lzma')
     """
     global base_locals
-    base_locals['recording'].to_file(filename)
+    if binary:
+        base_locals['recording'].to_binary_file(
+            filename, compression=compression
+        )
+    else:
+        base_locals['recording'].to_file(filename)
 
 
 def load(filename):
     """
-    Reload a recording from a given path.
+    Reload a recording from a given path (binary or JSON).
 
     :param filename: path of the keysequence to load.
     """
@@ -150,10 +238,29 @@ def load(filename):
     base_locals['recording'] = KeySequence.from_file(filename)
 
 
-def tas_console():
+def startup_report():
+    """
+    :return: text of the time taken by each stage of starting the console
+    """
+    lines = ['Startup time:']
+    for (_, previous), (stage, end) in zip(_startup, _startup[1:]):
+        lines.append(f'    {stage:<16}{(end - previous) * 1000:8.1f}ms')
+    total = (_startup[-1][1] - _startup[0][1]) * 1000
+    lines.append(f'    {"total":<16}{total:8.1f}ms')
+    return '\n'.join(lines)
+
+
+def tas_console(profile_startup=False):
+    """
+    Launch the interactive console.
+
+    :param profile_startup: print the startup time before launching
+    """
     # Get the basic key commands for the command prompt
 
     base_locals['record'] = record
+    base_locals['start_recording'] = start_recording
+    base_locals['stop_recording'] = stop_recording
     base_locals['playback'] = playback
     base_locals['save'] = save
     base_locals['load'] = load
@@ -165,8 +272,13 @@ def tas_console():
 
     sys.ps1 = 'TAS>>>\t'
     sys.ps2 = '......\t'
+
+    import code
+    _startup.append(('console setup', time.perf_counter()))
+    if profile_startup:
+        print(startup_report())
     code.interact(banner=banner, local=base_locals)
 
 
 if __name__ == '__main__':
-    tas_console()
+    tas_console(profile_startup='--profile-startup' in sys.argv[1:])
@@ -6,7 +6,13 @@ block_cipher = None
 a = Analysis(['darksoulstas.py'],
              pathex=['C:\\Users\\David\\source\\repos\\DarkSouls-TAS'],
              datas=[],
-             hiddenimports=[],
+             hiddenimports=['ds_tas.scripts.timers',
+                            'ds_tas.scripts.ptde.glitches',
+                            'ds_tas.scripts.ptde.menus',
+                            # Backends imported by name (see backends.py)
+                            'ds_tas.engine.win32',
+                            'ds_tas.engine.linux',
+                            'ds_tas.engine.simulated'],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
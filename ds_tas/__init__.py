@@ -1 +1 @@
-from .controller import KeyPress, KeySequence
+from .controller import KeyPress, KeySequence, PackedKeySequence
@@ -170,3 +170,12 @@ def chainroll(rollcount, delay1=9, delay2=19):
         return roll + run * delay1 + roll
     else:
         return roll + run * delay1 + (roll + run * delay2) * (rollcount - 2) + roll
+
+
+# Intern the basic presses so sequences built from them
+# (and recordings of the same buttons) share their states
+for _name in __all__:
+    _value = globals()[_name]
+    if isinstance(_value, KeyPress):
+        _value.intern()
+del _name, _value
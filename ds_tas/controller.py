@@ -6,13 +6,24 @@ necessary for recording and playing back inputs.
 """
 
 import json
-from copy import copy
-from itertools import chain
+import lzma
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import chain, repeat
 
 __all__ = [
     'controller_keys',
     'KeyPress',
     'KeySequence',
+    'PackedKeySequence',
+    'RecordingStream',
+    'RecordingHeader',
+    'read_recording_header',
+    'iter_frames',
     'print_press',
 ]
 
@@ -40,12 +51,31 @@ controller_keys = [
 ]
 
 
+# Button state of a single frame packed as bytes: 14 buttons and 2 triggers
+# as unsigned bytes and the 4 stick axes as signed shorts.
+state_record = struct.Struct('<16B4h')
+
+# Shared single frame KeyPress for each interned button state
+_interned = {}
+
+
+def _button(index):
+    """
+    Read only property for one value of a KeyPress button state
+    """
+    return property(lambda self: self._state[index])
+
+
 class KeyPress:
     """
     Button press for a controller.
 
     (For most operations you should use the aliases from basics.py)
 
+    KeyPress objects are immutable, operators always return new presses.
+    Each press stores its button state as a tuple and as packed bytes,
+    so comparing and hashing presses doesn't depend on the frame count.
+
     Example usage:
         >>> from ds_tas.engine import TAS
         >>> tas = TAS()
@@ -79,6 +109,8 @@ class KeyPress:
     :param r_thumb_x:
     :param r_thumb_y:
     """
+    __slots__ = ('_frames', '_state', '_key', '_hash')
+
     def __init__(
         self,
         frames=1,
@@ -104,51 +136,84 @@ class KeyPress:
         r_thumb_x=0,
         r_thumb_y=0
     ):
-        self.frames = frames
-        self.dpad_up = dpad_up
-        self.dpad_down = dpad_down
-        self.dpad_left = dpad_left
-        self.dpad_right = dpad_right
-        self.start = start
-        self.back = back
-        self.l_thumb = l_thumb
-        self.r_thumb = r_thumb
-        self.l1 = l1
-        self.r1 = r1
-        self.a = a
-        self.b = b
-        self.x = x
-        self.y = y
-        self.l2 = l2
-        self.r2 = r2
-        self.l_thumb_x = l_thumb_x
-        self.l_thumb_y = l_thumb_y
-        self.r_thumb_x = r_thumb_x
-        self.r_thumb_y = r_thumb_y
+        state = (
+            dpad_up, dpad_down, dpad_left, dpad_right, start, back,
+            l_thumb, r_thumb, l1, r1, a, b, x, y, l2, r2,
+            l_thumb_x, l_thumb_y, r_thumb_x, r_thumb_y,
+        )
+        self._set(frames, *_lookup_state(state))
+
+    def _set(self, frames, state, key):
+        self._frames = frames
+        self._state = state
+        self._key = key
+        # Presses with no frames have no inputs so are all equal
+        self._hash = hash((frames, key)) if frames > 0 else 0
+
+    @classmethod
+    def _new(cls, frames, state, key):
+        """
+        Create a press from an already packed state without checking it
+        """
+        press = cls.__new__(cls)
+        press._set(frames, state, key)
+        return press
+
+    frames = property(lambda self: self._frames)
+    dpad_up = _button(0)
+    dpad_down = _button(1)
+    dpad_left = _button(2)
+    dpad_right = _button(3)
+    start = _button(4)
+    back = _button(5)
+    l_thumb = _button(6)
+    r_thumb = _button(7)
+    l1 = _button(8)
+    r1 = _button(9)
+    a = _button(10)
+    b = _button(11)
+    x = _button(12)
+    y = _button(13)
+    l2 = _button(14)
+    r2 = _button(15)
+    l_thumb_x = _button(16)
+    l_thumb_y = _button(17)
+    r_thumb_x = _button(18)
+    r_thumb_y = _button(19)
 
     def __repr__(self):
         repr_mid = ', '.join(
-            f'{key}={getattr(self, key)}'
-            for key in controller_keys
-            if getattr(self, key) != 0
+            f'{key}={value}'
+            for key, value in zip(controller_keys, self._state)
+            if value != 0
         )
         if repr_mid:
             repr_mid = f', {repr_mid}'
 
-        return f'KeyPress(frames={self.frames}{repr_mid})'
+        return f'KeyPress(frames={self._frames}{repr_mid})'
+
+    def __reduce__(self):
+        return KeyPress.from_list, (self._state, self._frames)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __add__(self, other):
         if isinstance(other, KeyPress):
             return KeySequence([self, other])
         elif isinstance(other, KeySequence):
-            return KeySequence([self, *other._sequence])
+            return KeySequence._from_node(_Concat(self, other._root))
+        else:
+            return NotImplemented
 
     def __mul__(self, other):
         if isinstance(other, int):
-            newframes = self.frames * other
-            newpress = copy(self)
-            newpress.frames = newframes
-            return newpress
+            if other == 1:
+                return self
+            return self._new(self._frames * other, self._state, self._key)
         else:
             raise TypeError('Can only multiply keypresses by integers')
 
@@ -169,29 +234,12 @@ class KeyPress:
         :type other: KeyPress
         :return: New Combined KeyPress
         """
-        return KeyPress(
-            frames=max(self.frames, other.frames),
-            dpad_up=max(self.dpad_up, other.dpad_up),
-            dpad_down=max(self.dpad_down, other.dpad_down),
-            dpad_left=max(self.dpad_left, other.dpad_left),
-            dpad_right=max(self.dpad_right, other.dpad_right),
-            start=max(self.start, other.start),
-            back=max(self.back, other.back),
-            l_thumb=max(self.l_thumb, other.l_thumb),
-            r_thumb=max(self.r_thumb, other.r_thumb),
-            l1=max(self.l1, other.l1),
-            r1=max(self.r1, other.r1),
-            a=max(self.a, other.a),
-            b=max(self.b, other.b),
-            x=max(self.x, other.x),
-            y=max(self.y, other.y),
-            l2=max(self.l2, other.l2),
-            r2=max(self.r2, other.r2),
-            l_thumb_x=max(self.l_thumb_x, other.l_thumb_x, key=abs),
-            l_thumb_y=max(self.l_thumb_y, other.l_thumb_y, key=abs),
-            r_thumb_x=max(self.r_thumb_x, other.r_thumb_x, key=abs),
-            r_thumb_y=max(self.r_thumb_y, other.r_thumb_y, key=abs),
+        state = [max(pair) for pair in zip(self._state[:16], other._state[:16])]
+        state.extend(
+            max(pair, key=abs)
+            for pair in zip(self._state[16:], other._state[16:])
         )
+        return KeyPress.from_list(state, max(self._frames, other._frames))
 
     def __len__(self):
         """
@@ -199,49 +247,106 @@ class KeyPress:
 
         :return: frame count
         """
-        return self.frames
+        return self._frames
 
     def __eq__(self, other):
         if isinstance(other, KeyPress):
-            return self.keylist == other.keylist
+            if self._hash != other._hash:
+                return False
+            if self._frames <= 0 and other._frames <= 0:
+                return True
+            return self._frames == other._frames and self._key == other._key
         else:
             return False
 
+    def __hash__(self):
+        return self._hash
+
     @classmethod
-    def from_list(cls, state):
-        key_values = dict(zip(controller_keys, state))
-        return cls(
-            frames=1,
-            **key_values
-        )
+    def from_list(cls, state, frames=1):
+        """
+        Create a KeyPress from a button state
+
+        Interned states (see KeyPress.intern) share a single state
+        and single frame presses of them are the interned press itself.
+
+        :param state: list or tuple of 20 values in controller_keys order
+        :param frames: Number of frames to hold the keypress
+        :return: KeyPress
+        """
+        state = tuple(state)
+        press = _interned.get(state)
+        if press is not None:
+            if frames == 1:
+                return press
+            return cls._new(frames, press._state, press._key)
+        return cls._new(frames, *_lookup_state(state))
+
+    def intern(self):
+        """
+        Intern the button state of this press.
+
+        Presses created later with the same buttons share the state and
+        single frame presses of it are this press (with 1 frame).
+
+        :return: the interned single frame press
+        """
+        press = _interned.get(self._state)
+        if press is None:
+            if self._frames == 1:
+                press = self
+            else:
+                press = self._new(1, self._state, self._key)
+            _interned[self._state] = press
+        return press
+
+    def with_frames(self, frames):
+        """
+        Get a press of the same buttons held for a number of frames
+
+        :param frames: Number of frames to hold the keypress
+        :return: KeyPress (this press if the frames are unchanged)
+        """
+        if frames == self._frames:
+            return self
+        return self._new(frames, self._state, self._key)
+
+    @property
+    def key(self):
+        """
+        The button state of a single frame packed as bytes
+        (see state_record), equal for presses of the same buttons.
+        """
+        return self._key
+
+    @property
+    def state(self):
+        """
+        The button state of a single frame of this press.
+
+        :return: tuple of the 20 values in controller_keys order
+        """
+        return self._state
+
+    def iter_runs(self):
+        """
+        Iterate over the runs in the press (there is only one).
+
+        :return: iterator of (frames, state) tuples
+        """
+        return iter([(self._frames, self._state)])
+
+    def iter_frames(self):
+        """
+        Lazily iterate over the button state for each frame.
+
+        :return: iterator of state tuples
+        """
+        return repeat(self._state, self._frames)
 
     @property
     def keylist(self):
-        return [
-            [
-                self.dpad_up,
-                self.dpad_down,
-                self.dpad_left,
-                self.dpad_right,
-                self.start,
-                self.back,
-                self.l_thumb,
-                self.r_thumb,
-                self.l1,
-                self.r1,
-                self.a,
-                self.b,
-                self.x,
-                self.y,
-                self.l2,
-                self.r2,
-                self.l_thumb_x,
-                self.l_thumb_y,
-                self.r_thumb_x,
-                self.r_thumb_y,
-            ]
-            for _ in range(self.frames)
-        ]
+        return [list(self._state) for _ in range(self._frames)]
 
     @property
     def button_pressed(self):
@@ -250,18 +355,226 @@ class KeyPress:
 
         :return: True/False
         """
-        return bool(sum([
-            self.start,
-            self.back,
-            self.l_thumb,
-            self.r_thumb,
-            self.l1,
-            self.r1,
-            self.a,
-            self.b,
-            self.x,
-            self.y
-        ]))
+        return any(self._state[4:14])
+
+
+def _lookup_state(state):
+    """
+    Get the shared state and packed key for a button state
+
+    :param state: tuple of 20 values
+    :return: (state, key)
+    """
+    press = _interned.get(state)
+    if press is not None:
+        return press._state, press._key
+    try:
+        key = state_record.pack(*state)
+    except struct.error:
+        raise ValueError(f'Invalid Input: {list(state)}')
+    # Store the values as they were packed so equal keys have equal states
+    return state_record.unpack(key), key
+
+
+class _Runs:
+    """
+    Leaf of a KeySequence tree holding KeyPresses in order.
+
+    condensed is True if no two adjacent presses share a button state.
+    """
+    __slots__ = ('presses', 'framecount', 'condensed')
+
+    def __init__(self, presses, condensed=False):
+        self.presses = presses
+        self.framecount = sum(press.frames for press in presses)
+        self.condensed = condensed
+
+
+class _Concat:
+    """
+    Node of a KeySequence tree joining two parts without copying them.
+    """
+    __slots__ = ('left', 'right', 'framecount')
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.framecount = _node_frames(left) + _node_frames(right)
+
+
+class _Repeat:
+    """
+    Node of a KeySequence tree repeating a part a number of times.
+    """
+    __slots__ = ('part', 'count', 'framecount')
+
+    def __init__(self, part, count):
+        self.part = part
+        self.count = count
+        self.framecount = _node_frames(part) * count
+
+
+_empty = _Runs((), condensed=True)
+
+
+def _node_frames(node):
+    if isinstance(node, KeyPress):
+        return node.frames
+    return node.framecount
+
+
+def _iter_presses(node):
+    """
+    Iterate over the KeyPresses of a KeySequence tree in order.
+
+    Uses an explicit stack so sequences built by adding to them many
+    times don't hit the recursion limit.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, KeyPress):
+            yield node
+        elif isinstance(node, _Runs):
+            yield from node.presses
+        elif isinstance(node, _Concat):
+            stack.append(node.right)
+            stack.append(node.left)
+        elif node.count > 0:
+            if node.count > 1:
+                stack.append(_Repeat(node.part, node.count - 1))
+            stack.append(node.part)
+
+
+def _condense(presses):
+    """
+    Merge adjacent presses of the same buttons and skip empty presses.
+
+    :param presses: iterable of KeyPress
+    :return: generator of KeyPress
+    """
+    current = None
+    frames = 0
+    for press in presses:
+        if press.frames <= 0:
+            continue
+        elif current is None:
+            current = press
+            frames = press.frames
+        elif press.key == current.key:
+            frames += press.frames
+        else:
+            yield current.with_frames(frames)
+            current = press
+            frames = press.frames
+    if current is not None:
+        yield current.with_frames(frames)
+
+
+class _FrameIndex:
+    """
+    Condensed presses of a KeySequence with the frame each one ends on.
+
+    ends[i] is the total frames of presses[0] to presses[i], so the
+    press on a frame is found with a binary search.
+    """
+    __slots__ = ('presses', 'ends')
+
+    def __init__(self, presses=()):
+        self.presses = []
+        self.ends = array('Q')
+        for press in presses:
+            self.add(press)
+
+    def add(self, press):
+        """
+        Add a press to the end, merging it with the last press
+        if the buttons are the same.
+        """
+        frames = press.frames
+        if frames <= 0:
+            return
+        presses = self.presses
+        ends = self.ends
+        if presses and presses[-1].key == press.key:
+            presses[-1] = presses[-1].with_frames(presses[-1].frames + frames)
+            ends[-1] += frames
+        else:
+            presses.append(press)
+            ends.append(ends[-1] + frames if ends else frames)
+
+    @property
+    def framecount(self):
+        return self.ends[-1] if self.ends else 0
+
+    def locate(self, frame):
+        """
+        Find the press that is held on a frame.
+
+        :param frame: frame number from 0
+        :return: (press index, frames into the press)
+        """
+        idx = bisect_right(self.ends, frame)
+        if idx == len(self.presses):
+            raise IndexError('KeySequence frame out of range')
+        start = self.ends[idx - 1] if idx else 0
+        return idx, frame - start
+
+    def slice(self, start, stop):
+        """
+        Get the presses from frame start up to (not including) frame stop.
+
+        :return: list of KeyPress
+        """
+        if start >= stop:
+            return []
+        first, first_offset = self.locate(start)
+        last, last_offset = self.locate(stop - 1)
+        presses = self.presses
+        if first == last:
+            return [presses[first].with_frames(stop - start)]
+        out = [presses[first].with_frames(
+            presses[first].frames - first_offset
+        )]
+        out.extend(presses[first + 1:last])
+        out.append(presses[last].with_frames(last_offset + 1))
+        return out
+
+
+class FrameView:
+    """
+    Frame indexed view of a KeySequence (seq.frames).
+
+    seq.frames[n] is the input held on frame n as a single frame
+    KeyPress and seq.frames[start:stop] is a new KeySequence of those
+    frames. Lookups take O(log n) in the number of presses and slices
+    don't expand the frames.
+    """
+    __slots__ = ('sequence',)
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f'<FrameView: {len(self)} frames>'
+
+    def __len__(self):
+        return self.sequence.framecount
+
+    def __getitem__(self, item):
+        index = self.sequence._frame_index()
+        framecount = index.framecount
+        if isinstance(item, slice):
+            start, stop, step = item.indices(framecount)
+            if step != 1:
+                raise ValueError('Frame slices do not support steps')
+            return KeySequence(index.slice(start, stop))
+        if item < 0:
+            item += framecount
+        if not 0 <= item < framecount:
+            raise IndexError('KeySequence frame out of range')
+        idx, _ = index.locate(item)
+        return index.presses[idx].with_frames(1)
 
 
 class KeySequence:
@@ -270,42 +583,112 @@ class KeySequence:
 
     Includes methods for addition and multiplication.
 
+    Sequences are built lazily: '+' and '*' make new nodes that refer to
+    their operands instead of copying them, so building a sequence step
+    by step isn't quadratic. The presses are only flattened (and
+    identical neighbouring presses combined) when they are needed,
+    eg: when the sequence is run, saved or indexed.
+
+    seq.frames gives frame based indexing and slicing, see FrameView.
+    The index of frames is built when first used and kept up to date
+    when presses are appended.
+
     Use tas.run() to perform the sequence in game.
 
     :param sequence: list of KeyPress or KeySequence objects
     """
     def __init__(self, sequence=None):
-        sequence = sequence if sequence else []
-        seq = []
-        for item in sequence:
+        self._index = None
+        root = None
+        presses = []
+        for item in sequence if sequence else []:
             if isinstance(item, KeyPress):
-                seq.append(copy(item))
-            elif isinstance(item, KeySequence):
-                seq.extend(item._sequence)
-            else:
-                raise TypeError(
-                    f'Expected KeyPress or KeySequence, found {type(item)}'
-                )
-        self._sequence = seq
-        self.condense()
+                presses.append(item)
+                continue
+            part = self._node(item)
+            if presses:
+                root = self._join(root, _Runs(tuple(presses)))
+                presses = []
+            root = self._join(root, part)
+        if presses:
+            root = self._join(root, _Runs(tuple(presses)))
+        self._root = _empty if root is None else root
+
+    @staticmethod
+    def _node(item):
+        """
+        Get the tree node for inputs added to a sequence.
+
+        :param item: KeyPress, KeySequence or PackedKeySequence
+        :return: node
+        """
+        if isinstance(item, KeyPress):
+            return item
+        elif isinstance(item, KeySequence):
+            return item._root
+        elif isinstance(item, PackedKeySequence):
+            return _Runs(tuple(item), condensed=True)
+        raise TypeError(
+            f'Expected KeyPress, KeySequence or PackedKeySequence, '
+            f'found {type(item)}'
+        )
+
+    @staticmethod
+    def _join(left, right):
+        if left is None:
+            return right
+        return _Concat(left, right)
+
+    @classmethod
+    def _from_node(cls, node):
+        instance = cls.__new__(cls)
+        instance._root = node
+        instance._index = None
+        return instance
+
+    def _frame_index(self):
+        """
+        Get the frame index of the sequence, flattening it the first time.
+
+        :return: _FrameIndex
+        """
+        if self._index is None:
+            self._index = _FrameIndex(_condense(_iter_presses(self._root)))
+        return self._index
+
+    def _runs(self):
+        """
+        Get the condensed presses of the sequence (do not modify).
+
+        :return: list of KeyPress
+        """
+        return self._frame_index().presses
 
     def __repr__(self):
-        seq = ', '.join(repr(item) for item in self._sequence)
+        seq = ', '.join(repr(item) for item in self._runs())
         return f'KeySequence([{seq}])'
 
+    def __reduce__(self):
+        return KeySequence, (list(self._runs()),)
+
+    def __copy__(self):
+        return self._from_node(self._root)
+
+    def __deepcopy__(self, memo):
+        # The tree is never modified so can be shared
+        return self._from_node(self._root)
+
     def __radd__(self, other):
         if isinstance(other, KeySequence):
-            return KeySequence([*other._sequence, *self._sequence])
+            return self._from_node(_Concat(other._root, self._root))
         elif isinstance(other, KeyPress):
-            return KeySequence([KeyPress,  *self._sequence])
+            return self._from_node(_Concat(other, self._root))
         else:
             return NotImplemented
 
     def __add__(self, other):
-        if isinstance(other, KeySequence):
-            return KeySequence([*self._sequence, *other._sequence])
-        elif isinstance(other, KeyPress):
-            return KeySequence([*self._sequence, other])
+        if isinstance(other, (KeyPress, KeySequence, PackedKeySequence)):
+            return self._from_node(_Concat(self._root, self._node(other)))
         else:
             return NotImplemented
 
@@ -315,7 +698,7 @@ class KeySequence:
 
         :return: Number of steps in the keysequence
         """
-        return len(self._sequence)
+        return len(self._runs())
 
     def __mul__(self, other):
         """
@@ -325,7 +708,11 @@ class KeySequence:
         :return: new sequence.
         """
         if isinstance(other, int):
-            return KeySequence(self._sequence * other)
+            if other <= 0:
+                return KeySequence()
+            elif other == 1:
+                return self._from_node(self._root)
+            return self._from_node(_Repeat(self._root, other))
         else:
             return NotImplemented
 
@@ -333,28 +720,104 @@ class KeySequence:
         return self.__mul__(other)
 
     def __getitem__(self, item):
-        value = self._sequence[item]
+        value = self._runs()[item]
         if isinstance(value, list):
             return KeySequence(value)
         else:
             return value
 
     def __setitem__(self, key, value):
-        self._sequence[key] = value
+        presses = list(self._runs())
+        presses[key] = value
+        self._root = _Runs(tuple(presses))
+        self._index = None
 
     @property
     def framecount(self):
-        return sum(press.frames for press in self._sequence)
+        return _node_frames(self._root)
+
+    @property
+    def frames(self):
+        """
+        Frame indexed view of the sequence
+
+        eg: seq.frames[51234] is the input on frame 51234 and
+        seq.frames[1000:2000] is a new sequence of frames 1000 to 1999.
+
+        :return: FrameView
+        """
+        return FrameView(self)
+
+    def locate(self, frame):
+        """
+        Find the press that is held on a frame.
+
+        :param frame: frame number from 0
+        :return: (index of the press, frames into the press)
+        """
+        return self._frame_index().locate(frame)
 
     @property
     def keylist(self):
-        return list(chain.from_iterable(item.keylist for item in self._sequence))
+        return [list(state) for state in self.iter_frames()]
+
+    def iter_runs(self):
+        """
+        Iterate over the runs in the sequence.
+
+        The presses are combined as they are read so the sequence
+        isn't flattened in advance.
+
+        :return: generator of (frames, state) tuples
+        """
+        if self._index is not None:
+            presses = iter(self._index.presses)
+        elif isinstance(self._root, _Runs) and self._root.condensed:
+            presses = self._root.presses
+        else:
+            presses = _condense(_iter_presses(self._root))
+        for press in presses:
+            yield press.frames, press.state
+
+    def iter_frames(self):
+        """
+        Lazily iterate over the button state for each frame.
+
+        Each state is only built once per KeyPress so memory use
+        does not depend on the length of the sequence.
+
+        :return: generator of state tuples
+        """
+        for frames, state in self.iter_runs():
+            yield from repeat(state, frames)
 
     def append(self, keypress):
-        self._sequence.append(keypress)
+        """
+        Add a KeyPress, KeySequence or PackedKeySequence to the end of
+        the sequence.
+
+        :param keypress: inputs to add
+        """
+        node = self._node(keypress)
+        if self._index is not None:
+            if isinstance(node, KeyPress):
+                self._index.add(node)
+            else:
+                for press in _condense(_iter_presses(node)):
+                    self._index.add(press)
+        self._root = _Concat(self._root, node)
+
+    def pack(self):
+        """
+        Get a run length encoded copy of this sequence in packed storage.
+
+        :return: PackedKeySequence of the same inputs
+        """
+        return PackedKeySequence(self)
 
     def extend(self, keypresses):
-        self._sequence.extend(keypresses)
+        for keypress in keypresses:
+            self.append(keypress)
 
     def condense(self):
         """
@@ -362,30 +825,9 @@ class KeySequence:
         combining identical button presses into single instances with multiple
         frames.
 
-        Do nothing if the sequence is shorter than 2 KeyPresses.
-        """
-        if len(self._sequence) > 1:
-            newseq = []
-            current_press = copy(self._sequence[0])
-            for press in self._sequence[1:]:
-                if not press.keylist:
-                    # Skip empty presses
-                    continue
-                elif not current_press.keylist:
-                    # If the original press is empty
-                    # load the next press
-                    current_press = copy(press)
-                    continue
-                elif press.keylist[0] == current_press.keylist[0]:
-                    # Only care if the keypress uses the same keys
-                    current_press.frames += press.frames
-                else:
-                    # If the presses are different append to our new
-                    # sequence and update the current press
-                    newseq.append(current_press)
-                    current_press = copy(press)
-            newseq.append(copy(current_press))
-            self._sequence = newseq
+        This happens automatically when the presses are needed.
+        """
+        self._frame_index()
 
     def to_string(self):
         """
@@ -399,16 +841,46 @@ class KeySequence:
         with open(keylist_file, 'w') as outdata:
             outdata.write(self.to_string())
 
+    def to_binary_file(self, recording_file, framerate=30, compression=None):
+        """
+        Save the sequence in the compact binary recording format
+
+        :param recording_file: output path
+        :param framerate: framerate the sequence was recorded or written for
+        :param compression: None, 'zlib' or 'lzma'
+        """
+        self.pack().to_binary_file(recording_file, framerate, compression)
+
     @classmethod
     def from_string(cls, keylist_string):
         return cls.from_list(json.loads(keylist_string))
 
     @classmethod
     def from_file(cls, keylist_file):
+        """
+        Load a sequence from a binary recording or a JSON keylist file.
+
+        :param keylist_file: path to the recording
+        :return: KeySequence
+        """
+        if _is_binary_recording(keylist_file):
+            return cls.from_binary_file(keylist_file)
         with open(keylist_file) as indata:
             result = cls.from_list(json.load(indata))
         return result
 
+    @classmethod
+    def from_binary_file(cls, recording_file):
+        """
+        Load a sequence from a binary recording file
+
+        One KeyPress is created per run of identical frames.
+
+        :param recording_file: path to the recording
+        :return: KeySequence
+        """
+        return PackedKeySequence.from_binary_file(recording_file).to_sequence()
+
     @classmethod
     def from_list(cls, states):
         """
@@ -420,13 +892,605 @@ class KeySequence:
         return instance
 
 
+# One record per run of identical frames:
+# frame count, 14 buttons and 2 triggers as unsigned bytes
+# and the 4 stick axes as signed shorts.
+run_record = struct.Struct('<I16B4h')
+
+# Binary recording format:
+# header - magic, format version, compression, framerate, run count,
+#          frame count
+# body - run_record entries, optionally compressed as a whole.
+#
+# Streamed recordings (see RecordingStream) use format version 2:
+# the body is a series of chunks that are each written and flushed in
+# one go, so a recording cut off part way through a chunk can still be
+# loaded up to the last complete chunk.
+# chunk - stream_chunk header (run count, frame count, crc32 of the runs)
+#         followed by the uncompressed run_record entries.
+recording_magic = b'DSTAS'
+recording_version = 1
+stream_version = 2
+recording_header = struct.Struct('<5sBBHII')
+stream_chunk = struct.Struct('<III')
+recording_compression = {
+    None: 0,
+    'zlib': 1,
+    'lzma': 2,
+}
+
+RecordingHeader = namedtuple(
+    'RecordingHeader', 'version compression framerate runs frames'
+)
+
+
+def _parse_header(data):
+    """
+    Read and check the header of a binary recording.
+
+    :param data: recording bytes (at least the length of the header)
+    :return: RecordingHeader
+    """
+    if len(data) < recording_header.size:
+        raise ValueError('Data is too short to be a binary recording')
+    magic, version, compression, framerate, runs, frames = \
+        recording_header.unpack_from(data)
+    if magic != recording_magic:
+        raise ValueError('Data is not a binary recording')
+    if version > stream_version:
+        raise ValueError(
+            f'Recording format version {version} is not supported '
+            f'(maximum version {stream_version})'
+        )
+    compression_names = {v: k for k, v in recording_compression.items()}
+    try:
+        compression = compression_names[compression]
+    except KeyError:
+        raise ValueError(f'Unknown recording compression type {compression}')
+    return RecordingHeader(version, compression, framerate, runs, frames)
+
+
+def read_recording_header(recording_file):
+    """
+    Get the metadata from the header of a binary recording file.
+
+    :param recording_file: path to the recording
+    :return: RecordingHeader(version, compression, framerate, runs, frames)
+    """
+    with open(recording_file, 'rb') as indata:
+        return _parse_header(indata.read(recording_header.size))
+
+
+def _is_binary_recording(recording_file):
+    with open(recording_file, 'rb') as indata:
+        return indata.read(len(recording_magic)) == recording_magic
+
+
+class PackedKeySequence:
+    """
+    A KeySequence stored as run length encoded records in a single bytearray.
+
+    Each run of identical frames takes up one fixed width record
+    (see run_record) instead of a KeyPress object, which makes this
+    the better choice for long recordings.
+
+    Supports the same '+', '*', indexing and framecount operations
+    as KeySequence. Indexing returns new KeyPress instances.
+
+    :param sequence: list of KeyPress, KeySequence or PackedKeySequence objects
+    """
+    def __init__(self, sequence=None):
+        self._runs = bytearray()
+        self._framecount = 0
+        if sequence:
+            self.extend(sequence)
+
+    def __repr__(self):
+        seq = ', '.join(repr(item) for item in self)
+        return f'PackedKeySequence([{seq}])'
+
+    def __len__(self):
+        """
+        Return the number of runs in the sequence
+
+        :return: Number of steps in the sequence
+        """
+        return len(self._runs) // run_record.size
+
+    def __iter__(self):
+        for frames, state in self.iter_runs():
+            yield KeyPress.from_list(state, frames)
+
+    def __eq__(self, other):
+        if isinstance(other, PackedKeySequence):
+            return self._runs == other._runs
+        else:
+            return NotImplemented
+
+    def __add__(self, other):
+        if isinstance(other, (KeyPress, KeySequence, PackedKeySequence)):
+            newseq = self.copy()
+            newseq.append(other)
+            return newseq
+        else:
+            return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, (KeyPress, KeySequence)):
+            newseq = PackedKeySequence([other])
+            newseq.append(self)
+            return newseq
+        else:
+            return NotImplemented
+
+    def __mul__(self, other):
+        """
+        Integer Multiplication of a sequence should repeat the sequence
+
+        :param other: Number of times to perform sequence
+        :return: new sequence.
+        """
+        if isinstance(other, int):
+            newseq = PackedKeySequence()
+            for _ in range(other):
+                newseq.append(self)
+            return newseq
+        else:
+            return NotImplemented
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            newseq = PackedKeySequence()
+            size = run_record.size
+            for idx in range(len(self))[item]:
+                frames, *state = run_record.unpack_from(self._runs, idx * size)
+                newseq._append_run(frames, state)
+            return newseq
+        else:
+            frames, *state = run_record.unpack_from(
+                self._runs, self._offset(item)
+            )
+            return KeyPress.from_list(state, frames)
+
+    def __setitem__(self, key, value):
+        offset = self._offset(key)
+        self._framecount -= run_record.unpack_from(self._runs, offset)[0]
+        run_record.pack_into(self._runs, offset, value.frames, *value.state)
+        self._framecount += value.frames
+
+    def _offset(self, index):
+        """
+        Convert a run index into a byte offset in the run data
+        """
+        runcount = len(self)
+        if index < 0:
+            index += runcount
+        if not 0 <= index < runcount:
+            raise IndexError('PackedKeySequence index out of range')
+        return index * run_record.size
+
+    def _append_run(self, frames, state):
+        """
+        Add a run of frames to the end of the sequence, merging it into
+        the last run if the button state is identical.
+        """
+        if frames <= 0:
+            return
+        state = tuple(state)
+        if self._runs:
+            offset = len(self._runs) - run_record.size
+            last_frames, *last_state = run_record.unpack_from(
+                self._runs, offset
+            )
+            if tuple(last_state) == state:
+                run_record.pack_into(
+                    self._runs, offset, last_frames + frames, *state
+                )
+                self._framecount += frames
+                return
+        self._runs += run_record.pack(frames, *state)
+        self._framecount += frames
+
+    @property
+    def framecount(self):
+        return self._framecount
+
+    @property
+    def keylist(self):
+        return [
+            list(state)
+            for frames, state in self.iter_runs()
+            for _ in range(frames)
+        ]
+
+    def iter_runs(self):
+        """
+        Iterate over the runs in the sequence without creating KeyPresses.
+
+        :return: generator of (frames, state) tuples
+        """
+        for frames, *state in run_record.iter_unpack(self._runs):
+            yield frames, tuple(state)
+
+    def iter_frames(self):
+        """
+        Lazily iterate over the button state for each frame.
+
+        :return: generator of state tuples
+        """
+        for frames, state in self.iter_runs():
+            yield from repeat(state, frames)
+
+    def copy(self):
+        newseq = PackedKeySequence()
+        newseq._runs = bytearray(self._runs)
+        newseq._framecount = self._framecount
+        return newseq
+
+    def append(self, item):
+        """
+        Add a KeyPress, KeySequence or PackedKeySequence to the end
+        of the sequence.
+
+        :param item: inputs to add
+        """
+        if isinstance(item, KeyPress):
+            self._append_run(item.frames, item.state)
+        elif isinstance(item, PackedKeySequence):
+            if not item._runs:
+                return
+            # Merge the first run and copy the rest directly
+            first_frames, *first_state = run_record.unpack_from(item._runs)
+            self._append_run(first_frames, first_state)
+            self._runs += item._runs[run_record.size:]
+            self._framecount += item._framecount - first_frames
+        elif isinstance(item, KeySequence):
+            for frames, state in item.iter_runs():
+                self._append_run(frames, state)
+        else:
+            raise TypeError(
+                f'Expected KeyPress or KeySequence, found {type(item)}'
+            )
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def to_sequence(self):
+        """
+        Convert back to a standard KeySequence of KeyPress objects.
+
+        :return: KeySequence of the same inputs
+        """
+        return KeySequence(list(self))
+
+    def to_string(self):
+        """
+        Dump list data to string
+
+        :return: list of keypress commands as a string
+        """
+        return json.dumps(self.keylist)
+
+    def to_file(self, keylist_file):
+        with open(keylist_file, 'w') as outdata:
+            outdata.write(self.to_string())
+
+    def to_bytes(self, framerate=30, compression=None):
+        """
+        Dump the sequence to the binary recording format
+
+        :param framerate: framerate the sequence was recorded or written for
+        :param compression: None, 'zlib' or 'lzma'
+        :return: recording as bytes
+        """
+        try:
+            compression_id = recording_compression[compression]
+        except KeyError:
+            raise ValueError(
+                f'Unknown compression {compression!r}, expected one of '
+                f'{list(recording_compression)}'
+            )
+        header = recording_header.pack(
+            recording_magic,
+            recording_version,
+            compression_id,
+            framerate,
+            len(self),
+            self._framecount,
+        )
+        body = bytes(self._runs)
+        if compression == 'zlib':
+            body = zlib.compress(body)
+        elif compression == 'lzma':
+            body = lzma.compress(body)
+        return header + body
+
+    def to_binary_file(self, recording_file, framerate=30, compression=None):
+        """
+        Save the sequence in the binary recording format
+
+        :param recording_file: output path
+        :param framerate: framerate the sequence was recorded or written for
+        :param compression: None, 'zlib' or 'lzma'
+        """
+        with open(recording_file, 'wb') as outdata:
+            outdata.write(self.to_bytes(framerate, compression))
+
+    @classmethod
+    def from_string(cls, keylist_string):
+        return cls.from_list(json.loads(keylist_string))
+
+    @classmethod
+    def from_file(cls, keylist_file):
+        """
+        Load a sequence from a binary recording or a JSON keylist file.
+
+        :param keylist_file: path to the recording
+        :return: PackedKeySequence
+        """
+        if _is_binary_recording(keylist_file):
+            return cls.from_binary_file(keylist_file)
+        with open(keylist_file) as indata:
+            result = cls.from_list(json.load(indata))
+        return result
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a sequence from the binary recording format
+
+        The run records are used directly as the storage of the new
+        sequence, no KeyPress objects are created.
+
+        :param data: recording bytes
+        :return: PackedKeySequence
+        """
+        header = _parse_header(data)
+        if header.version == stream_version:
+            return cls._from_stream(data)
+        body = data[recording_header.size:]
+        if header.compression == 'zlib':
+            body = zlib.decompress(body)
+        elif header.compression == 'lzma':
+            body = lzma.decompress(body)
+
+        if len(body) != header.runs * run_record.size:
+            raise ValueError(
+                f'Recording is truncated or corrupt: expected '
+                f'{header.runs * run_record.size} bytes of run data, '
+                f'found {len(body)}'
+            )
+        instance = cls()
+        instance._runs = bytearray(body)
+        instance._framecount = sum(
+            run[0] for run in run_record.iter_unpack(instance._runs)
+        )
+        if instance._framecount != header.frames:
+            raise ValueError(
+                f'Recording is corrupt: expected {header.frames} frames, '
+                f'found {instance._framecount}'
+            )
+        return instance
+
+    @classmethod
+    def _from_stream(cls, data):
+        """
+        Load the complete chunks of a streamed recording.
+
+        Reading stops at the first incomplete or damaged chunk, so a
+        recording that is still being written or was cut off by a crash
+        loads up to its last complete chunk.
+
+        :param data: streamed recording bytes
+        :return: PackedKeySequence
+        """
+        instance = cls()
+        offset = recording_header.size
+        while offset + stream_chunk.size <= len(data):
+            runs, frames, checksum = stream_chunk.unpack_from(data, offset)
+            start = offset + stream_chunk.size
+            end = start + runs * run_record.size
+            if end > len(data):
+                break
+            chunk = data[start:end]
+            if zlib.crc32(chunk) != checksum:
+                break
+            part = cls()
+            part._runs = bytearray(chunk)
+            part._framecount = sum(
+                run[0] for run in run_record.iter_unpack(chunk)
+            )
+            if part._framecount != frames:
+                break
+            instance.append(part)
+            offset = end
+        return instance
+
+    @classmethod
+    def from_binary_file(cls, recording_file):
+        """
+        Load a sequence from a binary recording file
+
+        Streamed recordings can be loaded while they are being written.
+
+        :param recording_file: path to the recording
+        :return: PackedKeySequence
+        """
+        with open(recording_file, 'rb') as indata:
+            return cls.from_bytes(indata.read())
+
+    @classmethod
+    def from_list(cls, states):
+        """
+        Return the packed sequence from a list of lists of press values
+        :param states:
+        :return:
+        """
+        instance = cls()
+        for state in states:
+            instance._append_run(1, state)
+        return instance
+
+
+class RecordingStream:
+    """
+    Write a recording to disk frame by frame as it is made.
+
+    Frames are run length encoded as they arrive - a new record is only
+    made when the controller state changes. Records are written to the
+    file in chunks, each flushed to disk as soon as it is written.
+    A chunk is written when it has chunk_runs records or when
+    flush_frames frames have passed since the last chunk, so a crash
+    loses at most the last few seconds.
+
+    The file can be loaded with KeySequence.from_file, including while
+    it is still being written or after a crash.
+
+        >>> with RecordingStream('practice.dstas') as stream:
+        ...     stream.append(state)
+
+    :param recording_file: output path
+    :param framerate: framerate the sequence was recorded at
+    :param chunk_runs: most run records to write in each chunk
+    :param flush_frames: most frames to keep in memory before writing
+    """
+    def __init__(self, recording_file, framerate=30, chunk_runs=256,
+                 flush_frames=300):
+        self.recording_file = recording_file
+        self.framerate = framerate
+        self.chunk_runs = chunk_runs
+        self.flush_frames = flush_frames
+
+        self.runs = 0
+        self.frames = 0
+        self._pending = bytearray()
+        self._pending_runs = 0
+        self._pending_frames = 0
+        self._state = None
+        self._state_frames = 0
+
+        self._file = open(recording_file, 'wb')
+        self._write_header()
+
+    def __repr__(self):
+        return (f'<RecordingStream: {self.recording_file}, '
+                f'{self.frames + self._pending_frames + self._state_frames} '
+                f'frames>')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(recording_header.pack(
+            recording_magic,
+            stream_version,
+            recording_compression[None],
+            self.framerate,
+            self.runs,
+            self.frames,
+        ))
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, state, frames=1):
+        """
+        Add frames of a controller state to the recording
+
+        :param state: list or tuple of 20 integers
+        :param frames: number of frames the state was held for
+        """
+        state = tuple(state)
+        if state == self._state:
+            self._state_frames += frames
+        else:
+            if self._state_frames:
+                self._add_run()
+            self._state = state
+            self._state_frames = frames
+        if self._pending_frames + self._state_frames >= self.flush_frames:
+            self.flush()
+
+    def _add_run(self):
+        self._pending += run_record.pack(self._state_frames, *self._state)
+        self._pending_runs += 1
+        self._pending_frames += self._state_frames
+        self._state_frames = 0
+        if self._pending_runs >= self.chunk_runs:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._pending_runs:
+            return
+        chunk = bytes(self._pending)
+        self._file.write(stream_chunk.pack(
+            self._pending_runs, self._pending_frames, zlib.crc32(chunk)
+        ))
+        self._file.write(chunk)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self.runs += self._pending_runs
+        self.frames += self._pending_frames
+        self._pending = bytearray()
+        self._pending_runs = 0
+        self._pending_frames = 0
+
+    def flush(self):
+        """
+        Write all frames added so far to disk.
+
+        The current run is written as it is and continued in the next
+        chunk if the state doesn't change (loading merges the runs).
+        """
+        if self._state_frames:
+            self._add_run()
+        self._write_chunk()
+
+    def close(self):
+        """
+        Write the remaining frames, update the header totals
+        and close the file.
+        """
+        if self.closed:
+            return
+        self.flush()
+        self._write_header()
+        self._file.close()
+
+
+def iter_frames(source):
+    """
+    Get a lazy iterator over the per frame button states of a source.
+
+    The source can be a KeyPress, KeySequence or PackedKeySequence
+    or any iterable (including generators) of lists of 20 integers.
+
+    :param source: inputs to iterate over
+    :return: iterator of per frame states
+    """
+    if isinstance(source, (KeyPress, KeySequence, PackedKeySequence)):
+        return source.iter_frames()
+    else:
+        return iter(source)
+
+
 def print_press(keylist, print_wait=False):
     """
     Method to print keypresses as KeyPress given individual list inputs.
 
-    :param keylist: List of key values
+    :param keylist: List or tuple of key values
     :param print_wait: Print 'wait' values
     """
-    wait = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    if print_wait or keylist != wait:
+    if print_wait or any(keylist):
         print(KeyPress.from_list(keylist))
@@ -0,0 +1,104 @@
+"""
+asyncio version of the TAS engine.
+
+AsyncTAS works like TAS but run and record are coroutines that await
+each frame tick instead of blocking, so other tasks can run on the same
+event loop, eg: sampling the game state while a sequence plays.
+
+    >>> import asyncio
+    >>> from ds_tas.engine.async_engine import AsyncTAS
+    >>> tas = AsyncTAS()
+    >>> async def telemetry():
+    ...     async for state in tas.watch('igt', 'frame_count', interval=0.5):
+    ...         print(state)
+    >>> async def main():
+    ...     sampler = asyncio.ensure_future(telemetry())
+    ...     await tas.run(sequence, display=False)
+    ...     sampler.cancel()
+    >>> asyncio.get_event_loop().run_until_complete(main())
+
+Cancelling a run or recording stops it at the next frame and gives
+control of the game back through tas_control.
+"""
+import asyncio
+
+from .scheduler import drive_async
+from .tas_engine import TAS
+
+__all__ = [
+    'AsyncTAS',
+]
+
+
+class AsyncTAS(TAS):
+    """
+    TAS engine with coroutine versions of run and record.
+
+    They run the same generators of waits as TAS (see scheduler.drive)
+    but await each wait, including frame ticks, instead of blocking.
+    Reads and writes of game memory are short and made directly
+    from the event loop.
+
+    :param hook: TAS Hook type to hook into the game, the name of a
+                 registered hook (see backends.py) or an already
+                 created hook. Defaults to 'ptde'.
+    :param scheduler: FrameScheduler instance to use to wait for frames.
+    """
+    async def _execute(self, igt_wait=True, side_effect=None, frames=None,
+                       timings=None, first_frame=0, display=None):
+        """
+        Execute the sequence of commands that have been pushed
+        to the TAS object, or the frames given.
+
+        See TAS._execute
+        """
+        await drive_async(self._execute_waits(
+            igt_wait, side_effect, frames, timings, first_frame, display
+        ))
+
+    async def watch(self, *fields, interval=0.1, **addresses):
+        """
+        Asynchronously iterate over snapshots of the game state.
+
+        eg:
+            >>> async for state in tas.watch('igt', 'frame_count'):
+            ...     print(state)
+
+        :param fields: names of the hook's snapshot fields
+        :param interval: time between snapshots in seconds
+        :param addresses: additional name=MemoryField values to read
+        """
+        while True:
+            yield self.h.snapshot(*fields, **addresses)
+            await asyncio.sleep(interval)
+
+    async def record(self, start_delay=5, record_time=None, button_wait=True,
+                     timing=False, stream_to=None):
+        """
+        Record the inputs for a time or indefinitely
+
+        Exit out and save by pressing start and select/back at the same
+        time, or cancel the task to stop without a recording.
+
+        See TAS.record for the arguments.
+
+        :return: recorded tas data
+        """
+        return await drive_async(self._record_waits(
+            start_delay, record_time, button_wait, timing, stream_to
+        ))
+
+    async def run(self, keyseq, start_delay=None, igt_wait=True,
+                  display=True, timing=False, start_frame=0, end_frame=None,
+                  supervisor=None):
+        """
+        Execute a series of controller commands
+
+        See TAS.run for the accepted inputs and arguments.
+
+        :return: TimingReport if timing is enabled
+        """
+        return await drive_async(self._run_waits(
+            keyseq, start_delay, igt_wait, display, timing,
+            start_frame, end_frame, supervisor,
+        ))
@@ -0,0 +1,154 @@
+"""
+Registries of the game hooks and process memory backends by name.
+
+Backends are registered as 'module:attribute' strings and only imported
+when they are first used, so importing the engine doesn't load ctypes
+or the platform APIs until a hook is created.
+
+    >>> from ds_tas.engine import TAS
+    >>> tas = TAS(hook='simulated')       # any registered hook name
+    >>> hooks.available()
+    ['ptde', 'remaster', 'simulated']
+
+Other packages can add backends with entry points in the
+'ds_tas.hooks' and 'ds_tas.processes' groups, eg: in setup.py
+
+    entry_points={
+        'ds_tas.hooks': ['mygame = mypackage.hooks:MyGameHook'],
+    }
+
+or at runtime with hooks.register('mygame', 'mypackage.hooks:MyGameHook').
+"""
+import importlib
+import sys
+
+__all__ = [
+    'BackendRegistry',
+    'hooks',
+    'processes',
+]
+
+
+def _entry_points(group):
+    """
+    Find the installed entry points in a group.
+
+    :param group: entry point group name
+    :return: dict of name: entry point
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python < 3.8
+        try:
+            import pkg_resources
+        except ImportError:
+            return {}
+        return {ep.name: ep for ep in pkg_resources.iter_entry_points(group)}
+
+    found = entry_points()
+    if hasattr(found, 'select'):
+        found = found.select(group=group)
+    else:
+        found = found.get(group, [])
+    return {ep.name: ep for ep in found}
+
+
+class BackendRegistry:
+    """
+    Backends by name, imported on first use.
+
+    :param group: entry point group to find other backends in
+    :param builtins: dict of name: 'module:attribute' for the
+                     backends included with ds_tas
+    """
+    def __init__(self, group, builtins):
+        self.group = group
+        self._targets = dict(builtins)
+        self._loaded = {}
+        self._entry_points = None
+
+    def __repr__(self):
+        return f'<BackendRegistry {self.group}: {self.available()}>'
+
+    def __contains__(self, name):
+        return name in self._targets or name in self._plugins()
+
+    def _plugins(self):
+        if self._entry_points is None:
+            self._entry_points = _entry_points(self.group)
+        return self._entry_points
+
+    def register(self, name, target):
+        """
+        Add or replace a backend.
+
+        :param name: name to select the backend with
+        :param target: the backend class or a 'module:attribute' string
+        """
+        self._loaded.pop(name, None)
+        if isinstance(target, str):
+            self._targets[name] = target
+        else:
+            self._targets[name] = None
+            self._loaded[name] = target
+
+    def available(self):
+        """
+        :return: sorted list of the registered backend names
+        """
+        return sorted(set(self._targets) | set(self._plugins()))
+
+    def get(self, name):
+        """
+        Get a backend by name, importing it if needed.
+
+        Registered backends take priority over entry points.
+
+        :param name: backend name
+        :return: the backend class
+        :raises KeyError: if there is no backend with the name
+        """
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+
+        if name in self._targets:
+            module_name, _, attribute = self._targets[name].partition(':')
+            backend = getattr(importlib.import_module(module_name), attribute)
+        elif name in self._plugins():
+            backend = self._plugins()[name].load()
+        else:
+            raise KeyError(
+                f'No {self.group} backend named {name!r}, '
+                f'available: {", ".join(self.available())}'
+            )
+        self._loaded[name] = backend
+        return backend
+
+
+hooks = BackendRegistry(
+    'ds_tas.hooks',
+    {
+        'ptde': 'ds_tas.engine.hooks:PTDEHook',
+        'remaster': 'ds_tas.engine.hooks:RemasterHook',
+        'simulated': 'ds_tas.engine.simulated:SimulatedHook',
+    },
+)
+
+processes = BackendRegistry(
+    'ds_tas.processes',
+    {
+        'win32': 'ds_tas.engine.win32:Win32Process',
+        'linux': 'ds_tas.engine.linux:LinuxProcess',
+        'simulated': 'ds_tas.engine.simulated:SimulatedProcess',
+    },
+)
+
+
+def default_process_name():
+    """
+    :return: name of the process backend for this platform
+    """
+    return 'linux' if sys.platform.startswith('linux') else 'win32'
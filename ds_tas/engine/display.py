@@ -0,0 +1,189 @@
+"""
+Display the inputs of a running sequence without slowing playback down.
+
+Printing to the console can take longer than a frame (especially on
+Windows), so instead of printing each frame as it is written the engine
+adds the packed input to a bounded queue. A background thread drains the
+queue, joins repeated frames into a single KeyPress, limits how many
+lines are printed each second and optionally writes every input to a
+log file.
+
+    >>> from ds_tas.engine.display import InputDisplay
+    >>> tas.run(sequence, display=InputDisplay(log_file='inputs.jsonl'))
+
+A press is shown once the input changes, with the number of frames it
+was held for.
+"""
+import json
+import sys
+import threading
+from collections import deque
+
+from .xinput import pack_state, unpack_state
+from ..controller import KeyPress
+
+__all__ = [
+    'InputDisplay',
+]
+
+_no_input = pack_state([0] * 20)
+
+
+class InputDisplay:
+    """
+    Print and log inputs from a background thread.
+
+    Adding an input with put is a constant time append to a queue. If
+    the queue is full the input is dropped from the display (and counted
+    in dropped) rather than holding up the frame.
+
+    :param max_pending: most inputs to hold waiting for the display thread
+    :param max_lines: most lines to print each second, further presses
+                      are counted instead of printed
+    :param interval: time between updates of the display in seconds
+    :param print_wait: print presses with no inputs
+    :param log_file: path of a file to append every run of inputs to,
+                     one JSON object per line with the first frame,
+                     number of frames and the 20 input values
+    :param stream: file to print to (defaults to sys.stdout)
+    """
+    def __init__(self, max_pending=4096, max_lines=30, interval=0.1,
+                 print_wait=False, log_file=None, stream=None):
+        self.max_pending = max_pending
+        self.max_lines = max_lines
+        self.interval = interval
+        self.print_wait = print_wait
+        self.log_file = log_file
+        self.stream = stream
+        self.dropped = 0
+        self.hidden = 0
+
+        self._pending = deque()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._log = None
+        # The run of identical inputs currently being added to
+        self._run_state = None
+        self._run_start = 0
+        self._run_frames = 0
+
+    def __repr__(self):
+        status = 'running' if self.running else 'stopped'
+        return f'<InputDisplay: {status}, {len(self._pending)} pending>'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def put(self, frame, command):
+        """
+        Queue an input for display.
+
+        :param frame: position of the input in the sequence
+        :param command: packed gamepad state (see xinput.py)
+        """
+        if len(self._pending) < self.max_pending:
+            self._pending.append((frame, command))
+        else:
+            self.dropped += 1
+
+    def start(self):
+        """
+        Start the display thread.
+        """
+        if self.running:
+            return self
+        self._stop_event.clear()
+        self.dropped = 0
+        self.hidden = 0
+        if self.log_file:
+            self._log = open(self.log_file, 'a')
+        self._thread = threading.Thread(
+            target=self._consume, name='ds_tas display', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Display the remaining inputs and stop the display thread.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _consume(self):
+        line_budget = max(1, round(self.max_lines * self.interval))
+        while not self._stop_event.wait(self.interval):
+            self._write(self._drain(), line_budget)
+        lines = self._drain()
+        lines.extend(self._end_run())
+        self._write(lines, None)
+        if self.dropped:
+            self._print(f'{self.dropped} inputs were not displayed '
+                        f'(display queue full)')
+
+    def _drain(self):
+        """
+        Take the queued inputs, joining repeated frames into runs.
+
+        :return: lines to print for the runs that have ended
+        """
+        lines = []
+        pending = self._pending
+        while pending:
+            frame, command = pending.popleft()
+            if (command == self._run_state
+                    and frame == self._run_start + self._run_frames):
+                self._run_frames += 1
+            else:
+                lines.extend(self._end_run())
+                self._run_state = command
+                self._run_start = frame
+                self._run_frames = 1
+        return lines
+
+    def _end_run(self):
+        """
+        Log the current run of inputs.
+
+        :return: list of the line to print for it, if any
+        """
+        if self._run_state is None:
+            return []
+        command, start, frames = (
+            self._run_state, self._run_start, self._run_frames
+        )
+        self._run_state = None
+        state = unpack_state(command)
+        if self._log is not None:
+            self._log.write(json.dumps(
+                {'frame': start, 'frames': frames, 'state': list(state)}
+            ))
+            self._log.write('\n')
+        if self.print_wait or command != _no_input:
+            return [repr(KeyPress.from_list(state, frames))]
+        return []
+
+    def _write(self, lines, budget):
+        if budget is not None and len(lines) > budget:
+            hidden = len(lines) - budget
+            self.hidden += hidden
+            lines = lines[:budget]
+            lines.append(f'... {hidden} more presses')
+        if lines:
+            self._print('\n'.join(lines))
+
+    def _print(self, text):
+        stream = self.stream if self.stream is not None else sys.stdout
+        print(text, file=stream, flush=True)
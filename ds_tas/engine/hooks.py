@@ -1,62 +1,246 @@
 """Hook to access the memory of Dark Souls"""
+import struct
+import threading
 from abc import ABC, abstractmethod
+from collections import namedtuple
 
-from ctypes import (
-    windll, POINTER, pointer, Structure, sizeof, cast
-)
-from ctypes.wintypes import (
-    BYTE, CHAR, DWORD, HMODULE, LPVOID, SIZE
-)
+from ds_tas.exceptions import GameNotRunningError, NullPointerError
+from . import backends
+from .xinput import pack_state, unpack_state
 
-from ds_tas.exceptions import GameNotRunningError
 
+class ProcessMemory(ABC):
+    """
+    Access to the memory of a running game process.
+
+    Hooks use this to read and write the game, so the same hook can
+    work with the real game or a stand in.
+
+    The same process is used from more than one thread (eg: by the
+    console and a background Recorder), so backends that reuse buffers
+    between calls must only use them under a lock.
+    """
+    @abstractmethod
+    def open(self, window_name):
+        """
+        Find and open the game process.
+
+        :param window_name: title of the game window
+        :raises GameNotRunningError: if the game could not be found
+        """
+
+    @abstractmethod
+    def close(self):
+        """
+        Release the process.
+        """
+
+    @abstractmethod
+    def terminate(self):
+        """
+        Kill the game process.
+
+        :return: True if successful
+        """
+
+    @abstractmethod
+    def module_base(self, module_name):
+        """
+        Get the base address of a module loaded in the game.
+
+        :param module_name: name of the dll
+        :return: base address
+        """
+
+    @abstractmethod
+    def read(self, address, length):
+        """
+        Read game memory, raising OSError on failure.
+
+        :param address: address to read from
+        :param length: number of bytes to read
+        :return: bytes read
+        """
+
+    def allocate(self, length):
+        """
+        Create a buffer to read into with read_into.
+
+        Backends that have to convert buffers for their system calls
+        should return one they can read into as it is.
+
+        :param length: size of the buffer in bytes
+        :return: writable buffer
+        """
+        return bytearray(length)
+
+    def read_into(self, address, buffer):
+        """
+        Read game memory into a writable buffer, raising OSError on failure.
+
+        Backends should override this to read directly into the buffer.
+
+        :param address: address to read from
+        :param buffer: buffer from allocate, bytearray or writable
+                       memoryview to fill
+        """
+        view = memoryview(buffer)
+        view[:] = self.read(address, view.nbytes)
+
+    def read_many(self, requests):
+        """
+        Read several regions of game memory.
+
+        Backends that can read several regions in one call
+        should override this.
+
+        :param requests: list of (address, length)
+        :return: list of bytes, one for each request
+        """
+        return [self.read(address, length) for address, length in requests]
+
+    @abstractmethod
+    def write(self, address, data):
+        """
+        Write game memory, raising OSError on failure.
+
+        :param address: address to write to
+        :param data: bytes, bytearray or memoryview to write
+        """
 
-class MODULEENTRY32(Structure):
-    _fields_ = [("dwSize", DWORD),
-                ("th32ModuleID", DWORD),
-                ("th32ProcessID", DWORD),
-                ("GlblcntUsage", DWORD),
-                ("ProccntUsage", DWORD),
-                ("modBaseAddr", POINTER(BYTE)),
-                ("modBaseSize", DWORD),
-                ("hModule", HMODULE),
-                ("szModule", CHAR*256),
-                ("szExePath", CHAR*260)]
 
+MemoryField = namedtuple('MemoryField', 'address length decode')
+MemoryField.__new__.__defaults__ = (None,)
+MemoryField.__doc__ = """
+A value in game memory to read with BaseHook.snapshot
 
-# Short aliases for kernel32 and user32 functions
-ReadProcessMemory = windll.kernel32.ReadProcessMemory
-WriteProcessMemory = windll.kernel32.WriteProcessMemory
-OpenProcess = windll.kernel32.OpenProcess
-CreateToolhelp32Snapshot = windll.kernel32.CreateToolhelp32Snapshot
-Module32First = windll.kernel32.Module32First
-Module32Next = windll.kernel32.Module32Next
-CloseHandle = windll.kernel32.CloseHandle
-TerminateProcess = windll.kernel32.TerminateProcess
+:param address: address of the value or a function returning the address
+:param length: size of the value in bytes
+:param decode: function to convert the bytes read (as a memoryview)
+               to a value, defaults to reading an unsigned little
+               endian integer
+"""
 
-FindWindowW = windll.user32.FindWindowW
-GetWindowThreadProcessId = windll.user32.GetWindowThreadProcessId
+
+def _decode_uint(data):
+    return int.from_bytes(data, byteorder='little')
+
+
+# Little endian integer formats by (length, signed)
+_int_structs = {
+    (length, signed): struct.Struct('<' + (code.lower() if signed else code))
+    for length, code in ((1, 'B'), (2, 'H'), (4, 'I'), (8, 'Q'))
+    for signed in (False, True)
+}
+
+
+class PointerCache:
+    """
+    Cache for addresses found by following chains of pointers.
+
+    An address is resolved on first use and then reused until the
+    cache is invalidated. Hooks invalidate the cache when they
+    acquire or release the game and when a read from a cached
+    address fails.
+
+    hits and misses count the cache lookups.
+    """
+    def __init__(self):
+        self._addresses = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (
+            f'<PointerCache: {len(self._addresses)} addresses, '
+            f'{self.hits} hits, {self.misses} misses>'
+        )
+
+    def get(self, name, resolver):
+        """
+        Get a cached address, resolving it if it is not cached.
+
+        :param name: name of the pointer chain
+        :param resolver: function to follow the pointer chain,
+                         should raise an exception if it fails
+        :return: address
+        """
+        try:
+            address = self._addresses[name]
+        except KeyError:
+            self.misses += 1
+            address = resolver()
+            self._addresses[name] = address
+        else:
+            self.hits += 1
+        return address
+
+    def invalidate(self, name=None):
+        """
+        Clear a cached address so it is resolved again on next use
+
+        :param name: name of the pointer chain, None to clear all
+        """
+        if name is None:
+            self._addresses.clear()
+        else:
+            self._addresses.pop(name, None)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
 
 
 class BaseHook(ABC):
     """
     Abstract class for all of the required methods needed for
     a game hook.
+
+    :param process: ProcessMemory to access the game with, or the name
+                    of a process backend (see backends.py), defaults to
+                    the backend for this platform
     """
     WINDOW_NAME = ''
+    # Frames per second the game runs at
+    framerate = 30
+    # Values closer together than this many bytes are
+    # read with a single read in snapshot
+    SNAPSHOT_GAP = 64
 
-    def __init__(self):
-        self.w_handle = None
-        self.w_handle = None
-        self.process_id = None
-        self.handle = None
+    def __init__(self, process=None):
         self.xinput_address = None
+        self.pointers = PointerCache()
+        # Read buffers for each thread using the hook, by size
+        self._read_buffers = threading.local()
+        self.process = None
+        if process is None:
+            process = self.default_process()
+        elif isinstance(process, str):
+            process = backends.processes.get(process)()
+        self.process = process
 
         # Actually get the hook
         self.acquire()
 
     def __del__(self):
-        self.release()
+        # __init__ may have failed before the process was set
+        if getattr(self, 'process', None) is not None:
+            self.release()
+
+    @staticmethod
+    def default_process():
+        """
+        Get the process memory access to use if none is given.
+
+        Uses the Windows API on Windows and process_vm_readv/writev
+        on Linux (for the game running under Wine/Proton).
+        The backend is only imported when it is first needed
+        (see backends.py).
+
+        :return: ProcessMemory instance
+        """
+        name = backends.default_process_name()
+        return backends.processes.get(name)()
 
     @abstractmethod
     def acquire(self):
@@ -118,16 +302,141 @@ class BaseHook(ABC):
         except GameNotRunningError:
             self.rehook()
 
+    def snapshot_fields(self):
+        """
+        Get the named fields the hook provides for snapshot.
+
+        :return: dict of name: MemoryField
+        """
+        return {}
+
+    def snapshot(self, *fields, **addresses):
+        """
+        Read several values from the game memory in as few reads as possible.
+
+        Values that are close together in memory are read in one go.
+
+        Example:
+            >>> hook.snapshot('igt', 'frame_count', 'controller')
+            {'igt': 123456, 'frame_count': 7890, 'controller': [0, ...]}
+            >>> hook.snapshot('igt', flag=MemoryField(0x1234, 1))
+            {'igt': 123456, 'flag': 1}
+
+        :param fields: names of fields from snapshot_fields
+                       ('igt', 'frame_count' and 'controller' for PTDE)
+        :param addresses: additional name=MemoryField values to read
+        :return: dict of name: value
+        """
+        known = self.snapshot_fields()
+        requested = {}
+        for name in fields:
+            try:
+                requested[name] = known[name]
+            except KeyError:
+                raise ValueError(
+                    f'Unknown snapshot field {name!r}, '
+                    f'available fields: {sorted(known)}'
+                )
+        requested.update(addresses)
+
+        try:
+            return self._read_fields(requested)
+        except OSError:
+            # Cached pointers may be out of date, find them again
+            self.pointers.invalidate()
+            try:
+                return self._read_fields(requested)
+            except OSError:
+                raise GameNotRunningError(
+                    "Could not read from the game. "
+                    "Use tas.rehook() to reconnect."
+                )
+
+    def _read_fields(self, fields):
+        """
+        Read MemoryFields, grouping them by address
+
+        :param fields: dict of name: MemoryField
+        :return: dict of name: value
+        """
+        located = []
+        for name, field in fields.items():
+            address = field.address
+            if callable(address):
+                address = address()
+            located.append((address, name, field))
+        located.sort(key=lambda item: item[0])
+
+        groups = []
+        for address, name, field in located:
+            end = address + field.length
+            if groups and address - groups[-1][1] <= self.SNAPSHOT_GAP:
+                group = groups[-1]
+                group[1] = max(group[1], end)
+                group[2].append((address, name, field))
+            else:
+                groups.append([address, end, [(address, name, field)]])
+
+        blocks = self.process.read_many(
+            [(start, end - start) for start, end, _ in groups]
+        )
+
+        result = {}
+        for (start, end, members), block in zip(groups, blocks):
+            data = memoryview(block)
+            for address, name, field in members:
+                offset = address - start
+                value = data[offset:offset + field.length]
+                decode = field.decode or _decode_uint
+                result[name] = decode(value)
+
+        return {name: result[name] for name in fields}
+
+    def write_packed_input(self, data):
+        """
+        Write a controller state already packed as XINPUT_GAMEPAD bytes.
+
+        Hooks that can write the bytes directly should override this.
+
+        :param data: 12 bytes of gamepad state
+        """
+        self.write_input(unpack_state(data))
+
     def read_memory(self, address, length):
-        out = (BYTE*length)()
-        ReadProcessMemory(self.handle, LPVOID(address), pointer(out),
-                          SIZE(length), pointer(SIZE(0)))
-        return bytes(out)
+        return self.process.read(address, length)
+
+    def read_memory_into(self, address, buffer):
+        """
+        Read memory into an existing buffer instead of returning new bytes
+
+        :param address: address to read from
+        :param buffer: bytearray or writable memoryview to fill
+        """
+        self.process.read_into(address, buffer)
+
+    def read_buffer(self, length):
+        """
+        Get the calling thread's reusable buffer for reads of a size.
+
+        The per frame reads (igt, frame_count, read_input) read into
+        these so they don't allocate. The contents are only valid
+        until the thread's next read of the same size.
+
+        :param length: size of the buffer in bytes
+        :return: buffer from process.allocate
+        """
+        buffers = self._read_buffers
+        try:
+            return buffers.by_length[length]
+        except AttributeError:
+            buffers.by_length = {}
+        except KeyError:
+            pass
+        buffer = buffers.by_length[length] = self.process.allocate(length)
+        return buffer
 
     def write_memory(self, address, data):
-        ptr = pointer((BYTE*len(data))(*data))
-        WriteProcessMemory(self.handle, LPVOID(address), ptr,
-                           SIZE(len(data)), pointer(SIZE(0)))
+        self.process.write(address, data)
 
 
 class PTDEHook(BaseHook):
@@ -138,27 +447,16 @@ class PTDEHook(BaseHook):
     """
     WINDOW_NAME = "DARK SOULS"
 
-    def __init__(self):
+    def __init__(self, process=None):
         self.debug = False
-        super().__init__()
+        super().__init__(process)
 
     def acquire(self):
         """
         Acquire a hook into the game window.
         """
-        self.w_handle = FindWindowW(None, self.WINDOW_NAME)
-        # Error if game not found
-        if self.w_handle == 0:
-            raise GameNotRunningError(f"Could not find the {self.WINDOW_NAME} "
-                                      f"game window. "
-                                      f"Make sure the game is running.")
-
-        self.process_id = DWORD(0)
-        GetWindowThreadProcessId(self.w_handle, pointer(self.process_id))
-        # Open process with PROCESS_TERMINATE, PROCESS_VM_OPERATION,
-        # PROCESS_VM_READ and PROCESS_VM_WRITE access rights
-        flags = 0x1 | 0x8 | 0x10 | 0x20
-        self.handle = OpenProcess(flags, False, self.process_id)
+        self.pointers.invalidate()
+        self.process.open(self.WINDOW_NAME)
         self.xinput_address = self.get_module_base_address("XINPUT1_3.dll")
         self.debug = self.is_debug()
 
@@ -166,42 +464,19 @@ class PTDEHook(BaseHook):
         """
         Release the hooks
         """
-        if not (self.handle or self.w_handle):
-            return
-
-        handles = [self.handle, self.w_handle]
-        for handle in handles:
-            try:
-                # If the application is closed this will fail
-                CloseHandle(handle)
-            except OSError:
-                pass
+        self.pointers.invalidate()
+        if self.process is not None:
+            self.process.close()
 
     def force_quit(self):
-        result = TerminateProcess(self.handle)
-        if result == 0:
-            print('Quit Failed')
-        else:
+        if self.process.terminate():
             print('Quit Successful.')
             self.release()
+        else:
+            print('Quit Failed')
 
     def get_module_base_address(self, module_name):
-        lpszModuleName = module_name.encode("ascii")
-        # TH32CS_SNAPMODULE and TH32CS_SNAPMODULE32
-        hSnapshot = CreateToolhelp32Snapshot(0x8 | 0x10, self.process_id)
-        ModuleEntry32 = MODULEENTRY32()
-        ModuleEntry32.dwSize = sizeof(MODULEENTRY32)
-        if Module32First(hSnapshot, pointer(ModuleEntry32)):
-            while True:
-                if ModuleEntry32.szModule == lpszModuleName:
-                    dwModuleBaseAddress = ModuleEntry32.modBaseAddr
-                    break
-                if Module32Next(hSnapshot, pointer(ModuleEntry32)):
-                    continue
-                else:
-                    break
-        CloseHandle(hSnapshot)
-        return cast(dwModuleBaseAddress, LPVOID).value
+        return self.process.module_base(module_name)
 
     def is_debug(self):
         """
@@ -220,8 +495,35 @@ class PTDEHook(BaseHook):
         self.write_memory(address, data)
 
     def read_int(self, address, length, signed=False):
-        out = self.read_memory(address, length)
-        return int.from_bytes(out, byteorder='little', signed=signed)
+        buffer = self.read_buffer(length)
+        self.read_memory_into(address, buffer)
+        try:
+            decoder = _int_structs[length, signed]
+        except KeyError:
+            return int.from_bytes(
+                memoryview(buffer), byteorder='little', signed=signed
+            )
+        return decoder.unpack_from(buffer)[0]
+
+    def read_cached_int(self, name, resolver, length, signed=False):
+        """
+        Read an integer from the address at the end of a cached pointer chain
+
+        If the read fails the chain is resolved again and the read retried.
+
+        :param name: name of the pointer chain in the cache
+        :param resolver: function to follow the pointer chain
+        :param length: size of the integer in bytes
+        :param signed: read as a signed integer
+        :return: value read
+        """
+        address = self.pointers.get(name, resolver)
+        try:
+            return self.read_int(address, length, signed)
+        except OSError:
+            self.pointers.invalidate(name)
+            address = self.pointers.get(name, resolver)
+            return self.read_int(address, length, signed)
 
     def read_input(self):
         """
@@ -249,30 +551,14 @@ class PTDEHook(BaseHook):
         18: r_thumb_x (-32,768 to 32,767)
         19: r_thumb_y (-32,768 to 32,767)
         """
-        ptr = self.xinput_address + 0x10C44
-        ptr = self.read_int(ptr, 4)
-        ptr = self.read_int(ptr, 4)
-        if ptr == 0:
-            raise RuntimeError("Couldn't find the pointer to the controller")
-        ptr += 0x28
-
-        data = self.read_memory(ptr, 12)
-        out = [0]*20
-
-        buttons = int.from_bytes(data[0:2], byteorder='little')
-        for n in range(0, 10):
-            out[n] = (buttons >> n) & 1
-        for n in range(12, 16):
-            out[n-2] = (buttons >> n) & 1
-
-        out[14] = int.from_bytes(data[2:3], byteorder='little')
-        out[15] = int.from_bytes(data[3:4], byteorder='little')
-        out[16] = int.from_bytes(data[4:6], byteorder='little', signed=True)
-        out[17] = int.from_bytes(data[6:8], byteorder='little', signed=True)
-        out[18] = int.from_bytes(data[8:10], byteorder='little', signed=True)
-        out[19] = int.from_bytes(data[10:12], byteorder='little', signed=True)
-
-        return out
+        address = self._controller_address()
+        buffer = self.read_buffer(12)
+        try:
+            self.read_memory_into(address, buffer)
+        except OSError:
+            self.pointers.invalidate('controller')
+            self.read_memory_into(self._controller_address(), buffer)
+        return unpack_state(buffer)
 
     def write_input(self, inputs):
         """
@@ -300,30 +586,72 @@ class PTDEHook(BaseHook):
         18: r_thumb_x (-32,768 to 32,767)
         19: r_thumb_y (-32,768 to 32,767)
         """
-        data = bytes()
+        self.write_packed_input(pack_state(inputs))
+
+    def write_packed_input(self, data):
+        """
+        Write a controller state already packed as XINPUT_GAMEPAD bytes.
+
+        :param data: 12 bytes of gamepad state
+        """
+        address = self._controller_address()
+        try:
+            self.write_memory(address, data)
+        except OSError:
+            self.pointers.invalidate('controller')
+            self.write_memory(self._controller_address(), data)
+
+    def snapshot_fields(self):
+        """
+        Get the named fields the hook provides for snapshot.
 
-        buttons = 0
-        for n in range(0, 10):
-            buttons = buttons | (inputs[n] << n)
-        for n in range(12, 16):
-            buttons = buttons | (inputs[n-2] << n)
-        data += buttons.to_bytes(2, byteorder="little")
+        igt: in game time in milliseconds
+        frame_count: frames shown since the start of the game
+        controller: current controller state as a list of 20 integers
+        packed_controller: current controller state as XINPUT_GAMEPAD bytes
 
-        data += inputs[14].to_bytes(1, byteorder="little")
-        data += inputs[15].to_bytes(1, byteorder="little")
-        data += inputs[16].to_bytes(2, byteorder="little", signed=True)
-        data += inputs[17].to_bytes(2, byteorder="little", signed=True)
-        data += inputs[18].to_bytes(2, byteorder="little", signed=True)
-        data += inputs[19].to_bytes(2, byteorder="little", signed=True)
+        :return: dict of name: MemoryField
+        """
+        return {
+            'igt': MemoryField(
+                lambda: self.pointers.get('igt', self._find_igt), 4
+            ),
+            'frame_count': MemoryField(
+                lambda: self.pointers.get(
+                    'frame_count', self._find_frame_count
+                ),
+                4
+            ),
+            'controller': MemoryField(
+                self._controller_address, 12, unpack_state
+            ),
+            'packed_controller': MemoryField(
+                self._controller_address, 12, bytes
+            ),
+        }
+
+    def _controller_address(self):
+        """
+        Get the cached address of the XINPUT_GAMEPAD controller state.
 
+        :return: address of the controller state
+        """
+        return self.pointers.get('controller', self._find_controller)
+
+    def _find_controller(self):
+        """
+        Follow the pointers to the XINPUT_GAMEPAD controller state.
+
+        :return: address of the controller state
+        """
         ptr = self.xinput_address + 0x10C44
         ptr = self.read_int(ptr, 4)
         ptr = self.read_int(ptr, 4)
         if ptr == 0:
-            raise RuntimeError("couldn't find the pointer to the controller")
-        ptr += 0x28
-
-        self.write_memory(ptr, data)
+            raise NullPointerError(
+                "Couldn't find the pointer to the controller"
+            )
+        return ptr + 0x28
 
     def controller(self, state):
         """
@@ -368,22 +696,28 @@ class PTDEHook(BaseHook):
 
         :return: In game time in milliseconds
         """
-        if self.debug:
-            ptr = 0x137C8C0
-        else:
-            ptr = 0x1378700
         try:
-            ptr = self.read_int(ptr, 4)
+            return self.read_cached_int('igt', self._find_igt, 4)
         except OSError:
             raise GameNotRunningError(
                 "Could not read IGT from the game. "
                 "Use tas.rehook() to reconnect."
             )
 
+    def _find_igt(self):
+        """
+        Follow the pointer to the in game time.
+
+        :return: address of the in game time
+        """
+        if self.debug:
+            ptr = 0x137C8C0
+        else:
+            ptr = 0x1378700
+        ptr = self.read_int(ptr, 4)
         if ptr == 0:
-            raise RuntimeError("Couldn't find the pointer to IGT")
-        ptr += 0x68
-        return self.read_int(ptr, 4)
+            raise NullPointerError("Couldn't find the pointer to IGT")
+        return ptr + 0x68
 
     def frame_count(self):
         """
@@ -392,21 +726,32 @@ class PTDEHook(BaseHook):
 
         :return: Frame count
         """
-        if self.debug:
-            ptr = 0x137C7C4
-        else:
-            ptr = 0x1378604
         try:
-            ptr = self.read_int(ptr, 4)
+            return self.read_cached_int(
+                'frame_count', self._find_frame_count, 4
+            )
         except OSError:
             raise GameNotRunningError(
                 "Could not read frame count from the game. "
                 "Use tas.rehook() to reconnect."
             )
+
+    def _find_frame_count(self):
+        """
+        Follow the pointer to the frame count.
+
+        :return: address of the frame count
+        """
+        if self.debug:
+            ptr = 0x137C7C4
+        else:
+            ptr = 0x1378604
+        ptr = self.read_int(ptr, 4)
         if ptr == 0:
-            raise RuntimeError("Couldn't find the pointer to the frame count")
-        ptr += 0x58
-        return self.read_int(ptr, 4)
+            raise NullPointerError(
+                "Couldn't find the pointer to the frame count"
+            )
+        return ptr + 0x58
 
 
 class RemasterHook(BaseHook):
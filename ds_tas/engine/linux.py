@@ -0,0 +1,227 @@
+"""
+Access the memory of a game process running under Wine/Proton on Linux.
+
+Uses the process_vm_readv and process_vm_writev system calls, which can
+transfer several separate regions of memory in a single call.
+Module base addresses are found from /proc/<pid>/maps.
+
+Reading another process needs ptrace permission: either run as the same
+user with /proc/sys/kernel/yama/ptrace_scope set to 0, or start the
+game from the TAS process.
+"""
+import ctypes
+import os
+import signal
+import threading
+from ctypes import c_int, c_size_t, c_ssize_t, c_ulong, c_void_p
+
+from ds_tas.exceptions import GameNotRunningError
+from .hooks import ProcessMemory
+
+
+class IOVEC(ctypes.Structure):
+    _fields_ = [("iov_base", c_void_p),
+                ("iov_len", c_size_t)]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+process_vm_readv = _libc.process_vm_readv
+process_vm_readv.argtypes = [
+    c_int, ctypes.POINTER(IOVEC), c_ulong,
+    ctypes.POINTER(IOVEC), c_ulong, c_ulong
+]
+process_vm_readv.restype = c_ssize_t
+
+process_vm_writev = _libc.process_vm_writev
+process_vm_writev.argtypes = [
+    c_int, ctypes.POINTER(IOVEC), c_ulong,
+    ctypes.POINTER(IOVEC), c_ulong, c_ulong
+]
+process_vm_writev.restype = c_ssize_t
+
+
+def find_process(process_name):
+    """
+    Find the pid of a running process by its executable name.
+
+    Wine processes show the windows executable in their command line
+    so this checks the command line as well as the process name.
+
+    :param process_name: name of the executable (case insensitive)
+    :return: pid or None if not found
+    """
+    process_name = process_name.lower()
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as cmdline:
+                args = cmdline.read().split(b'\0')
+        except OSError:
+            continue
+        for arg in args[:2]:
+            name = arg.decode(errors='replace').replace('\\', '/')
+            if name.rsplit('/', 1)[-1].lower() == process_name:
+                return int(entry)
+    return None
+
+
+class LinuxProcess(ProcessMemory):
+    """
+    Read and write the memory of a process with process_vm_readv/writev.
+
+    :param pid: process id of the game, if not given the process is
+                found by name when the hook is acquired
+    :param process_name: executable name to search for
+    """
+    def __init__(self, pid=None, process_name='DARKSOULS.exe'):
+        self.pid = pid
+        self.process_name = process_name
+        self._find_pid = pid is None
+
+        # Reused iovecs for single reads and writes, shared by every
+        # thread using the process so transfers are made under _lock
+        self._lock = threading.Lock()
+        self._local = IOVEC()
+        self._remote = IOVEC()
+        self._scratch = {}
+
+    def open(self, window_name):
+        if self._find_pid:
+            self.pid = find_process(self.process_name)
+        if self.pid is None or not os.path.exists(f'/proc/{self.pid}'):
+            raise GameNotRunningError(
+                f"Could not find the {self.process_name} process "
+                f"for {window_name}. Make sure the game is running."
+            )
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            return False
+        return True
+
+    def module_base(self, module_name):
+        """
+        Get the lowest address a module is mapped at.
+
+        :param module_name: file name of the module (case insensitive)
+        :return: base address
+        """
+        module_name = module_name.lower()
+        base = None
+        with open(f'/proc/{self.pid}/maps') as maps:
+            for line in maps:
+                parts = line.split(None, 5)
+                if len(parts) < 6:
+                    continue
+                path = parts[5].strip().replace('\\', '/')
+                if path.rsplit('/', 1)[-1].lower() == module_name:
+                    start = int(parts[0].split('-')[0], 16)
+                    if base is None or start < base:
+                        base = start
+        if base is None:
+            raise OSError(f'Module {module_name} is not loaded')
+        return base
+
+    def _scratch_buffer(self, length):
+        try:
+            return self._scratch[length]
+        except KeyError:
+            buffer = self._scratch[length] = ctypes.create_string_buffer(length)
+            return buffer
+
+    def _transfer(self, function, local_address, address, length):
+        self._local.iov_base = local_address
+        self._local.iov_len = length
+        self._remote.iov_base = address
+        self._remote.iov_len = length
+        result = function(self.pid, self._local, 1, self._remote, 1, 0)
+        if result == -1:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        elif result != length:
+            raise OSError(
+                f'Partial transfer of {result} of {length} bytes '
+                f'at {address:#x}'
+            )
+
+    def read(self, address, length):
+        with self._lock:
+            buffer = self._scratch_buffer(length)
+            self._transfer(
+                process_vm_readv, ctypes.addressof(buffer), address, length
+            )
+            return buffer.raw
+
+    def allocate(self, length):
+        return ctypes.create_string_buffer(length)
+
+    def read_into(self, address, buffer):
+        with self._lock:
+            length = len(buffer)
+            if isinstance(buffer, ctypes.Array):
+                # Buffers from allocate are passed as they are
+                target = buffer
+            else:
+                target = (ctypes.c_char * length).from_buffer(buffer)
+            self._transfer(
+                process_vm_readv, ctypes.addressof(target), address, length
+            )
+
+    def read_many(self, requests):
+        """
+        Read several regions of memory with a single system call.
+
+        :param requests: list of (address, length)
+        :return: list of bytes, one for each request
+        """
+        with self._lock:
+            count = len(requests)
+            total = sum(length for _, length in requests)
+            buffer = self._scratch_buffer(total)
+            local = (IOVEC * count)()
+            remote = (IOVEC * count)()
+            base = ctypes.addressof(buffer)
+            offset = 0
+            for idx, (address, length) in enumerate(requests):
+                local[idx].iov_base = base + offset
+                local[idx].iov_len = length
+                remote[idx].iov_base = address
+                remote[idx].iov_len = length
+                offset += length
+
+            result = process_vm_readv(self.pid, local, count, remote, count, 0)
+            if result == -1:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+            elif result != total:
+                raise OSError(f'Partial read of {result} of {total} bytes')
+
+            data = buffer.raw
+            out = []
+            offset = 0
+            for _, length in requests:
+                out.append(data[offset:offset + length])
+                offset += length
+            return out
+
+    def write(self, address, data):
+        with self._lock:
+            length = len(data)
+            if isinstance(data, bytes):
+                source = ctypes.cast(ctypes.c_char_p(data), c_void_p).value
+                self._transfer(process_vm_writev, source, address, length)
+            else:
+                if isinstance(data, memoryview) and data.readonly:
+                    data = bytearray(data)
+                source = (ctypes.c_char * length).from_buffer(data)
+                self._transfer(
+                    process_vm_writev, ctypes.addressof(source),
+                    address, length,
+                )
@@ -0,0 +1,272 @@
+"""
+Run a sequence on several game instances at once.
+
+Each target gets its own TAS engine with its own hook, scheduler and
+frame loop running on a thread (or in a separate process), so every
+instance follows its own game's frame ticks. By default the targets
+wait for each other to hook their game and prepare the inputs before
+any of them starts.
+
+A target that fails (can't be hooked, loses its game, ...) doesn't
+stop the others, its error is kept in its result.
+
+    >>> from ds_tas.engine.multi import MultiTAS
+    >>> multi = MultiTAS({'left': 'ptde', 'right': other_hook})
+    >>> results = multi.run(sequence)
+    >>> print(results)
+
+Use simulated games to try it out without Dark Souls:
+
+    >>> multi = MultiTAS(['simulated'] * 4, hook_options={'jitter': 0.1})
+
+With workers='process' each target runs in its own process. The targets
+must then be hook names or hook classes, and the sequence, scheduler
+and hook options must be picklable.
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Manager
+
+from . import backends
+from .scheduler import FrameScheduler
+from .timing import FrameTimings
+from .tas_engine import TAS
+from .xinput import is_replayable
+
+__all__ = [
+    'MultiTAS',
+    'MultiResults',
+    'TargetResult',
+]
+
+
+TargetResult = namedtuple('TargetResult', 'name frames started report error')
+TargetResult.__doc__ = """
+The outcome of running a sequence on one target.
+
+name: name of the target
+frames: number of inputs written to the game
+started: perf_counter time the target started playing,
+         None if it never started
+report: TimingReport of the frames played
+error: description of the error that stopped the target, None if it
+       played the whole sequence
+"""
+
+
+def _make_engine(target, hook_options, scheduler):
+    """
+    Create the engine for a target.
+
+    :param target: TAS, hook instance, hook class or registered hook name
+    :param hook_options: arguments to create a hook class with
+    :param scheduler: function returning a new FrameScheduler
+    :return: TAS
+    """
+    if isinstance(target, TAS):
+        return target
+    if isinstance(target, str):
+        target = backends.hooks.get(target)
+    if isinstance(target, type):
+        target = target(**hook_options)
+    return TAS(hook=target, scheduler=scheduler())
+
+
+def _run_target(name, target, keyseq, start_frame, end_frame, hook_options,
+                scheduler, barrier, start_timeout, engines=None):
+    """
+    Hook a target and play the sequence on it.
+
+    Runs on a worker thread or in a worker process. Any error is
+    returned in the result so it doesn't affect the other targets.
+
+    :return: TargetResult
+    """
+    tas = None
+    error = None
+    started = None
+    timings = FrameTimings(
+        TAS._timings_capacity(keyseq, start_frame, end_frame),
+        first_frame=start_frame,
+    )
+    try:
+        tas = _make_engine(target, hook_options, scheduler)
+        if engines is not None:
+            engines[name] = tas
+        # Reading the framerate hooks the game before waiting
+        # for the other targets
+        timings.period = tas.frame_period
+        frames = tas._packed_frames(keyseq, start_frame, end_frame)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+
+    if barrier is not None:
+        # Wait even after a failure so the other targets can start
+        try:
+            barrier.wait(start_timeout)
+        except threading.BrokenBarrierError:
+            if error is None:
+                print(f'{name}: timed out waiting for the other targets, '
+                      f'starting anyway')
+
+    if error is None:
+        started = time.perf_counter()
+        try:
+            tas._execute(
+                frames=frames, timings=timings, first_frame=start_frame
+            )
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+
+    written = tas.position - start_frame if started is not None else 0
+    return TargetResult(name, written, started, timings.report(), error)
+
+
+class MultiResults(dict):
+    """
+    TargetResult of each target by name.
+    """
+    @property
+    def failed(self):
+        """
+        :return: list of the results of the targets that failed
+        """
+        return [result for result in self.values() if result.error]
+
+    def __str__(self):
+        if not self:
+            return 'No targets'
+        starts = [r.started for r in self.values() if r.started is not None]
+        first_start = min(starts) if starts else None
+        header = ['target', 'frames', 'start', 'p50', 'p99',
+                  'doubled', 'skipped', 'late', 'error']
+        rows = []
+        for result in self.values():
+            report = result.report
+            row = [result.name, str(result.frames)]
+            if result.started is None:
+                row.append('')
+            else:
+                row.append(f'+{(result.started - first_start) * 1000:.1f}ms')
+            if report.frames:
+                row += [
+                    f'{report.p50_latency * 1000:.2f}ms',
+                    f'{report.p99_latency * 1000:.2f}ms',
+                    str(len(report.doubled)),
+                    str(len(report.skipped)),
+                    str(len(report.late)),
+                ]
+            else:
+                row += [''] * 5
+            row.append(result.error or '')
+            rows.append(row)
+        widths = [
+            max(len(row[col]) for row in [header, *rows])
+            for col in range(len(header))
+        ]
+        lines = [
+            '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+            for row in [header, *rows]
+        ]
+        return '\n'.join(line.rstrip() for line in lines)
+
+
+class MultiTAS:
+    """
+    Drive several game instances from one controller.
+
+    :param targets: list of targets or dict of name: target. A target is
+                    a TAS, a hook, a hook class or a registered hook name
+                    (see backends.py)
+    :param hook_options: arguments to create the hooks from hook classes
+                         and names with (eg: for 'simulated')
+    :param scheduler: function returning a new FrameScheduler for each
+                      target (eg: a scheduler class)
+    :param workers: 'thread' to run each target on a thread or 'process'
+                    to run each in its own process
+    """
+    def __init__(self, targets, hook_options=None, scheduler=FrameScheduler,
+                 workers='thread'):
+        if not isinstance(targets, dict):
+            targets = {f'target{idx}': target
+                       for idx, target in enumerate(targets)}
+        if workers not in ('thread', 'process'):
+            raise ValueError(
+                f"workers must be 'thread' or 'process', not {workers!r}"
+            )
+        if workers == 'process':
+            for name, target in targets.items():
+                if not isinstance(target, (str, type)):
+                    raise ValueError(
+                        f'Target {name} must be a hook name or class '
+                        f'to run in a separate process'
+                    )
+        self.targets = targets
+        self.hook_options = hook_options if hook_options else {}
+        self.scheduler = scheduler
+        self.workers = workers
+        # Engines of each target from the last run on threads
+        self.engines = {}
+
+    def __repr__(self):
+        return f'<MultiTAS: {len(self.targets)} targets on {self.workers}s>'
+
+    def run(self, keyseq, start_frame=0, end_frame=None, sync_start=True,
+            start_timeout=None):
+        """
+        Play a sequence on every target.
+
+        :param keyseq: inputs to run (see TAS.run), not an iterator as
+                       each target plays it separately
+        :param start_frame: Frame of the sequence to start playback from
+        :param end_frame: Frame of the sequence to stop before
+        :param sync_start: Wait for every target to be ready before any
+                           of them starts
+        :param start_timeout: longest time to wait for the other targets
+                              to be ready in seconds
+        :return: MultiResults
+        """
+        if not is_replayable(keyseq):
+            raise TypeError(
+                'Each target needs to play the sequence separately, '
+                'it can not be an iterator'
+            )
+
+        count = len(self.targets)
+        print(f'Executing sequence on {count} targets')
+        if self.workers == 'thread':
+            barrier = threading.Barrier(count) if sync_start else None
+            self.engines = {}
+            with ThreadPoolExecutor(count) as executor:
+                results = self._submit(
+                    executor, keyseq, start_frame, end_frame,
+                    barrier, start_timeout, self.engines,
+                )
+        else:
+            with Manager() as manager:
+                barrier = manager.Barrier(count) if sync_start else None
+                with ProcessPoolExecutor(count) as executor:
+                    results = self._submit(
+                        executor, keyseq, start_frame, end_frame,
+                        barrier, start_timeout, None,
+                    )
+        print('Sequence executed')
+        return results
+
+    def _submit(self, executor, keyseq, start_frame, end_frame, barrier,
+                start_timeout, engines):
+        futures = [
+            executor.submit(
+                _run_target, name, target, keyseq, start_frame, end_frame,
+                self.hook_options, self.scheduler, barrier, start_timeout,
+                engines,
+            )
+            for name, target in self.targets.items()
+        ]
+        results = MultiResults()
+        for future in futures:
+            result = future.result()
+            results[result.name] = result
+        return results
@@ -0,0 +1,341 @@
+"""
+Record controller input in a background thread.
+
+The recorder reads the packed controller state once per IGT tick and
+stores it in a preallocated FrameBuffer, so recording doesn't build a
+list for each frame and the console can be used while it runs.
+
+    >>> recorder = tas.start_recording()
+    >>> # ... play the game, the console stays usable ...
+    >>> recorder.stop()
+    >>> recorder.missed_frames()
+    >>> seq = recorder.to_sequence()
+
+Frames where the IGT moved on by more than one frame period of the
+game are reported by missed_frames - the inputs for the frames in
+between could not be read.
+"""
+import threading
+from array import array
+from time import perf_counter
+
+from .scheduler import FrameScheduler
+from .supervisor import hook_errors
+from .xinput import gamepad_struct, unpack_state
+from ..controller import KeyPress, PackedKeySequence
+
+__all__ = [
+    'FrameBuffer',
+    'Recorder',
+]
+
+# Start and back in XINPUT_GAMEPAD.wButtons
+STOP_BUTTONS = 0x0010 | 0x0020
+
+
+class FrameBuffer:
+    """
+    Preallocated store of packed controller states, one per frame.
+
+    Each frame keeps its 12 byte XINPUT_GAMEPAD state and the IGT change
+    in milliseconds since the previous frame.
+
+    The buffer grows by doubling when full. If max_frames is given it
+    stops growing at that size and becomes a ring buffer, overwriting
+    the oldest frames.
+
+    :param capacity: number of frames to allocate space for
+    :param max_frames: most frames to keep, None for no limit
+    """
+    state_size = gamepad_struct.size
+
+    def __init__(self, capacity=4096, max_frames=None):
+        capacity = max(capacity, 1)
+        if max_frames is not None:
+            capacity = min(capacity, max_frames)
+        self.max_frames = max_frames
+        self.count = 0
+        self.start = 0
+        self.dropped = 0
+        self.states = bytearray(capacity * self.state_size)
+        self.igt_deltas = array('l', [0]) * capacity
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f'<FrameBuffer: {self.count} frames>'
+
+    @property
+    def capacity(self):
+        return len(self.igt_deltas)
+
+    def _grow(self):
+        """
+        Double the capacity (up to max_frames), keeping frames in order
+        """
+        new_capacity = self.capacity * 2
+        if self.max_frames is not None:
+            new_capacity = min(new_capacity, self.max_frames)
+        states = self.ordered_states()
+        deltas = self.ordered_deltas()
+        self.states = bytearray(new_capacity * self.state_size)
+        self.states[:len(states)] = states
+        self.igt_deltas = array('l', [0]) * new_capacity
+        self.igt_deltas[:len(deltas)] = deltas
+        self.start = 0
+
+    def append(self, state, igt_delta=0):
+        """
+        Add a frame
+
+        :param state: 12 bytes of gamepad state
+        :param igt_delta: IGT change since the last frame in ms
+        """
+        capacity = self.capacity
+        if self.count == capacity:
+            if self.max_frames is None or capacity < self.max_frames:
+                self._grow()
+                capacity = self.capacity
+            else:
+                # Full ring buffer - overwrite the oldest frame
+                self.start = (self.start + 1) % capacity
+                self.count -= 1
+                self.dropped += 1
+
+        idx = (self.start + self.count) % capacity
+        size = self.state_size
+        self.states[idx * size:(idx + 1) * size] = state
+        self.igt_deltas[idx] = igt_delta
+        self.count += 1
+
+    def ordered_states(self):
+        """
+        :return: bytes of the packed states from oldest to newest
+        """
+        size = self.state_size
+        end = self.start + self.count
+        if end <= self.capacity:
+            return bytes(self.states[self.start * size:end * size])
+        wrapped = end - self.capacity
+        return bytes(self.states[self.start * size:] +
+                     self.states[:wrapped * size])
+
+    def ordered_deltas(self):
+        """
+        :return: array of the IGT changes from oldest to newest frame
+        """
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.igt_deltas[self.start:end]
+        wrapped = end - self.capacity
+        return self.igt_deltas[self.start:] + self.igt_deltas[:wrapped]
+
+    def iter_runs(self):
+        """
+        Iterate over runs of identical frames.
+
+        :return: iterator of (frames, 12 bytes of gamepad state)
+        """
+        data = self.ordered_states()
+        size = self.state_size
+        if not data:
+            return
+        current = data[:size]
+        frames = 1
+        for offset in range(size, len(data), size):
+            state = data[offset:offset + size]
+            if state == current:
+                frames += 1
+            else:
+                yield frames, current
+                current = state
+                frames = 1
+        yield frames, current
+
+    def igt_jumps(self, period):
+        """
+        Find frames that followed a jump of more than one frame of IGT.
+
+        :param period: frame period in seconds
+        :return: list of (frame index, number of frames missed before it)
+        """
+        period_ms = period * 1000
+        missed = []
+        for idx, delta in enumerate(self.ordered_deltas()):
+            if idx and delta > 1.5 * period_ms:
+                missed.append((idx, round(delta / period_ms) - 1))
+        return missed
+
+    def to_packed(self):
+        """
+        Convert the frames to a PackedKeySequence.
+
+        Only one KeyPress is created for each run of identical frames.
+
+        :return: PackedKeySequence
+        """
+        seq = PackedKeySequence()
+        for frames, state in self.iter_runs():
+            seq.append(KeyPress.from_list(unpack_state(state), frames))
+        return seq
+
+    def to_sequence(self):
+        """
+        Convert the frames to a KeySequence.
+
+        :return: KeySequence
+        """
+        return self.to_packed().to_sequence()
+
+
+class Recorder:
+    """
+    Record the controller state on every frame in a background thread.
+
+    The recording stops when stop() is called, when start and select
+    are pressed together (if stop_buttons is set), after record_time
+    seconds or if the connection to the game is lost (the error is kept
+    in recorder.error).
+
+    The recorder shares the hook (and its process) with the console,
+    the process backends lock each read and write so the console can
+    still read the game while recording.
+
+    The recorder waits for frames with its own scheduler. The default
+    FrameScheduler sleeps between polls so the recording thread leaves
+    time for the console.
+
+    :param hook: hook to read the game with
+    :param scheduler: FrameScheduler instance to wait for frames with
+    :param record_time: stop after this many seconds, None to record
+                        until stopped
+    :param stop_buttons: stop when start and select are pressed together
+    :param capacity: number of frames to preallocate space for
+    :param max_frames: keep only the latest max_frames frames
+    """
+    def __init__(self, hook, scheduler=None, record_time=None,
+                 stop_buttons=True, capacity=4096, max_frames=None):
+        self.hook = hook
+        self.scheduler = scheduler if scheduler else FrameScheduler()
+        self.record_time = record_time
+        self.stop_buttons = stop_buttons
+        self.buffer = FrameBuffer(capacity, max_frames)
+        self.error = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        status = 'recording' if self.running else 'stopped'
+        return f'<Recorder: {status}, {len(self.buffer)} frames>'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start recording in a background thread.
+        """
+        if self.running:
+            raise RuntimeError('The recorder is already running')
+        self._stop_event.clear()
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._record, name='ds_tas recorder', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop recording and wait for the thread to finish.
+
+        :param timeout: longest time to wait in seconds
+        :return: the FrameBuffer of recorded frames
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.buffer
+
+    def wait(self, timeout=None):
+        """
+        Wait for the recording to finish by itself
+        (eg: start and select being pressed)
+
+        :param timeout: longest time to wait in seconds
+        :return: True if the recording has finished
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def _record(self):
+        hook = self.hook
+        sync = self.scheduler
+        buffer = self.buffer
+        stopping = self._stop_event.is_set
+        stop_buttons = self.stop_buttons
+
+        try:
+            sync.reset(hook.igt, 1 / hook.framerate)
+            end_time = None
+            if self.record_time:
+                end_time = perf_counter() + self.record_time
+            last_igt = None
+            while not stopping():
+                state = hook.snapshot('packed_controller', 'igt')
+                packed = state['packed_controller']
+                if stop_buttons and packed[0] & STOP_BUTTONS == STOP_BUTTONS:
+                    break
+                igt = state['igt']
+                delta = 0 if last_igt is None else igt - last_igt
+                buffer.append(packed, delta)
+                last_igt = igt
+
+                # Wait for the next tick, checking for stop while polling
+                if sync.wait_for_tick(igt, stop=stopping) is None:
+                    return
+                if end_time and perf_counter() > end_time:
+                    break
+        except hook_errors as e:
+            self.error = e
+
+    @property
+    def period(self):
+        """
+        Frame period in seconds from the recorder's scheduler
+        """
+        return self.scheduler.period
+
+    def missed_frames(self, period=None):
+        """
+        Find frames where the IGT jumped by more than one frame.
+
+        :param period: frame period in seconds,
+                       defaults to the hook's frame period
+        :return: list of (frame index, number of frames missed before it)
+        """
+        if period is None:
+            period = 1 / self.hook.framerate
+        return self.buffer.igt_jumps(period)
+
+    def to_packed(self):
+        """
+        :return: the recording as a PackedKeySequence
+        """
+        return self.buffer.to_packed()
+
+    def to_sequence(self):
+        """
+        :return: the recording as a KeySequence
+        """
+        return self.buffer.to_sequence()
@@ -0,0 +1,351 @@
+"""
+Frame schedulers decide how the engine waits for the in game time to tick.
+
+The TAS engine writes one input per frame, so after each write it has
+to wait for the IGT to change before writing the next input.
+
+FrameScheduler polls the IGT at a fixed interval (the original engine
+behaviour). AdaptiveScheduler learns the frame period and sleeps until
+just before the next tick is due, then spin polls for the tick.
+
+Both schedulers can wait by blocking (wait_for_tick) or as a coroutine
+(wait_for_tick_async) that lets other tasks run on the event loop
+while it waits. Both are made from the same generator of waits
+(FrameScheduler.waits) run by drive or drive_async, which the engine
+also uses for its own loops.
+
+Use a scheduler with the engine:
+    >>> from ds_tas.engine import TAS
+    >>> from ds_tas.engine.scheduler import AdaptiveScheduler
+    >>> tas = TAS(scheduler=AdaptiveScheduler())
+    >>> tas.run(sequence)
+    >>> tas.scheduler.report()
+"""
+from array import array
+from collections import namedtuple
+from time import perf_counter, sleep
+
+__all__ = [
+    'FrameScheduler',
+    'AdaptiveScheduler',
+    'SchedulerReport',
+    'drive',
+    'drive_async',
+]
+
+
+SchedulerReport = namedtuple(
+    'SchedulerReport', 'inputs mean_offset max_offset late_ticks period'
+)
+
+
+def drive(waits):
+    """
+    Run a generator of waits, blocking for each wait.
+
+    The generator yields the time to sleep in seconds, or None to carry
+    on straight away. It is closed if the wait is interrupted so it can
+    clean up.
+
+    :param waits: generator of waits
+    :return: the value returned by the generator
+    """
+    try:
+        while True:
+            try:
+                delay = next(waits)
+            except StopIteration as done:
+                return done.value
+            if delay is not None:
+                sleep(delay)
+    finally:
+        waits.close()
+
+
+async def drive_async(waits):
+    """
+    Run a generator of waits (see drive), awaiting each wait so other
+    tasks can run. The generator is closed if the task is cancelled.
+
+    :param waits: generator of waits
+    :return: the value returned by the generator
+    """
+    # Imported here as asyncio is slow to import and only
+    # needed when already running in an event loop
+    import asyncio
+    try:
+        while True:
+            try:
+                delay = next(waits)
+            except StopIteration as done:
+                return done.value
+            await asyncio.sleep(delay or 0)
+    finally:
+        waits.close()
+
+
+class FrameScheduler:
+    """
+    Wait for IGT ticks by polling at a fixed interval.
+
+    For each input records how long after its tick it was written in
+    write_offsets (in seconds). The exact time of a tick can't be seen,
+    so this is measured from the last IGT read before the tick was
+    detected and is the latest the input could have been written.
+
+    :param poll_interval: time to sleep between IGT reads in seconds
+    """
+    def __init__(self, poll_interval=0.002):
+        self.poll_interval = poll_interval
+        self.read_igt = None
+        self.igt = None
+        self.tick_time = None
+        self.earliest_tick = None
+        self.last_delta = None
+        self.late_ticks = 0
+        self.write_offsets = array('d')
+
+    def reset(self, read_igt, period=None):
+        """
+        Prepare the scheduler for a new sequence.
+
+        :param read_igt: function returning the current IGT
+        :param period: expected frame period of the game in seconds
+                       (eg: 1 / hook.framerate), used by schedulers
+                       that predict the next tick
+        """
+        self.read_igt = read_igt
+        self.igt = read_igt()
+        self.tick_time = self.earliest_tick = perf_counter()
+        self.last_delta = None
+        self.late_ticks = 0
+        self.write_offsets = array('d')
+
+    def wait_for_tick(self, igt=None, stop=None):
+        """
+        Wait until the IGT changes.
+
+        :param igt: IGT value to wait to change from,
+                    defaults to the value at the last tick
+        :param stop: function checked between polls, returning True
+                     to give up waiting (eg: threading.Event.is_set)
+        :return: the new IGT, None if stopped before the tick
+        """
+        for delay in self.waits(igt):
+            if stop is not None and stop():
+                return None
+            if delay is not None:
+                sleep(delay)
+        return self.igt
+
+    async def wait_for_tick_async(self, igt=None):
+        """
+        Wait until the IGT changes without blocking the event loop.
+
+        :param igt: IGT value to wait to change from,
+                    defaults to the value at the last tick
+        :return: the new IGT
+        """
+        await drive_async(self.waits(igt))
+        return self.igt
+
+    def waits(self, igt=None):
+        """
+        Poll for the next tick, yielding each time the caller should wait.
+
+        Yields the time to sleep in seconds, or None to poll again
+        straight away (a blocking wait spins, an async wait gives
+        other tasks a turn). Engines that wait for other things as well
+        as ticks yield from this in their own generator of waits
+        (see drive).
+
+        :param igt: IGT value to wait to change from,
+                    defaults to the value at the last tick
+        """
+        if igt is None:
+            igt = self.igt
+        last_poll = self.tick_time
+        poll = perf_counter()
+        new_igt = self.read_igt()
+        while new_igt == igt:
+            last_poll = poll
+            yield self.poll_interval
+            poll = perf_counter()
+            new_igt = self.read_igt()
+        self._tick(igt, new_igt, last_poll)
+
+    def _tick(self, igt, new_igt, last_poll):
+        """
+        Store the details of a detected tick
+
+        :param igt: IGT before the tick
+        :param new_igt: IGT after the tick
+        :param last_poll: time of the last read that returned the old IGT
+        """
+        self.tick_time = perf_counter()
+        self.earliest_tick = last_poll
+        self.last_delta = new_igt - igt
+        self.igt = new_igt
+
+    def input_written(self):
+        """
+        Record that the input for the current tick has been written.
+
+        :return: the time the input was written
+        """
+        now = perf_counter()
+        self.write_offsets.append(now - self.earliest_tick)
+        return now
+
+    @property
+    def period(self):
+        """
+        Frame period in seconds from the last IGT change
+        """
+        if self.last_delta:
+            return self.last_delta / 1000
+        return None
+
+    def report(self):
+        """
+        Summarise how soon after each tick the inputs were written.
+
+        :return: SchedulerReport(inputs, mean_offset, max_offset,
+                                 late_ticks, period)
+        """
+        offsets = self.write_offsets
+        if offsets:
+            mean_offset = sum(offsets) / len(offsets)
+            max_offset = max(offsets)
+        else:
+            mean_offset = max_offset = None
+        return SchedulerReport(
+            len(offsets), mean_offset, max_offset, self.late_ticks,
+            self.period
+        )
+
+
+class AdaptiveScheduler(FrameScheduler):
+    """
+    Wait for IGT ticks by sleeping until shortly before the next
+    tick is due and then spin polling.
+
+    The frame period starts from the game's framerate given to reset
+    and is refined from the IGT change on each tick. The scheduler only
+    sleeps once sync_ticks IGT changes in a row have agreed with the
+    period, until then (and again after a skipped frame, pause or load)
+    it polls every tick. If a tick is found to have happened while
+    sleeping the scheduler wakes up earlier on later frames, and if it
+    spends time spinning it gradually sleeps for longer again.
+
+    The largest margin covers the default 15.6ms Windows timer resolution.
+
+    Spinning stops after spin_budget seconds for a frame (eg: when the
+    game is paused or loading) and the scheduler falls back to polling
+    every poll_interval seconds.
+
+    :param spin_budget: maximum time to spin poll each frame in seconds
+    :param min_margin: shortest time before the predicted tick to wake up
+    :param max_margin: longest time before the predicted tick to wake up
+    :param smoothing: weight of each new IGT change in the period estimate
+    :param initial_period: frame period to assume if reset isn't given one
+    :param poll_interval: sleep between IGT reads after the spin budget
+                          is used up
+    :param sync_ticks: IGT changes in a row that must agree with the
+                       period before sleeping until the predicted tick
+    :param tolerance: largest difference from the period, as a fraction
+                      of the period, for an IGT change to agree with it
+    """
+    def __init__(
+        self,
+        spin_budget=0.005,
+        min_margin=0.001,
+        max_margin=0.016,
+        smoothing=0.1,
+        initial_period=1/30,
+        poll_interval=0.001,
+        sync_ticks=3,
+        tolerance=0.25,
+    ):
+        super().__init__(poll_interval=poll_interval)
+        self.spin_budget = spin_budget
+        self.min_margin = min_margin
+        self.max_margin = max_margin
+        self.smoothing = smoothing
+        self.initial_period = initial_period
+        self.sync_ticks = sync_ticks
+        self.tolerance = tolerance
+        self.margin = min_margin
+        self._period = initial_period
+        # IGT changes in a row that agreed with the period
+        self._agreed = 0
+
+    def reset(self, read_igt, period=None):
+        super().reset(read_igt, period)
+        self._period = period if period else self.initial_period
+        # The reset time is not a tick so the first wait can't be predicted
+        self._agreed = 0
+
+    @property
+    def synced(self):
+        """
+        True once the ticks are regular enough to sleep until the next one
+        """
+        return self._agreed >= self.sync_ticks
+
+    @property
+    def period(self):
+        """
+        Estimated frame period in seconds
+        """
+        return self._period
+
+    def waits(self, igt=None):
+        if igt is None:
+            igt = self.igt
+        read_igt = self.read_igt
+
+        slept = False
+        if self.synced:
+            delay = self.tick_time + self._period - self.margin - perf_counter()
+            if delay > 0:
+                yield delay
+                slept = True
+
+        poll = perf_counter()
+        # The tick can't have been earlier than the end of the last
+        # frame's wait, or the wake up if the scheduler slept
+        last_poll = poll if slept else self.tick_time
+        new_igt = read_igt()
+        if new_igt != igt and slept:
+            # The tick happened while sleeping - wake up earlier next time
+            self.late_ticks += 1
+            self.margin = min(self.margin * 2, self.max_margin)
+        else:
+            spin_end = poll + self.spin_budget
+            while new_igt == igt:
+                last_poll = poll
+                yield self.poll_interval if poll > spin_end else None
+                poll = perf_counter()
+                new_igt = read_igt()
+            self.margin = max(self.margin * 0.9, self.min_margin)
+
+        self._tick(igt, new_igt, last_poll)
+        self._update_period(self.last_delta / 1000)
+
+    def _update_period(self, delta):
+        """
+        Update the frame period estimate from an IGT change in seconds
+        """
+        period = self._period
+        if abs(delta - period) <= self.tolerance * period:
+            self._period += self.smoothing * (delta - period)
+            self._agreed += 1
+        else:
+            if not self.synced and delta > 0:
+                # Polling every tick so this is a single frame,
+                # the period given to reset was wrong
+                self._period = delta
+            # Skipped frames, pauses and loads - poll until the
+            # ticks are regular again
+            self._agreed = 0
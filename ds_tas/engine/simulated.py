@@ -0,0 +1,324 @@
+"""
+Simulated Dark Souls PTDE process for running the TAS engine without the game.
+
+SimulatedHook is a PTDEHook that reads and writes an in memory image of
+the game process laid out like PTDE, so all of the engine and hook code
+runs as it would against the real game. A virtual game clock advances
+the IGT and frame count at the given framerate.
+
+    >>> from ds_tas.engine import TAS
+    >>> from ds_tas.engine.scheduler import FrameScheduler
+    >>> from ds_tas.engine.simulated import SimulatedHook
+    >>> hook = SimulatedHook(framerate=30, jitter=0.05, speed=10)
+    >>> tas = TAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+    >>> tas.run(sequence)
+    >>> hook.frame_inputs()  # the input the game saw on each frame
+
+At higher speeds use a scheduler that polls without sleeping so no
+frames are missed.
+"""
+import random
+import threading
+from time import perf_counter
+
+from .hooks import PTDEHook, ProcessMemory
+from .xinput import gamepad_struct, pack_state, unpack_state
+
+__all__ = [
+    'MemoryImage',
+    'SimulatedProcess',
+    'SimulatedHook',
+]
+
+# Where the simulated modules and game objects are placed
+XINPUT_BASE = 0x10000000
+HEAP_BASE = 0x20000000
+CONTROLLER_BASE = HEAP_BASE + 0x100
+IGT_BASE = HEAP_BASE + 0x1000
+FRAME_COUNT_BASE = HEAP_BASE + 0x2000
+
+CONTROLLER_STATE = CONTROLLER_BASE + 0x28
+IGT_ADDRESS = IGT_BASE + 0x68
+FRAME_COUNT_ADDRESS = FRAME_COUNT_BASE + 0x58
+
+# Original code at the addresses the hook patches
+CONTROLLER_CODE = b'\xe8\xa6\xfb\xff\xff'
+BACKGROUND_CODE = b'\x0f\x94\xc0'
+DEBUG_MAGIC = b'\xb4\x34\x96\xce'
+
+
+class MemoryImage:
+    """
+    Sparse process memory made up of separate regions.
+
+    Accessing memory outside of the regions raises OSError
+    like a failed ReadProcessMemory call.
+    """
+    def __init__(self):
+        self.regions = []
+
+    def add_region(self, start, size):
+        """
+        Add a zeroed region of memory
+
+        :param start: first address of the region
+        :param size: size in bytes
+        """
+        self.regions.append((start, bytearray(size)))
+
+    def _locate(self, address, length):
+        for start, data in self.regions:
+            if start <= address and address + length <= start + len(data):
+                return data, address - start
+        raise OSError(
+            f'Invalid memory access of {length} bytes at {address:#x}'
+        )
+
+    def read(self, address, length):
+        data, offset = self._locate(address, length)
+        return bytes(data[offset:offset + length])
+
+    def write(self, address, value):
+        data, offset = self._locate(address, len(value))
+        data[offset:offset + len(value)] = value
+
+    def write_int(self, address, value, length=4):
+        self.write(address, value.to_bytes(length, byteorder='little'))
+
+
+class SimulatedProcess(ProcessMemory):
+    """
+    In memory stand in for the Dark Souls PTDE process.
+
+    The game clock advances whenever the memory is accessed. On each
+    frame the game 'reads' the controller state into frame_inputs, then
+    the frame count and IGT are increased.
+
+    While the controller is enabled (ie: not under TAS control) the
+    controller state is replaced each frame by the simulated pad.
+
+    :param framerate: frames per second of the simulated game
+    :param jitter: random variation in each frame's length
+                   as a fraction of the frame period
+    :param speed: how many times faster than real time the game runs
+    :param step: if given, advance the game clock by this many seconds
+                 on every memory access instead of using real time
+    :param debug: lay out memory like the debug build
+    :param seed: seed for the frame jitter
+    """
+    def __init__(
+        self,
+        framerate=30,
+        jitter=0.0,
+        speed=1.0,
+        step=None,
+        debug=False,
+        seed=None,
+    ):
+        self.framerate = framerate
+        self.jitter = jitter
+        self.speed = speed
+        self.step = step
+        self.debug = debug
+        self.random = random.Random(seed)
+        # Memory is accessed from the recorder thread as well
+        self._lock = threading.Lock()
+
+        self.image = None
+        self.running = False
+        self.terminated = False
+        self.pad = bytes(gamepad_struct.size)
+        self.pad_inputs = None
+
+        self.frames = 0
+        self.game_time = 0.0
+        self.writes = []
+        self.frame_inputs = []
+        self._start = None
+        self._virtual = 0.0
+        self._next_frame = 0.0
+
+    # Addresses used by PTDEHook
+    @property
+    def _igt_pointer(self):
+        return 0x137C8C0 if self.debug else 0x1378700
+
+    @property
+    def _frame_count_pointer(self):
+        return 0x137C7C4 if self.debug else 0x1378604
+
+    @property
+    def _background_address(self):
+        return 0xF75BF3 if self.debug else 0xF72543
+
+    def boot(self):
+        """
+        Start (or restart) the simulated game with a fresh memory image.
+        """
+        image = MemoryImage()
+        image.add_region(0x400000, 0x100)
+        image.add_region(0x644100, 0x300)
+        image.add_region(0xF72500, 0x3800)
+        image.add_region(0x1378600, 0x4400)
+        image.add_region(XINPUT_BASE, 0x11000)
+        image.add_region(HEAP_BASE, 0x3000)
+
+        if self.debug:
+            image.write(0x400080, DEBUG_MAGIC)
+        image.write(XINPUT_BASE + 0x6945, CONTROLLER_CODE)
+        image.write(self._background_address, BACKGROUND_CODE)
+
+        image.write_int(XINPUT_BASE + 0x10C44, HEAP_BASE)
+        image.write_int(HEAP_BASE, CONTROLLER_BASE)
+        image.write_int(self._igt_pointer, IGT_BASE)
+        image.write_int(self._frame_count_pointer, FRAME_COUNT_BASE)
+
+        self.image = image
+        self.running = True
+        self.terminated = False
+        self.frames = 0
+        self.game_time = 0.0
+        self.writes = []
+        self.frame_inputs = []
+        self._start = perf_counter()
+        self._virtual = 0.0
+        self._next_frame = self._frame_length()
+
+    @property
+    def controller_enabled(self):
+        return self.image.read(XINPUT_BASE + 0x6945, 5) == CONTROLLER_CODE
+
+    def set_pad(self, state):
+        """
+        Set the state of the simulated physical controller
+
+        :param state: list of 20 integers
+        """
+        self.pad = pack_state(state)
+
+    def play_pad(self, states):
+        """
+        Press the simulated physical controller with one state per frame.
+
+        :param states: iterable of lists of 20 integers
+        """
+        self.pad_inputs = iter(states)
+
+    def _frame_length(self):
+        period = 1 / self.framerate
+        if self.jitter:
+            period *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return period
+
+    def _now(self):
+        if self.step is not None:
+            self._virtual += self.step
+            return self._virtual
+        return (perf_counter() - self._start) * self.speed
+
+    def _advance(self):
+        """
+        Run any game frames that are due.
+        """
+        now = self._now()
+        image = self.image
+        while now >= self._next_frame:
+            if self.controller_enabled:
+                if self.pad_inputs is not None:
+                    state = next(self.pad_inputs, None)
+                    if state is None:
+                        self.pad_inputs = None
+                    else:
+                        self.pad = pack_state(state)
+                image.write(CONTROLLER_STATE, self.pad)
+            self.frame_inputs.append(image.read(CONTROLLER_STATE, 12))
+
+            length = self._frame_length()
+            self.game_time += length
+            self._next_frame += length
+            self.frames += 1
+            image.write_int(FRAME_COUNT_ADDRESS, self.frames)
+            image.write_int(IGT_ADDRESS, int(self.game_time * 1000))
+
+    def _check(self):
+        if not self.running:
+            raise OSError('The simulated game is not running')
+
+    def open(self, window_name):
+        if self.image is None or self.terminated:
+            self.boot()
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        self.running = False
+        self.terminated = True
+        return True
+
+    def module_base(self, module_name):
+        if module_name.upper() == 'XINPUT1_3.DLL':
+            return XINPUT_BASE
+        raise OSError(f'Module {module_name} is not loaded')
+
+    def read(self, address, length):
+        with self._lock:
+            self._check()
+            self._advance()
+            return self.image.read(address, length)
+
+    def write(self, address, data):
+        with self._lock:
+            self._check()
+            self._advance()
+            self.image.write(address, data)
+            if address == CONTROLLER_STATE:
+                self.writes.append((self.frames, bytes(data)))
+
+
+class SimulatedHook(PTDEHook):
+    """
+    PTDEHook connected to a simulated game instead of Dark Souls.
+
+    Takes the same arguments as SimulatedProcess, or a process to use.
+    """
+    def __init__(
+        self,
+        framerate=30,
+        jitter=0.0,
+        speed=1.0,
+        step=None,
+        debug=False,
+        seed=None,
+        process=None,
+    ):
+        if process is None:
+            process = SimulatedProcess(
+                framerate=framerate,
+                jitter=jitter,
+                speed=speed,
+                step=step,
+                debug=debug,
+                seed=seed,
+            )
+        self.framerate = getattr(process, 'framerate', framerate)
+        super().__init__(process)
+
+    def written_inputs(self):
+        """
+        Get every controller state written to the game.
+
+        :return: list of (frame, state) with the state as 20 integers
+        """
+        return [
+            (frame, unpack_state(data))
+            for frame, data in self.process.writes
+        ]
+
+    def frame_inputs(self):
+        """
+        Get the controller state the game used on each frame.
+
+        :return: list of states as lists of 20 integers
+        """
+        return [unpack_state(data) for data in self.process.frame_inputs]
@@ -0,0 +1,197 @@
+"""
+Keep long runs going when the connection to the game is lost.
+
+If the game's memory can no longer be read or written part way through
+a sequence (the game crashed or restarted, the process handle went stale
+or a pointer chain led to 0 while loading) a supervised run reacquires
+the hook, waiting longer between each attempt, and plays the sequence
+again from a checkpoint.
+
+Checkpoints are frames of the sequence where the game state can be
+reproduced, eg: just after loading a save. The run resumes from the
+last checkpoint before the frame it was interrupted at.
+
+    >>> from ds_tas.engine.supervisor import Supervisor
+    >>> supervisor = Supervisor(checkpoints=[0, 1800, 5400])
+    >>> tas.run(sequence, supervisor=supervisor)
+    >>> supervisor.interruptions
+
+AsyncTAS.run takes a supervisor in the same way.
+
+on_resume is called before playing from the checkpoint and can be
+used to put the game back in the checkpoint's state.
+"""
+import json
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from .scheduler import drive
+from .xinput import is_replayable
+from ..exceptions import GameNotRunningError, NullPointerError
+
+__all__ = [
+    'Interruption',
+    'Supervisor',
+]
+
+# Errors raised by the hooks when the game can't be accessed
+hook_errors = (GameNotRunningError, NullPointerError, OSError)
+
+Interruption = namedtuple('Interruption', 'frame resume_frame error attempts')
+Interruption.__doc__ = """
+A supervised run losing the connection to the game.
+
+frame: frame of the sequence that was being played
+resume_frame: checkpoint frame the run was resumed from,
+              None if the game could not be rehooked
+error: description of the error
+attempts: number of attempts it took to rehook the game
+"""
+
+
+class Supervisor:
+    """
+    Rehook and resume a run if the game can't be accessed.
+
+    :param checkpoints: frames of the sequence that can be resumed from,
+                        the frame the run started from is always one
+    :param retries: attempts to rehook the game after each interruption
+    :param backoff: wait before the first attempt to rehook in seconds,
+                    doubled after each failed attempt
+    :param max_backoff: longest wait between attempts in seconds
+    :param max_interruptions: give up after this many interruptions,
+                              None to keep going
+    :param on_resume: function called with the TAS and the checkpoint
+                      frame before resuming
+    :param log_file: path of a file to append each interruption to,
+                     one JSON object per line
+    """
+    def __init__(self, checkpoints=(), retries=10, backoff=0.5,
+                 max_backoff=30.0, max_interruptions=None, on_resume=None,
+                 log_file=None):
+        self.checkpoints = sorted(set(checkpoints))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_interruptions = max_interruptions
+        self.on_resume = on_resume
+        self.log_file = log_file
+        self.interruptions = []
+
+    def __repr__(self):
+        return (
+            f'<Supervisor: {len(self.checkpoints)} checkpoints, '
+            f'{len(self.interruptions)} interruptions>'
+        )
+
+    def resume_frame(self, frame, start_frame=0):
+        """
+        Find the checkpoint to resume from.
+
+        :param frame: frame the run was interrupted at
+        :param start_frame: frame the run was started from
+        :return: the last checkpoint at or before frame
+        """
+        idx = bisect_right(self.checkpoints, frame)
+        if idx and self.checkpoints[idx - 1] >= start_frame:
+            return self.checkpoints[idx - 1]
+        return start_frame
+
+    def run(self, tas, keyseq, start_frame=0, end_frame=None, **options):
+        """
+        Run a sequence, resuming from a checkpoint after interruptions.
+
+        :param tas: TAS engine to run the sequence with
+        :param keyseq: inputs to run, must be able to be played again
+                       (not a generator or iterator)
+        :param start_frame: frame of the sequence to start from
+        :param end_frame: frame of the sequence to stop before
+        :param options: other arguments for tas.run
+        :return: the result of the uninterrupted tas.run
+        """
+        return drive(self.run_waits(
+            tas, keyseq, start_frame, end_frame, **options
+        ))
+
+    def run_waits(self, tas, keyseq, start_frame=0, end_frame=None,
+                  **options):
+        """
+        Generator of waits running a supervised sequence (see run and
+        scheduler.drive)
+        """
+        if not is_replayable(keyseq):
+            raise TypeError(
+                'Supervised runs need a sequence that can be played '
+                'again, not an iterator'
+            )
+
+        frame = start_frame
+        interrupted = 0
+        while True:
+            try:
+                return (yield from tas._run_waits(
+                    keyseq, start_frame=frame, end_frame=end_frame, **options
+                ))
+            except hook_errors as e:
+                failed_at = tas.position
+                error = f'{type(e).__name__}: {e}'
+                print(f'Connection to the game lost at frame {failed_at} '
+                      f'({error})')
+                interrupted += 1
+                if (self.max_interruptions is not None
+                        and interrupted > self.max_interruptions):
+                    self._log(Interruption(failed_at, None, error, 0))
+                    raise
+                attempts = yield from self._rehook_waits(tas)
+                if attempts is None:
+                    self._log(Interruption(failed_at, None, error,
+                                           self.retries))
+                    raise
+
+                frame = self.resume_frame(failed_at, start_frame)
+                self._log(Interruption(failed_at, frame, error, attempts))
+                if self.on_resume:
+                    self.on_resume(tas, frame)
+                print(f'Resuming from frame {frame}')
+                # Only wait before the first attempt
+                options['start_delay'] = None
+
+    def rehook(self, tas):
+        """
+        Try to rehook the game, waiting longer after each failure.
+
+        :param tas: TAS engine to rehook
+        :return: number of attempts taken, None if every attempt failed
+        """
+        return drive(self._rehook_waits(tas))
+
+    def _rehook_waits(self, tas):
+        """
+        Generator of waits rehooking the game (see rehook)
+        """
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            yield delay
+            try:
+                tas.rehook()
+                tas.igt()
+            except hook_errors as e:
+                print(f'Rehook attempt {attempt} failed: {e}')
+                delay = min(delay * 2, self.max_backoff)
+            else:
+                print(f'Rehooked the game after {attempt} attempts')
+                return attempt
+        return None
+
+    def _log(self, interruption):
+        self.interruptions.append(interruption)
+        if self.log_file:
+            with open(self.log_file, 'a') as outdata:
+                outdata.write(json.dumps(
+                    {
+                        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        **interruption._asdict(),
+                    }
+                ))
+                outdata.write('\n')
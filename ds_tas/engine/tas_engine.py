@@ -1,8 +1,18 @@
 import time
 from contextlib import contextmanager
-
-from .hooks import PTDEHook
-from ..controller import KeyPress, KeySequence, print_press
+from itertools import chain, islice
+
+from .display import InputDisplay
+from . import backends
+from .hooks import BaseHook
+from .recorder import Recorder
+from .scheduler import FrameScheduler, drive
+from .supervisor import Supervisor
+from .timing import FrameTimings
+from .xinput import CompiledInputs, compile_inputs, iter_packed, unpack_state
+from ..controller import (
+    KeyPress, KeySequence, PackedKeySequence, RecordingStream
+)
 from ..exceptions import GameNotRunningError
 
 
@@ -17,14 +27,69 @@ class TAS:
     Initialise with a hook to work with remaster - creating with no
     arguments will attempt to create a hook to Dark Souls PTDE.
 
-    :param hook: TAS Hook type to hook into the game.
+    The scheduler decides how to wait for each frame, see scheduler.py.
+
+    If given a hook type the hook is created (and the game hooked) the
+    first time it is used, so the engine can be created before the
+    game is running.
+
+    :param hook: TAS Hook type to hook into the game, the name of a
+                 registered hook (see backends.py) or an already
+                 created hook. Defaults to 'ptde'.
+    :param scheduler: FrameScheduler instance to use to wait for frames.
     """
-    def __init__(self, hook=None):
+    def __init__(self, hook=None, scheduler=None):
         if hook is None:
-            hook = PTDEHook
+            hook = 'ptde'
+        if scheduler is None:
+            scheduler = FrameScheduler()
+
+        if isinstance(hook, str) and hook not in backends.hooks:
+            raise ValueError(
+                f'Unknown hook {hook!r}, '
+                f'available: {", ".join(backends.hooks.available())}'
+            )
 
-        self.h = hook()
+        if isinstance(hook, BaseHook):
+            self._hook = hook
+            self._hook_type = type(hook)
+        else:
+            self._hook = None
+            self._hook_type = hook
+        self.scheduler = scheduler
         self.queue = []
+        self.last_timing = None
+        # Frame of the sequence being run that will be written next
+        self.position = 0
+
+    @property
+    def h(self):
+        """
+        The game hook, hooking the game on first use
+        """
+        if self._hook is None:
+            if isinstance(self._hook_type, str):
+                self._hook_type = backends.hooks.get(self._hook_type)
+            self._hook = self._hook_type()
+        return self._hook
+
+    @h.setter
+    def h(self, hook):
+        self._hook = hook
+
+    @property
+    def frame_period(self):
+        """
+        Expected time between frames in seconds from the hook's framerate
+        """
+        return 1 / self.h.framerate
+
+    @property
+    def hooked(self):
+        """
+        True if the game hook has been created
+        """
+        return self._hook is not None
 
     def igt(self):
         """
@@ -56,6 +121,18 @@ class TAS:
     def frame_count(self):
         return self.h.frame_count()
 
+    def snapshot(self, *fields, **addresses):
+        """
+        Read several values from the game at once (alias for h.snapshot)
+
+        eg: tas.snapshot('igt', 'frame_count', 'controller')
+
+        :param fields: names of the hook's snapshot fields
+        :param addresses: additional name=MemoryField values to read
+        :return: dict of name: value
+        """
+        return self.h.snapshot(*fields, **addresses)
+
     @contextmanager
     def tas_control(self):
         """
@@ -119,37 +196,162 @@ class TAS:
         else:
             raise ValueError(f'Invalid Input: {i}')
 
-    def _execute(self, igt_wait=True, side_effect=None):
+    def _execute(self, igt_wait=True, side_effect=None, frames=None,
+                 timings=None, first_frame=0, display=None):
         """
         Execute the sequence of commands that have been pushed
-        to the TAS object
+        to the TAS object, or the frames given.
 
         Show Commands will ignore 'wait' commands
 
         :param igt_wait: wait for the igt to tick before performing the first input
         :param side_effect: Call this method on each keypress if it is defined
+        :param frames: iterable of per frame packed gamepad states
+                       (see xinput.py) to use instead of the queue
+        :param timings: FrameTimings to record the timing of each frame in
+        :param first_frame: position of the first frame in the sequence,
+                            tas.position counts on from this
+        :param display: InputDisplay to queue each written input on
+        """
+        drive(self._execute_waits(
+            igt_wait, side_effect, frames, timings, first_frame, display
+        ))
+
+    def _execute_waits(self, igt_wait=True, side_effect=None, frames=None,
+                       timings=None, first_frame=0, display=None):
         """
+        Generator of waits executing the inputs (see _execute)
+
+        The engine's loops are generators yielding each wait (see
+        scheduler.drive) so TAS and AsyncTAS share them and only
+        differ in how they wait.
+        """
+        if frames is None:
+            frames = iter_packed(self.queue)
+
+        self.position = first_frame
+        sync = self.scheduler
         with self.tas_control():
-            igt = self.igt()
             if igt_wait:
                 # Wait for IGT to tick before running the first input
-                while igt == self.igt():
-                    time.sleep(0.002)
+                sync.reset(self.h.igt, self.frame_period)
+                yield from sync.waits()
             else:
                 # If not waiting for IGT, sleep for 1/20th of a second
                 # Otherwise the first input often gets eaten.
-                time.sleep(0.05)
-
-            # Loop over the queue and then clear it
-            for command in self.queue:
-                self.h.write_input(command)
+                yield 0.05
+                sync.reset(self.h.igt, self.frame_period)
+
+            # Loop over the frames and then clear the queue
+            for command in frames:
+                self.h.write_packed_input(command)
+                write_time = sync.input_written()
+                if display is not None:
+                    display.put(self.position, command)
+                self.position += 1
+                if timings is not None:
+                    timings.add(sync.tick_time, write_time, sync.last_delta)
                 if side_effect:
-                    side_effect(command)
-                igt = self.igt()
-                while igt == self.igt():
-                    time.sleep(0.002)
+                    side_effect(unpack_state(command))
+                yield from sync.waits()
             self.queue.clear()
 
+    @staticmethod
+    def _countdown(delay, title=None):
+        """
+        Generator of waits for a delay, counting down the last 5 seconds
+
+        :param delay: delay in seconds
+        :param title: printed before the countdown
+        """
+        if delay >= 5:
+            yield delay - 5
+            if title:
+                print(title)
+            for i in range(5, 0, -1):
+                print(f'{i}')
+                yield 1
+        else:
+            yield delay
+
+    @staticmethod
+    def _input_display(display):
+        """
+        :param display: True, False or an InputDisplay
+        :return: the InputDisplay to use or None
+        """
+        if isinstance(display, InputDisplay):
+            return display
+        return InputDisplay() if display else None
+
+    @staticmethod
+    def _seek(keyseq, start_frame=0, end_frame=None):
+        """
+        Cut the inputs down to the frames from start_frame to end_frame.
+
+        Sequences and compiled inputs are cut with their frame index
+        (see KeySequence.frames and CompiledInputs.iter_range) without
+        going through the skipped frames. Other iterables have to be
+        advanced past start_frame.
+
+        :param keyseq: inputs given to run
+        :param start_frame: first frame to keep
+        :param end_frame: frame to stop before, None for the end
+        :return: the frames in range
+        """
+        if start_frame < 0 or (end_frame is not None and end_frame < 0):
+            raise ValueError('Start and end frames must not be negative')
+        if not start_frame and end_frame is None:
+            return keyseq
+        if isinstance(keyseq, (KeyPress, PackedKeySequence)):
+            keyseq = KeySequence([keyseq])
+        if isinstance(keyseq, KeySequence):
+            return keyseq.frames[start_frame:end_frame]
+        if isinstance(keyseq, CompiledInputs):
+            return keyseq.iter_range(start_frame, end_frame)
+        return islice(keyseq, start_frame, end_frame)
+
+    @staticmethod
+    def _timings_capacity(keyseq, start_frame=0, end_frame=None):
+        """
+        Number of frames to preallocate FrameTimings for
+
+        :param keyseq: inputs given to run
+        :param start_frame: first frame of the inputs to use
+        :param end_frame: frame of the inputs to stop before
+        :return: number of frames that will be played if known,
+                 otherwise the FrameTimings default
+        """
+        if isinstance(keyseq, KeyPress):
+            framecount = keyseq.frames
+        else:
+            framecount = getattr(keyseq, 'framecount', None)
+        if framecount is None:
+            return 4096
+        if end_frame is not None:
+            framecount = min(end_frame, framecount)
+        return max(framecount - start_frame, 1)
+
+    @staticmethod
+    def _packed_frames(keyseq, start_frame=0, end_frame=None):
+        """
+        Get an iterator of packed gamepad states for the inputs
+
+        :param keyseq: inputs given to run
+        :param start_frame: first frame of the inputs to use
+        :param end_frame: frame of the inputs to stop before
+        :return: iterator of gamepad bytes
+        """
+        if isinstance(keyseq, CompiledInputs):
+            return iter(TAS._seek(keyseq, start_frame, end_frame))
+        keyseq = TAS._seek(keyseq, start_frame, end_frame)
+        if isinstance(keyseq, (KeyPress, KeySequence, PackedKeySequence)):
+            keyseq = compile_inputs(keyseq)
+        if isinstance(keyseq, CompiledInputs):
+            return iter(keyseq)
+        else:
+            return iter_packed(keyseq)
+
     def keystate(self):
         """
         Get the current input state as a keypress
@@ -158,7 +360,8 @@ class TAS:
         state = self.h.read_input()
         return KeyPress.from_list(state)
 
-    def record(self, start_delay=5, record_time=None, button_wait=True):
+    def record(self, start_delay=5, record_time=None, button_wait=True,
+               timing=False, stream_to=None):
         """
         Record the inputs for a time or indefinitely
 
@@ -174,88 +377,213 @@ class TAS:
         :param start_delay: Delay before recording starts in seconds
         :param record_time: Recording time
         :param button_wait: Wait for a button press to start recording
+        :param timing: Record the timing of each frame in tas.last_timing
+        :param stream_to: path of a file to write the recording to as it
+                          is made (see controller.RecordingStream)
         :return: recorded tas data
         """
+        return drive(self._record_waits(
+            start_delay, record_time, button_wait, timing, stream_to
+        ))
+
+    def _record_waits(self, start_delay=5, record_time=None,
+                      button_wait=True, timing=False, stream_to=None):
+        """
+        Generator of waits making a recording (see record)
+
+        :return: the recorded KeySequence
+        """
         print(f'Preparing to record in {start_delay} seconds')
         recording_data = []
         igt_diffs = set()
 
         if start_delay is None:
             start_delay = 0
-
-        if start_delay >= 5:
-            time.sleep(start_delay - 5)
-            print('Countdown')
-            for i in range(5, 0, -1):
-                print(f'{i}')
-                time.sleep(1)
-        else:
-            time.sleep(start_delay)
+        yield from self._countdown(start_delay, 'Countdown')
 
         print('Recording Started')
-        start_time = time.clock()
+        start_time = time.perf_counter()
         end_time = start_time + record_time if record_time else None
-        first_input = True
 
         # Special code for waiting for first input
-        if first_input and button_wait:
+        if button_wait:
             print('Press a button to resume recording.')
             keypress = self.h.read_input()
             while not sum(keypress[4:6] + keypress[10:14]):
-                time.sleep(0.002)
+                yield 0.002
                 keypress = self.h.read_input()
             print('Recording Resumed')
             print('Press start and select simultaneously to stop recording.')
 
-        while True:
-            keypress = self.h.read_input()
-            # Exit if start and select are held down
-            if keypress[4] and keypress[5]:
-                break
-            recording_data.append(keypress)
-
-            igt = self.h.igt()
-            # Wait until next igt time
-            while igt == self.h.igt():
-                time.sleep(0.002)
-            igt_diffs.add(self.h.igt() - igt)
-
-            # Check if record time complete
-            if end_time and time.clock() > end_time:
-                break
+        timings = FrameTimings(period=self.frame_period) if timing else None
+        sync = self.scheduler
+        sync.reset(self.h.igt, self.frame_period)
+        # Stream the recording to disk so it survives crashes
+        stream = None
+        if stream_to:
+            stream = RecordingStream(
+                stream_to, framerate=round(self.h.framerate)
+            )
+        try:
+            while True:
+                state = self.h.snapshot('controller', 'igt')
+                if timings is not None:
+                    timings.add(
+                        sync.tick_time, time.perf_counter(), sync.last_delta
+                    )
+                keypress = state['controller']
+                # Exit if start and select are held down
+                if keypress[4] and keypress[5]:
+                    break
+                recording_data.append(keypress)
+                if stream is not None:
+                    stream.append(keypress)
+
+                # Wait until next igt time
+                yield from sync.waits(state['igt'])
+                igt_diffs.add(sync.last_delta)
+
+                # Check if record time complete
+                if end_time and time.perf_counter() > end_time:
+                    break
+        finally:
+            if stream is not None:
+                stream.close()
+                print(f'Recording saved to {stream_to}')
 
         print('Recording Finished')
         print(f'Frame Lengths: {sorted(igt_diffs)}')
+        if timings is not None:
+            self.last_timing = timings
+            print(timings.report())
 
         recording = KeySequence.from_list(recording_data)
 
         return recording
 
-    def run(self, keyseq, start_delay=None, igt_wait=True, display=True):
+    def start_recording(self, record_time=None, stop_buttons=True,
+                        max_frames=None, scheduler=None):
+        """
+        Start recording the inputs in a background thread.
+
+        Unlike record this returns straight away. Stop the recording
+        with recorder.stop() or by pressing start and select together.
+
+        use:
+            >>> recorder = tas.start_recording()
+            >>> recorder.stop()
+            >>> seq = recorder.to_sequence()
+
+        :param record_time: Recording time, None to record until stopped
+        :param stop_buttons: Stop when start and select are pressed together
+        :param max_frames: Only keep the last max_frames frames
+        :param scheduler: FrameScheduler for the recording thread
+                          (not shared with tas.scheduler)
+        :return: the running Recorder
         """
-        Queue up and execute a series of controller commands
+        recorder = Recorder(
+            self.h,
+            scheduler=scheduler,
+            record_time=record_time,
+            stop_buttons=stop_buttons,
+            max_frames=max_frames,
+        )
+        return recorder.start()
+
+    def run(self, keyseq, start_delay=None, igt_wait=True, display=True,
+            timing=False, start_frame=0, end_frame=None, supervisor=None):
+        """
+        Execute a series of controller commands
+
+        Sequences are compiled to packed gamepad states once before
+        playback (see xinput.compile_inputs) without expanding them
+        frame by frame. Other iterables are packed lazily as they are
+        executed so generators are not consumed in advance.
 
-        :param keyseq: KeySequence or KeyPress of inputs to execute
+        :param keyseq: KeySequence, PackedKeySequence, KeyPress or
+                       CompiledInputs to execute, or an iterable/generator
+                       of lists of 20 integers (one per frame)
         :param start_delay: Delay before execution starts in seconds
         :param igt_wait: Wait for IGT to tick before performing the first input
-        :param display: Display the game inputs as they are pressed
-        """
-        if len(keyseq) > 0:
-            effect = print_press if display else None
-            if start_delay:
-                print(f'Delaying start by {start_delay} seconds')
-                if start_delay >= 5:
-                    time.sleep(start_delay - 5)
-                    for i in range(5, 0, -1):
-                        print(f'{i}')
-                        time.sleep(1)
-                else:
-                    time.sleep(start_delay)
+        :param display: Display the game inputs as they are pressed,
+                        or an InputDisplay to configure how they are shown
+        :param timing: Record the timing of each frame in tas.last_timing
+        :param start_frame: Frame of the sequence to start playback from
+        :param end_frame: Frame of the sequence to stop before
+                          (None to play to the end)
+        :param supervisor: Rehook and resume if the connection to the
+                           game is lost, True or a Supervisor to set
+                           the checkpoints and retries
+        :return: TimingReport if timing is enabled
+        """
+        return drive(self._run_waits(
+            keyseq, start_delay, igt_wait, display, timing,
+            start_frame, end_frame, supervisor,
+        ))
+
+    def _run_waits(self, keyseq, start_delay=None, igt_wait=True,
+                   display=True, timing=False, start_frame=0,
+                   end_frame=None, supervisor=None):
+        """
+        Generator of waits executing a series of controller commands
+        (see run)
 
-            print('Executing sequence')
-            self._clear()
-            self._push(keyseq.keylist)
-            self._execute(igt_wait=igt_wait, side_effect=effect)
-            print('Sequence executed')
-        else:
+        :return: TimingReport if timing is enabled
+        """
+        if supervisor:
+            if not isinstance(supervisor, Supervisor):
+                supervisor = Supervisor()
+            return (yield from supervisor.run_waits(
+                self,
+                keyseq,
+                start_frame=start_frame,
+                end_frame=end_frame,
+                start_delay=start_delay,
+                igt_wait=igt_wait,
+                display=display,
+                timing=timing,
+            ))
+
+        frames = self._packed_frames(keyseq, start_frame, end_frame)
+        first_frame = next(frames, None)
+        if first_frame is None:
             print('No Sequence Defined')
+            return
+
+        frames = chain([first_frame], frames)
+        display = self._input_display(display)
+        if start_delay:
+            print(f'Delaying start by {start_delay} seconds')
+            yield from self._countdown(start_delay)
+
+        timings = None
+        if timing:
+            timings = FrameTimings(
+                self._timings_capacity(keyseq, start_frame, end_frame),
+                first_frame=start_frame,
+                period=self.frame_period,
+            )
+            self.last_timing = timings
+
+        if start_frame:
+            print(f'Executing sequence from frame {start_frame}')
+        else:
+            print('Executing sequence')
+        if display is not None:
+            display.start()
+        try:
+            yield from self._execute_waits(
+                igt_wait=igt_wait,
+                frames=frames,
+                timings=timings,
+                first_frame=start_frame,
+                display=display,
+            )
+        finally:
+            if display is not None:
+                display.close()
+        print('Sequence executed')
+        if timings is not None:
+            report = timings.report()
+            print(report)
+            return report
@@ -0,0 +1,222 @@
+"""
+Per frame timing instrumentation for playback and recording.
+
+Enable with tas.run(seq, timing=True) or tas.record(timing=True).
+The timings for the last run or recording are kept in tas.last_timing.
+
+    >>> report = tas.run(seq, timing=True)
+    >>> print(report)
+    >>> tas.last_timing.save('timing.json')
+"""
+import json
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+__all__ = [
+    'FrameTimings',
+    'TimingReport',
+]
+
+# Upper bounds of the write latency histogram buckets in seconds
+latency_buckets = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.004, 0.008, 0.016, 0.033,
+    float('inf'),
+)
+
+
+class TimingReport(namedtuple(
+    'TimingReport',
+    'frames period p50_latency p99_latency max_latency histogram '
+    'doubled skipped late'
+)):
+    """
+    Summary of the frame timings of a run.
+
+    frames: number of frames recorded
+    period: expected frame period in seconds
+            (median IGT change per frame if not known)
+    p50_latency, p99_latency, max_latency: time in seconds between
+        detecting each tick and writing (or reading) the input
+    histogram: list of (bucket upper bound, count) of the latencies
+    doubled: sequence frame positions of inputs held for more than one frame
+             (the IGT changed by more than one frame before the next input)
+    skipped: sequence frame positions of inputs that may not have been seen
+             (the IGT changed by less than half a frame)
+    late: sequence frame positions of inputs written more than a frame after
+          their tick
+    """
+    def __str__(self):
+        if not self.frames:
+            return 'No frames recorded'
+
+        lines = [
+            f'Frames: {self.frames}',
+            f'Frame period: {self.period * 1000:.2f}ms',
+            f'Write latency: p50 {self.p50_latency * 1000:.3f}ms, '
+            f'p99 {self.p99_latency * 1000:.3f}ms, '
+            f'max {self.max_latency * 1000:.3f}ms',
+            'Latency histogram:',
+        ]
+        for bound, count in self.histogram:
+            label = 'inf' if bound == float('inf') else f'{bound * 1000:g}ms'
+            lines.append(f'    <= {label:>8}: {count}')
+        for name in ['doubled', 'skipped', 'late']:
+            indices = getattr(self, name)
+            shown = ', '.join(str(i) for i in indices[:20])
+            if len(indices) > 20:
+                shown += ', ...'
+            lines.append(f'{name.capitalize()} frames: {len(indices)} [{shown}]')
+        return '\n'.join(lines)
+
+
+class FrameTimings:
+    """
+    Preallocated per frame timing data.
+
+    For each frame stores the time the tick was detected, the time the
+    input was written (or read when recording) and the IGT change
+    at the tick in milliseconds (0 if the frame did not start on a tick).
+
+    The arrays grow by doubling if more frames are added than
+    were allocated.
+
+    Frames reported by report() are positions in the sequence, counted
+    from first_frame if playback didn't start at the beginning.
+
+    :param capacity: number of frames to allocate space for
+    :param first_frame: position in the sequence of the first frame
+    :param period: expected frame period in seconds
+                   (eg: 1 / hook.framerate), see report
+    """
+    def __init__(self, capacity=4096, first_frame=0, period=None):
+        capacity = max(capacity, 1)
+        self.first_frame = first_frame
+        self.period = period
+        self.count = 0
+        self.tick_times = array('d', bytes(8 * capacity))
+        self.write_times = array('d', bytes(8 * capacity))
+        self.igt_deltas = array('l', [0]) * capacity
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f'<FrameTimings: {self.count} frames>'
+
+    def _grow(self):
+        self.tick_times.extend(self.tick_times)
+        self.write_times.extend(self.write_times)
+        self.igt_deltas.extend(self.igt_deltas)
+
+    def add(self, tick_time, write_time, igt_delta):
+        """
+        Store the timings of a frame
+
+        :param tick_time: perf_counter time the tick was detected
+        :param write_time: perf_counter time the input was written
+        :param igt_delta: IGT change at the tick in ms (None if no tick)
+        """
+        idx = self.count
+        if idx == len(self.tick_times):
+            self._grow()
+        self.tick_times[idx] = tick_time
+        self.write_times[idx] = write_time
+        self.igt_deltas[idx] = igt_delta or 0
+        self.count = idx + 1
+
+    def latencies(self):
+        """
+        :return: list of the time between each tick and its input in seconds
+        """
+        return [
+            self.write_times[i] - self.tick_times[i]
+            for i in range(self.count)
+        ]
+
+    def report(self, period=None):
+        """
+        Summarise the timings.
+
+        Frames are counted as doubled or skipped against the expected
+        period. The median IGT change is only used if no period is known,
+        and hides inputs that are consistently held for extra frames.
+
+        :param period: expected frame period in seconds, defaults to the
+                       period the timings were created with
+        :return: TimingReport
+        """
+        if period is None:
+            period = self.period
+        count = self.count
+        if not count:
+            return TimingReport(0, period, None, None, None, [], [], [], [])
+
+        deltas = self.igt_deltas[:count]
+        if period is None:
+            ticks = sorted(d for d in deltas if d > 0)
+            period = ticks[len(ticks) // 2] / 1000 if ticks else 0
+
+        latencies = self.latencies()
+        ordered = sorted(latencies)
+        p50 = ordered[(count - 1) // 2]
+        p99 = ordered[min(count - 1, int(count * 0.99))]
+
+        histogram = [0] * len(latency_buckets)
+        for latency in latencies:
+            histogram[bisect_left(latency_buckets, latency)] += 1
+
+        doubled, skipped, late = [], [], []
+        if period:
+            first = self.first_frame
+            delta_ms = period * 1000
+            # The IGT change at a tick shows how long the previous input
+            # was held for.
+            for idx in range(1, count):
+                delta = deltas[idx]
+                if delta > 1.5 * delta_ms:
+                    doubled.append(first + idx - 1)
+                elif 0 < delta < 0.5 * delta_ms:
+                    skipped.append(first + idx - 1)
+            late = [
+                first + idx for idx, latency in enumerate(latencies)
+                if latency > period
+            ]
+
+        return TimingReport(
+            count,
+            period,
+            p50,
+            p99,
+            ordered[-1],
+            list(zip(latency_buckets, histogram)),
+            doubled,
+            skipped,
+            late,
+        )
+
+    def save(self, output_file, period=None):
+        """
+        Save the timing report and the per frame data as JSON
+
+        :param output_file: path to write to
+        :param period: expected frame period in seconds,
+                       see report
+        """
+        report = self.report(period)
+        summary = report._asdict()
+        summary['histogram'] = [
+            [None if bound == float('inf') else bound, count]
+            for bound, count in report.histogram
+        ]
+        data = {
+            'summary': summary,
+            'first_frame': self.first_frame,
+            'frames': {
+                'tick_times': self.tick_times[:self.count].tolist(),
+                'write_times': self.write_times[:self.count].tolist(),
+                'igt_deltas': self.igt_deltas[:self.count].tolist(),
+            },
+        }
+        with open(output_file, 'w') as outdata:
+            json.dump(data, outdata)
@@ -0,0 +1,173 @@
+"""
+Access the memory of a game process on Windows with the kernel32 API.
+
+Memory reads and writes are the innermost calls of the engine, so they
+avoid creating ctypes objects on each call: argument types are declared
+once, read buffers are reused for each size and bytes are passed to
+WriteProcessMemory without copying. read() has to return new bytes,
+the hooks' per frame reads use read_into with buffers from allocate
+which are passed to ReadProcessMemory as they are.
+"""
+import threading
+from ctypes import (
+    windll, WinDLL, POINTER, pointer, byref, Structure, sizeof, cast,
+    Array, c_char, c_size_t, create_string_buffer, get_last_error, WinError
+)
+from ctypes.wintypes import (
+    BOOL, BYTE, CHAR, DWORD, HANDLE, HMODULE, LPCVOID, LPVOID
+)
+
+from ds_tas.exceptions import GameNotRunningError
+from .hooks import ProcessMemory
+
+
+class MODULEENTRY32(Structure):
+    _fields_ = [("dwSize", DWORD),
+                ("th32ModuleID", DWORD),
+                ("th32ProcessID", DWORD),
+                ("GlblcntUsage", DWORD),
+                ("ProccntUsage", DWORD),
+                ("modBaseAddr", POINTER(BYTE)),
+                ("modBaseSize", DWORD),
+                ("hModule", HMODULE),
+                ("szModule", CHAR*256),
+                ("szExePath", CHAR*260)]
+
+
+# Private kernel32 instance so declaring argtypes doesn't affect
+# other users of windll.kernel32
+_kernel32 = WinDLL('kernel32', use_last_error=True)
+
+ReadProcessMemory = _kernel32.ReadProcessMemory
+ReadProcessMemory.argtypes = [
+    HANDLE, LPCVOID, LPVOID, c_size_t, POINTER(c_size_t)
+]
+ReadProcessMemory.restype = BOOL
+
+WriteProcessMemory = _kernel32.WriteProcessMemory
+WriteProcessMemory.argtypes = [
+    HANDLE, LPVOID, LPCVOID, c_size_t, POINTER(c_size_t)
+]
+WriteProcessMemory.restype = BOOL
+
+# Short aliases for kernel32 and user32 functions
+OpenProcess = windll.kernel32.OpenProcess
+CreateToolhelp32Snapshot = windll.kernel32.CreateToolhelp32Snapshot
+Module32First = windll.kernel32.Module32First
+Module32Next = windll.kernel32.Module32Next
+CloseHandle = windll.kernel32.CloseHandle
+TerminateProcess = windll.kernel32.TerminateProcess
+
+FindWindowW = windll.user32.FindWindowW
+GetWindowThreadProcessId = windll.user32.GetWindowThreadProcessId
+
+
+class Win32Process(ProcessMemory):
+    """
+    Read and write the memory of a game process found by its window name.
+    """
+    def __init__(self):
+        self.w_handle = None
+        self.process_id = None
+        self.handle = None
+
+        # Reused out parameter and read buffers, shared by every
+        # thread using the process so transfers are made under _lock
+        self._lock = threading.Lock()
+        self._transferred = c_size_t(0)
+        self._transferred_ref = byref(self._transferred)
+        self._scratch = {}
+
+    def open(self, window_name):
+        self.w_handle = FindWindowW(None, window_name)
+        # Error if game not found
+        if self.w_handle == 0:
+            raise GameNotRunningError(f"Could not find the {window_name} "
+                                      f"game window. "
+                                      f"Make sure the game is running.")
+
+        self.process_id = DWORD(0)
+        GetWindowThreadProcessId(self.w_handle, pointer(self.process_id))
+        # Open process with PROCESS_TERMINATE, PROCESS_VM_OPERATION,
+        # PROCESS_VM_READ and PROCESS_VM_WRITE access rights
+        flags = 0x1 | 0x8 | 0x10 | 0x20
+        self.handle = OpenProcess(flags, False, self.process_id)
+
+    def close(self):
+        if not (self.handle or self.w_handle):
+            return
+
+        handles = [self.handle, self.w_handle]
+        for handle in handles:
+            try:
+                # If the application is closed this will fail
+                CloseHandle(handle)
+            except OSError:
+                pass
+
+    def terminate(self):
+        return TerminateProcess(self.handle) != 0
+
+    def module_base(self, module_name):
+        lpszModuleName = module_name.encode("ascii")
+        # TH32CS_SNAPMODULE and TH32CS_SNAPMODULE32
+        hSnapshot = CreateToolhelp32Snapshot(0x8 | 0x10, self.process_id)
+        ModuleEntry32 = MODULEENTRY32()
+        ModuleEntry32.dwSize = sizeof(MODULEENTRY32)
+        if Module32First(hSnapshot, pointer(ModuleEntry32)):
+            while True:
+                if ModuleEntry32.szModule == lpszModuleName:
+                    dwModuleBaseAddress = ModuleEntry32.modBaseAddr
+                    break
+                if Module32Next(hSnapshot, pointer(ModuleEntry32)):
+                    continue
+                else:
+                    break
+        CloseHandle(hSnapshot)
+        return cast(dwModuleBaseAddress, LPVOID).value
+
+    def _scratch_buffer(self, length):
+        """
+        Get the reusable read buffer for a read size
+        """
+        try:
+            return self._scratch[length]
+        except KeyError:
+            buffer = self._scratch[length] = create_string_buffer(length)
+            return buffer
+
+    def read(self, address, length):
+        with self._lock:
+            buffer = self._scratch_buffer(length)
+            if not ReadProcessMemory(self.handle, address, buffer, length,
+                                     self._transferred_ref):
+                raise WinError(get_last_error())
+            return buffer.raw
+
+    def allocate(self, length):
+        return create_string_buffer(length)
+
+    def read_into(self, address, buffer):
+        with self._lock:
+            length = len(buffer)
+            if isinstance(buffer, Array):
+                # Buffers from allocate are passed as they are
+                target = buffer
+            else:
+                target = (c_char * length).from_buffer(buffer)
+            if not ReadProcessMemory(self.handle, address, target, length,
+                                     self._transferred_ref):
+                raise WinError(get_last_error())
+
+    def write(self, address, data):
+        with self._lock:
+            if isinstance(data, bytes):
+                # bytes are passed as a pointer to their data without copying
+                source = data
+            elif isinstance(data, memoryview) and data.readonly:
+                source = data.tobytes()
+            else:
+                source = (c_char * len(data)).from_buffer(data)
+            if not WriteProcessMemory(self.handle, address, source, len(data),
+                                      self._transferred_ref):
+                raise WinError(get_last_error())
@@ -0,0 +1,183 @@
+"""
+Conversion between controller states and the XINPUT_GAMEPAD structure.
+
+A controller state is a list of 20 integers in controller_keys order.
+The XINPUT_GAMEPAD structure is the 12 bytes the game reads the
+controller state from.
+"""
+import struct
+from array import array
+from collections.abc import Iterator
+from bisect import bisect_right
+from itertools import accumulate, repeat
+
+from ..controller import KeyPress, KeySequence, PackedKeySequence, iter_frames
+
+__all__ = [
+    'gamepad_struct',
+    'pack_state',
+    'unpack_state',
+    'CompiledInputs',
+    'compile_inputs',
+    'iter_packed',
+]
+
+# wButtons, bLeftTrigger, bRightTrigger,
+# sThumbLX, sThumbLY, sThumbRX, sThumbRY
+gamepad_struct = struct.Struct('<HBBhhhh')
+
+
+def pack_state(inputs):
+    """
+    Pack a controller state into XINPUT_GAMEPAD bytes.
+
+    :param inputs: list or tuple of 20 integers
+    :return: 12 bytes of gamepad state
+    """
+    buttons = 0
+    for n in range(0, 10):
+        buttons = buttons | (inputs[n] << n)
+    for n in range(12, 16):
+        buttons = buttons | (inputs[n-2] << n)
+    try:
+        return gamepad_struct.pack(buttons, *inputs[14:20])
+    except struct.error:
+        raise ValueError(f'Invalid Input: {inputs}')
+
+
+def unpack_state(data):
+    """
+    Unpack XINPUT_GAMEPAD bytes into a controller state.
+
+    :param data: 12 bytes of gamepad state
+    :return: list of 20 integers
+    """
+    buttons, *analog = gamepad_struct.unpack(data)
+    out = [(buttons >> n) & 1 for n in range(0, 10)]
+    out.extend((buttons >> n) & 1 for n in range(12, 16))
+    out.extend(analog)
+    return out
+
+
+class CompiledInputs:
+    """
+    Controller inputs converted to XINPUT_GAMEPAD bytes ahead of time.
+
+    Each run of identical frames is packed once: states holds each run's
+    12 bytes as a bytes object and run_frames the number of frames it is
+    held for. Iterating gives the bytes object for each frame, which can
+    be written to the game without copying or packing anything.
+
+    Compiled inputs can be run multiple times.
+
+    :param source: KeyPress, KeySequence, PackedKeySequence or iterable
+                   of lists of 20 integers
+    """
+    def __init__(self, source):
+        self.states = []
+        self.run_frames = array('I')
+
+        if isinstance(source, (KeyPress, KeySequence, PackedKeySequence)):
+            runs = source.iter_runs()
+        else:
+            runs = ((1, state) for state in iter_frames(source))
+
+        last_data = None
+        for frames, state in runs:
+            if frames <= 0:
+                continue
+            data = pack_state(state)
+            if data == last_data:
+                self.run_frames[-1] += frames
+            else:
+                self.states.append(data)
+                self.run_frames.append(frames)
+                last_data = data
+
+        self.framecount = sum(self.run_frames)
+        self._run_ends = None
+
+    def __repr__(self):
+        return (
+            f'<CompiledInputs: {len(self.run_frames)} runs, '
+            f'{self.framecount} frames>'
+        )
+
+    def __len__(self):
+        return len(self.run_frames)
+
+    def __iter__(self):
+        for data, frames in zip(self.states, self.run_frames):
+            yield from repeat(data, frames)
+
+    def iter_runs(self):
+        """
+        Iterate over the packed runs.
+
+        :return: iterator of (frames, gamepad bytes)
+        """
+        return zip(self.run_frames, self.states)
+
+    def iter_range(self, start=0, end=None):
+        """
+        Iterate over the frames from start up to end.
+
+        The run containing start is found with a binary search, so the
+        frames before it are not gone through.
+
+        :param start: first frame
+        :param end: frame to stop before, None for the end
+        :return: iterator of gamepad bytes
+        """
+        if end is None or end > self.framecount:
+            end = self.framecount
+        if start >= end:
+            return
+        if self._run_ends is None:
+            # ends[i] is the frame after the end of run i
+            self._run_ends = array('Q', accumulate(self.run_frames))
+        ends = self._run_ends
+        idx = bisect_right(ends, start)
+        frame = start
+        while frame < end:
+            run_end = min(ends[idx], end)
+            yield from repeat(self.states[idx], run_end - frame)
+            frame = run_end
+            idx += 1
+
+
+def compile_inputs(source):
+    """
+    Compile controller inputs to XINPUT_GAMEPAD bytes ahead of playback.
+
+    :param source: KeyPress, KeySequence, PackedKeySequence or iterable
+                   of lists of 20 integers
+    :return: CompiledInputs
+    """
+    return CompiledInputs(source)
+
+
+def is_replayable(source):
+    """
+    Check if inputs can be played more than once.
+
+    Iterators and generators are used up by playing them, any other
+    input accepted by TAS.run (including a single KeyPress) is not.
+
+    :param source: inputs given to run
+    :return: True if the inputs can be played again
+    """
+    return not isinstance(source, Iterator)
+
+
+def iter_packed(source):
+    """
+    Lazily pack each frame of a source as it is needed.
+
+    Used for sources such as generators that should not be
+    consumed before playback starts.
+
+    :param source: iterable of lists of 20 integers
+    :return: iterator of gamepad bytes
+    """
+    return map(pack_state, iter_frames(source))
@@ -13,4 +13,11 @@ class GameNotRunningError(DSTASException):
     """
     Run if there is an error that indicates
     Dark Souls is not running.
-    """
\ No newline at end of file
+    """
+
+
+class NullPointerError(DSTASException, RuntimeError):
+    """
+    Raised if a pointer chain in the game memory leads to 0,
+    usually while the game is loading or closing.
+    """
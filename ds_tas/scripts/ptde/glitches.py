@@ -140,8 +140,9 @@ def force_quit(tas_engine, delay_frames=0):
     :param tas_engine: Engine for force quit glitch
     :param delay_frames: additional frames to wait after IGT starts.
     """
-    igt, igt_frame = tas_engine.igt(), tas_engine.frame_count()
-    last_frame = tas_engine.frame_count()
+    state = tas_engine.snapshot('igt', 'frame_count')
+    igt, igt_frame = state['igt'], state['frame_count']
+    last_frame = igt_frame
 
     frame_wait = 0
 
@@ -149,7 +150,8 @@ def force_quit(tas_engine, delay_frames=0):
     igt_running = True
     while True:
         try:
-            new_igt, new_frame = tas_engine.igt(), tas_engine.frame_count()
+            state = tas_engine.snapshot('igt', 'frame_count')
+            new_igt, new_frame = state['igt'], state['frame_count']
             if new_igt and new_igt > igt:
                 if not igt_running:
                     if frame_wait == 0:
@@ -0,0 +1,292 @@
+"""
+Parameter sweeps for glitch scripts.
+
+Run a script with many different parameter values against the simulated
+game (see engine/simulated.py), score each run and rank the results.
+Candidates are run in parallel in separate processes.
+
+    >>> from ds_tas.scripts.ptde import glitches
+    >>> from ds_tas.scripts.sweep import Sweep, grid, input_accuracy
+    >>> sweep = Sweep(glitches.itemswap, input_accuracy,
+    ...               hook_options={'jitter': 0.2, 'seed': 1})
+    >>> results = sweep.run(grid(walk_time=[3, 4, 5], toggle=[1, 2], use=[1]))
+    >>> print(results)
+    >>> results.best.params
+
+The script factory and metric are sent to the worker processes so they
+must be functions defined at the top level of a module (not lambdas).
+On Windows the sweep must be started from under
+`if __name__ == '__main__':` in a script.
+
+Scores are memoised by the script, metric, hook options and parameters
+so running a sweep again only runs the new candidates. Give a
+cache_file to keep the scores between sessions.
+"""
+import io
+import itertools
+import json
+import os
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from ..engine.tas_engine import TAS
+from ..engine.scheduler import FrameScheduler
+from ..engine.simulated import SimulatedHook
+
+__all__ = [
+    'grid',
+    'random_candidates',
+    'Trial',
+    'SweepResult',
+    'SweepResults',
+    'Sweep',
+    'input_accuracy',
+]
+
+
+Trial = namedtuple('Trial', 'params sequence hook report')
+Trial.__doc__ = """
+A single run of a candidate given to the metric.
+
+params: dict of the parameters the script was called with
+sequence: the sequence the script returned
+hook: the SimulatedHook the sequence was run against
+report: TimingReport of the run
+"""
+
+SweepResult = namedtuple('SweepResult', 'params score framecount error')
+
+# Settings for a fast deterministic simulated game
+default_hook_options = {
+    'step': 0.0005,
+}
+
+
+def grid(**params):
+    """
+    Every combination of the parameter values.
+
+    eg: grid(walk_time=[3, 4], use=[1, 2]) gives 4 candidates
+
+    :param params: name=list of values
+    :return: list of parameter dicts
+    """
+    names = list(params)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(params[name] for name in names))
+    ]
+
+
+def random_candidates(count, seed=None, **params):
+    """
+    Random combinations of the parameter values.
+
+    :param count: number of candidates to make
+    :param seed: seed for the random choices
+    :param params: name=list (or range) of values to choose from
+    :return: list of parameter dicts
+    """
+    rng = random.Random(seed)
+    return [
+        {name: rng.choice(values) for name, values in params.items()}
+        for _ in range(count)
+    ]
+
+
+def input_accuracy(trial):
+    """
+    Fraction of the sequence's frames that the game saw as intended.
+
+    Useful with hook_options jitter to find inputs that hold up
+    when frames are not evenly timed.
+
+    :param trial: Trial
+    :return: score between 0 and 1
+    """
+    expected = trial.sequence.keylist
+    if not expected:
+        return 0.0
+    seen = trial.hook.frame_inputs()
+    written = trial.hook.written_inputs()
+    if not written:
+        return 0.0
+    # The game frames from the first input onwards
+    first_frame = written[0][0]
+    seen = seen[first_frame:first_frame + len(expected)]
+    matches = sum(1 for want, got in zip(expected, seen) if want == got)
+    return matches / len(expected)
+
+
+def _name(function):
+    return f'{function.__module__}.{function.__qualname__}'
+
+
+def _run_candidate(factory, metric, params, hook_options):
+    """
+    Run one candidate against a new simulated game and score it.
+
+    Runs in a worker process.
+
+    :return: SweepResult
+    """
+    try:
+        sequence = factory(**params)
+        hook = SimulatedHook(**hook_options)
+        tas = TAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+        with redirect_stdout(io.StringIO()):
+            report = tas.run(sequence, display=False, timing=True)
+        score = metric(Trial(params, sequence, hook, report))
+        return SweepResult(params, score, sequence.framecount, None)
+    except Exception as e:
+        return SweepResult(params, None, None, f'{type(e).__name__}: {e}')
+
+
+class SweepResults(list):
+    """
+    List of SweepResult ranked from best to worst score.
+
+    Candidates that raised an error are placed last.
+    """
+    @property
+    def best(self):
+        return self[0] if self else None
+
+    def __str__(self):
+        if not self:
+            return 'No results'
+        names = []
+        for result in self:
+            for name in result.params:
+                if name not in names:
+                    names.append(name)
+        header = ['rank', *names, 'score', 'frames']
+        rows = []
+        for rank, result in enumerate(self, 1):
+            if result.score is None:
+                score = result.error
+            else:
+                score = f'{result.score:g}'
+            rows.append([
+                str(rank),
+                *(str(result.params.get(name, '')) for name in names),
+                score,
+                str(result.framecount or ''),
+            ])
+        widths = [
+            max(len(row[col]) for row in [header, *rows])
+            for col in range(len(header))
+        ]
+        lines = [
+            '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+            for row in [header, *rows]
+        ]
+        return '\n'.join(line.rstrip() for line in lines)
+
+
+class Sweep:
+    """
+    Run a script with different parameters and rank them by a metric.
+
+    :param factory: function taking the parameters as keyword arguments
+                    and returning the sequence to run
+    :param metric: function taking a Trial and returning a score
+    :param hook_options: arguments for the SimulatedHook each candidate
+                         runs against (eg: framerate, jitter, seed)
+    :param maximize: True if higher scores are better
+    :param max_workers: number of worker processes, 0 to run the
+                        candidates in this process
+    :param cache_file: JSON file to keep the scores in between sweeps
+    """
+    def __init__(self, factory, metric, hook_options=None, maximize=True,
+                 max_workers=None, cache_file=None):
+        self.factory = factory
+        self.metric = metric
+        self.hook_options = dict(default_hook_options)
+        if hook_options:
+            self.hook_options.update(hook_options)
+        self.maximize = maximize
+        self.max_workers = max_workers
+        self.cache_file = cache_file
+        self.cache = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as indata:
+                self.cache = json.load(indata)
+
+    def _key(self, params):
+        return json.dumps(
+            [
+                _name(self.factory),
+                _name(self.metric),
+                self.hook_options,
+                params,
+            ],
+            sort_keys=True,
+            default=repr,
+        )
+
+    def run(self, candidates):
+        """
+        Score the candidates, running any that haven't been scored before.
+
+        :param candidates: list of parameter dicts (see grid and
+                           random_candidates)
+        :return: SweepResults
+        """
+        candidates = list(candidates)
+        keys = [self._key(params) for params in candidates]
+        todo = {}
+        for key, params in zip(keys, candidates):
+            if key not in self.cache and key not in todo:
+                todo[key] = params
+
+        fresh = {}
+        if todo:
+            args = (
+                [self.factory] * len(todo),
+                [self.metric] * len(todo),
+                list(todo.values()),
+                [self.hook_options] * len(todo),
+            )
+            if self.max_workers == 0:
+                fresh = dict(zip(todo, map(_run_candidate, *args)))
+            else:
+                with ProcessPoolExecutor(self.max_workers) as executor:
+                    results = executor.map(_run_candidate, *args)
+                    fresh = dict(zip(todo, results))
+            self._store(fresh)
+
+        results = []
+        for key, params in zip(keys, candidates):
+            if key in fresh:
+                results.append(fresh[key])
+            else:
+                score, framecount = self.cache[key]
+                results.append(SweepResult(params, score, framecount, None))
+        return self._rank(results)
+
+    def _store(self, results):
+        """
+        Memoise the scores of successful runs.
+
+        Candidates that raised an error are not stored so they are
+        tried again by the next sweep.
+        """
+        for key, result in results.items():
+            if result.error is None:
+                self.cache[key] = [result.score, result.framecount]
+        if self.cache_file:
+            with open(self.cache_file, 'w') as outdata:
+                json.dump(self.cache, outdata)
+
+    def _rank(self, results):
+        # Remove duplicate candidates keeping the first
+        unique = {}
+        for result in results:
+            unique.setdefault(self._key(result.params), result)
+        scored = [r for r in unique.values() if r.score is not None]
+        failed = [r for r in unique.values() if r.score is None]
+        scored.sort(key=lambda r: r.score, reverse=self.maximize)
+        return SweepResults(scored + failed)
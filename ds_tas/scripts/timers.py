@@ -32,16 +32,18 @@ def igt_vs_rta(tas_engine):
         estimated difference between igt and rta
     """
 
-    rta_start, igt_start = perf_counter(), tas_engine.igt()
-    frame_start = tas_engine.frame_count()
+    rta_start = perf_counter()
+    state = tas_engine.snapshot('igt', 'frame_count')
+    igt_start, frame_start = state['igt'], state['frame_count']
     print("Timer Started - Press Start and Select simultaneously to stop.")
     while True:
         keypress = tas_engine.keystate()
         if keypress.start and keypress.back:
             break
         sleep(0.002)
-    rta_end, igt_end = perf_counter(), tas_engine.igt()
-    frame_end = tas_engine.frame_count()
+    rta_end = perf_counter()
+    state = tas_engine.snapshot('igt', 'frame_count')
+    igt_end, frame_end = state['igt'], state['frame_count']
 
     rta_diff = (rta_end - rta_start) * 1000
     igt_diff = igt_end - igt_start
@@ -70,14 +72,16 @@ def force_quit(tas_engine):
         Frame when IGT stopped
         Final Frame
     """
-    igt, igt_frame = tas_engine.igt(), tas_engine.frame_count()
-    last_frame = tas_engine.frame_count()
+    state = tas_engine.snapshot('igt', 'frame_count')
+    igt, igt_frame = state['igt'], state['frame_count']
+    last_frame = igt_frame
 
     print("FQ Test started. Quit Dark souls or Ctrl-C to stop.")
     igt_running = True
     while True:
         try:
-            new_igt, new_frame = tas_engine.igt(), tas_engine.frame_count()
+            state = tas_engine.snapshot('igt', 'frame_count')
+            new_igt, new_frame = state['igt'], state['frame_count']
             if new_igt and new_igt > igt:
                 igt, igt_frame = new_igt, new_frame
                 if not igt_running:
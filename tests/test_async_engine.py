@@ -0,0 +1,76 @@
+import asyncio
+
+from ds_tas.basics import a, b, run, start, select
+from ds_tas.controller import KeySequence
+from ds_tas.engine.async_engine import AsyncTAS
+from ds_tas.engine.scheduler import FrameScheduler
+from ds_tas.engine.simulated import SimulatedHook
+from ds_tas.engine.supervisor import Supervisor
+
+
+def make_tas():
+    hook = SimulatedHook(step=0.0005)
+    return AsyncTAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+
+
+def run_async(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def written(tas):
+    return [state for _, state in tas.h.written_inputs()]
+
+
+def test_async_run():
+    seq = KeySequence([a * 5, b * 5, run * 5])
+    tas = make_tas()
+    report = run_async(tas.run(seq, display=False, timing=True, start_frame=5))
+    assert written(tas) == seq.keylist[5:]
+    assert report.frames == 10
+    assert tas.h.process.controller_enabled
+
+
+def test_async_run_cancelled():
+    tas = make_tas()
+
+    async def cancel_run():
+        task = asyncio.ensure_future(tas.run(a * 100000, display=False))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    run_async(cancel_run())
+    assert 0 < len(written(tas)) < 100000
+    # Control of the game was given back
+    assert tas.h.process.controller_enabled
+
+
+def test_async_supervised_run():
+    seq = KeySequence([a * 100, b * 100])
+    tas = make_tas()
+    hook = tas.h
+    write = hook.write_packed_input
+    crashed = []
+
+    def crash_once(data):
+        if tas.position == 150 and not crashed:
+            crashed.append(tas.position)
+            hook.process.terminate()
+        return write(data)
+    hook.write_packed_input = crash_once
+
+    supervisor = Supervisor(checkpoints=[100], backoff=0.001)
+    run_async(tas.run(seq, display=False, supervisor=supervisor))
+    assert [i.resume_frame for i in supervisor.interruptions] == [100]
+    assert written(tas) == seq.keylist[100:]
+
+
+def test_async_record():
+    tas = make_tas()
+    pad = KeySequence([a * 5, b * 5])
+    tas.h.process.play_pad(pad.keylist + [(start & select).state] * 2)
+    recording = run_async(tas.record(start_delay=0, button_wait=False))
+    assert recording.keylist[-10:] == pad.keylist
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from ds_tas.basics import a, b, run, wait, aim_up
+from ds_tas.controller import (
+    KeySequence, PackedKeySequence, read_recording_header,
+    recording_header, run_record,
+)
+
+
+def sample():
+    return KeySequence([a * 3, wait * 10, run & b, aim_up * 100000, a])
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lzma'])
+def test_bytes_round_trip(compression):
+    seq = sample()
+    data = seq.pack().to_bytes(framerate=60, compression=compression)
+    loaded = PackedKeySequence.from_bytes(data)
+    assert loaded.framecount == seq.framecount
+    assert loaded.to_sequence().keylist == seq.keylist
+
+
+def test_file_round_trip(tmp_path):
+    seq = sample()
+    path = str(tmp_path / 'seq.dstas')
+    seq.to_binary_file(path, framerate=60, compression='zlib')
+
+    header = read_recording_header(path)
+    assert header.version == 1
+    assert header.compression == 'zlib'
+    assert header.framerate == 60
+    assert header.runs == len(seq.pack())
+    assert header.frames == seq.framecount
+    assert KeySequence.from_file(path).keylist == seq.keylist
+
+
+def test_run_length_encoded():
+    data = PackedKeySequence([a * 100000]).to_bytes()
+    # A single run record whatever the number of frames
+    assert len(data) == recording_header.size + run_record.size
+    assert PackedKeySequence.from_bytes(data).framecount == 100000
+
+
+def test_json_still_loads(tmp_path):
+    seq = sample()[:3]
+    path = str(tmp_path / 'seq.json')
+    with open(path, 'w') as outdata:
+        json.dump(seq.keylist, outdata)
+    assert KeySequence.from_file(path).keylist == seq.keylist
+
+
+def test_truncated():
+    data = sample().pack().to_bytes()
+    with pytest.raises(ValueError, match='truncated'):
+        PackedKeySequence.from_bytes(data[:-5])
+    with pytest.raises(ValueError):
+        PackedKeySequence.from_bytes(data[:8])
+
+
+def test_bad_data():
+    data = bytearray(sample().pack().to_bytes())
+    with pytest.raises(ValueError, match='not a binary recording'):
+        PackedKeySequence.from_bytes(b'XXXXX' + bytes(data[5:]))
+
+    newer = bytearray(data)
+    newer[5] = 99
+    with pytest.raises(ValueError, match='not supported'):
+        PackedKeySequence.from_bytes(bytes(newer))
+
+    with pytest.raises(ValueError, match='compression'):
+        sample().pack().to_bytes(compression='gzip')
+
+
+def test_corrupt_frame_count():
+    data = bytearray(sample().pack().to_bytes())
+    # Change the frame count of the first run
+    data[recording_header.size] += 1
+    with pytest.raises(ValueError, match='corrupt'):
+        PackedKeySequence.from_bytes(bytes(data))
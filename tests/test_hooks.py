@@ -0,0 +1,175 @@
+import pytest
+
+from ds_tas.engine.hooks import MemoryField, PointerCache
+from ds_tas.engine.simulated import (
+    CONTROLLER_STATE, IGT_ADDRESS, SimulatedHook
+)
+
+# An address outside of the simulated game's memory
+UNMAPPED = 0x50000000
+
+
+def test_pointer_cache_hits_and_misses():
+    cache = PointerCache()
+    resolved = []
+
+    def resolver():
+        resolved.append(True)
+        return 0x1234
+
+    assert cache.get('igt', resolver) == 0x1234
+    assert cache.get('igt', resolver) == 0x1234
+    assert cache.get('igt', resolver) == 0x1234
+    assert len(resolved) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.reset_stats()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_pointer_cache_invalidate():
+    cache = PointerCache()
+    addresses = iter(range(100))
+    cache.get('igt', lambda: next(addresses))
+    cache.get('controller', lambda: next(addresses))
+
+    cache.invalidate('igt')
+    assert cache.get('igt', lambda: next(addresses)) == 2
+    assert cache.get('controller', lambda: next(addresses)) == 1
+
+    # Invalidating a name that isn't cached does nothing
+    cache.invalidate('frame_count')
+
+    cache.invalidate()
+    assert cache.get('igt', lambda: next(addresses)) == 3
+    assert cache.get('controller', lambda: next(addresses)) == 4
+
+
+def test_pointer_cache_failed_resolve():
+    cache = PointerCache()
+
+    def resolver():
+        raise OSError('Could not read the pointer')
+
+    with pytest.raises(OSError):
+        cache.get('igt', resolver)
+    assert cache.get('igt', lambda: 0x1234) == 0x1234
+
+
+def test_hook_reuses_pointers():
+    hook = SimulatedHook(step=0.0005)
+    hook.igt()
+    hook.frame_count()
+    hook.pointers.reset_stats()
+    for _ in range(10):
+        hook.igt()
+        hook.frame_count()
+    assert hook.pointers.misses == 0
+    assert hook.pointers.hits == 20
+
+
+def test_hook_resolves_again_after_failed_read():
+    hook = SimulatedHook(step=0.0005)
+    hook.igt()
+    hook.pointers.invalidate()
+    # A pointer cached before the game moved the value
+    hook.pointers.get('igt', lambda: UNMAPPED)
+    hook.pointers.reset_stats()
+
+    assert hook.igt() >= 0
+    assert hook.pointers.get('igt', lambda: UNMAPPED) == IGT_ADDRESS
+    assert hook.pointers.misses == 1
+
+
+def test_snapshot_resolves_again_after_failed_read():
+    hook = SimulatedHook(step=0.0005)
+    hook.pointers.get('igt', lambda: UNMAPPED)
+    state = hook.snapshot('igt', 'frame_count')
+    assert state['igt'] == hook.igt()
+    assert hook.pointers.get('igt', lambda: UNMAPPED) == IGT_ADDRESS
+
+
+def test_acquire_clears_pointers():
+    hook = SimulatedHook(step=0.0005)
+    hook.igt()
+    hook.frame_count()
+    hook.rehook()
+    hook.pointers.reset_stats()
+    hook.igt()
+    hook.frame_count()
+    assert hook.pointers.misses == 2
+
+
+def recorded_reads(hook):
+    """
+    Record the requests of each read_many call made by the hook
+    """
+    calls = []
+    read_many = hook.process.read_many
+
+    def recording(requests):
+        calls.append(list(requests))
+        return read_many(requests)
+
+    hook.process.read_many = recording
+    return calls
+
+
+def test_snapshot_values():
+    hook = SimulatedHook(step=0.0005)
+    state = hook.snapshot('igt', 'frame_count', 'controller',
+                          'packed_controller')
+    assert list(state) == ['igt', 'frame_count', 'controller',
+                           'packed_controller']
+    assert state['igt'] == int.from_bytes(
+        hook.process.image.read(IGT_ADDRESS, 4), 'little'
+    )
+    assert state['controller'] == hook.read_input()
+    assert state['packed_controller'] == hook.process.image.read(
+        CONTROLLER_STATE, 12
+    )
+
+
+def test_snapshot_groups_close_fields():
+    hook = SimulatedHook(step=0.0005)
+    calls = recorded_reads(hook)
+    hook.snapshot(
+        'igt', 'controller', 'packed_controller',
+        before=MemoryField(IGT_ADDRESS - 8, 4),
+        after=MemoryField(IGT_ADDRESS + 4, 2),
+    )
+    assert calls == [[
+        (CONTROLLER_STATE, 12),
+        (IGT_ADDRESS - 8, 14),
+    ]]
+
+
+def test_snapshot_gap():
+    hook = SimulatedHook(step=0.0005)
+    gap = hook.SNAPSHOT_GAP
+    calls = recorded_reads(hook)
+    hook.snapshot('igt', near=MemoryField(IGT_ADDRESS + 4 + gap, 4))
+    hook.snapshot('igt', far=MemoryField(IGT_ADDRESS + 5 + gap, 4))
+    assert calls == [
+        [(IGT_ADDRESS, gap + 8)],
+        [(IGT_ADDRESS, 4), (IGT_ADDRESS + 5 + gap, 4)],
+    ]
+
+
+def test_snapshot_extra_fields():
+    hook = SimulatedHook(step=0.0005)
+    hook.process.image.write(IGT_ADDRESS + 8, b'\xfe\xff')
+    state = hook.snapshot(
+        value=MemoryField(IGT_ADDRESS + 8, 2),
+        signed=MemoryField(
+            lambda: IGT_ADDRESS + 8, 2,
+            lambda data: int.from_bytes(data, 'little', signed=True)
+        ),
+    )
+    assert state == {'value': 0xfffe, 'signed': -2}
+
+
+def test_snapshot_unknown_field():
+    hook = SimulatedHook(step=0.0005)
+    with pytest.raises(ValueError):
+        hook.snapshot('igt', 'health')
@@ -0,0 +1,150 @@
+import sys
+
+import pytest
+
+from ds_tas.basics import a, b, wait
+from ds_tas.controller import (
+    KeySequence, PackedKeySequence, _Concat, _Repeat, _Runs
+)
+
+
+def expanded(seq):
+    """
+    Build the frames of a sequence one by one for comparison
+    """
+    return [list(state) for frames, state in seq.iter_runs()
+            for _ in range(frames)]
+
+
+def test_add_builds_tree_without_copying():
+    first = KeySequence([a, wait * 3])
+    second = KeySequence([b * 2])
+    joined = first + second
+    assert isinstance(joined._root, _Concat)
+    assert joined._root.left is first._root
+    assert joined._root.right is second._root
+    assert joined._index is None
+    assert joined.framecount == 6
+    assert joined.keylist == first.keylist + second.keylist
+
+    press_first = a + first
+    assert isinstance(press_first._root, _Concat)
+    assert press_first._root.left is a
+    assert press_first.framecount == 5
+
+
+def test_repeat_builds_tree_without_copying():
+    seq = KeySequence([a, wait * 2])
+    repeated = seq * 1000
+    assert isinstance(repeated._root, _Repeat)
+    assert repeated._root.part is seq._root
+    assert repeated._root.count == 1000
+    assert repeated.framecount == 3000
+    assert repeated._index is None
+    assert expanded(repeated) == expanded(seq) * 1000
+    assert (3 * seq).keylist == (seq * 3).keylist
+    assert (seq * 0).framecount == 0
+    assert (seq * 1)._root is seq._root
+
+
+def test_condensed_when_needed():
+    seq = KeySequence([a * 2]) + KeySequence([a * 3, wait])
+    assert seq._index is None
+    assert len(seq) == 2
+    assert seq[0] == a * 5
+    assert list(seq.iter_runs()) == [(5, a.state), (1, wait.state)]
+
+
+def test_deep_tree_does_not_recurse():
+    seq = KeySequence()
+    for _ in range(sys.getrecursionlimit() * 2):
+        seq = seq + a + wait
+    assert seq.framecount == sys.getrecursionlimit() * 4
+    assert len(seq) == sys.getrecursionlimit() * 4
+
+
+def test_append_keeps_index_up_to_date():
+    seq = KeySequence([a * 2])
+    seq.condense()
+    index = seq._index
+    seq.append(a * 3)
+    seq.append(KeySequence([wait, b]) * 2)
+    assert seq._index is index
+    assert seq.framecount == 9
+    assert list(seq.iter_runs()) == [
+        (5, a.state), (1, wait.state), (1, b.state),
+        (1, wait.state), (1, b.state),
+    ]
+    rebuilt = KeySequence([a * 5, wait, b, wait, b])
+    assert seq._runs() == rebuilt._runs()
+
+
+def test_packed_sequences():
+    packed = PackedKeySequence([a * 2, wait * 3])
+    seq = KeySequence([a]) + packed
+    assert isinstance(seq._root.right, _Runs)
+    assert seq._root.right.condensed
+    assert seq.framecount == 6
+    assert list(seq.iter_runs()) == [(3, a.state), (3, wait.state)]
+
+    seq.append(packed)
+    assert seq.framecount == 11
+    assert seq.pack() == PackedKeySequence([a * 3, wait * 3, a * 2, wait * 3])
+    assert (packed + seq).framecount == 16
+    assert seq.pack().to_sequence().keylist == seq.keylist
+
+
+def test_setitem_rebuilds():
+    seq = KeySequence([a, wait]) * 2
+    seq[1] = b * 4
+    assert list(seq.iter_runs()) == [
+        (1, a.state), (4, b.state), (1, a.state), (1, wait.state),
+    ]
+    assert seq.framecount == 7
+
+
+def test_frames_index():
+    seq = KeySequence([a * 3, wait * 2]) * 2 + b
+    keylist = seq.keylist
+    assert len(seq.frames) == len(keylist) == 11
+    for frame, state in enumerate(keylist):
+        press = seq.frames[frame]
+        assert press.frames == 1
+        assert list(press.state) == state
+    assert seq.frames[-1] == b
+    assert seq.frames[-11] == a
+    assert seq.locate(4) == (1, 1)
+
+
+def test_frames_out_of_range():
+    seq = KeySequence([a * 3, wait * 2])
+    with pytest.raises(IndexError):
+        seq.frames[5]
+    with pytest.raises(IndexError):
+        seq.frames[-6]
+    with pytest.raises(IndexError):
+        KeySequence().frames[0]
+    with pytest.raises(ValueError):
+        seq.frames[::2]
+
+
+@pytest.mark.parametrize('start, stop', [
+    (0, 11), (1, 10), (2, 3), (3, 5), (4, 9), (5, 5), (-4, None),
+    (None, -2), (8, 100), (-100, 2),
+])
+def test_frames_slice(start, stop):
+    seq = KeySequence([a * 3, wait * 2]) * 2 + b
+    sliced = seq.frames[start:stop]
+    assert isinstance(sliced, KeySequence)
+    assert sliced.keylist == seq.keylist[start:stop]
+    assert sliced.framecount == len(seq.keylist[start:stop])
+
+
+def test_frames_after_append():
+    seq = KeySequence([a * 1000])
+    assert seq.frames[999] == a
+    seq.append(wait * 1000)
+    assert seq.frames[1000] == wait
+    assert seq.frames[500:1500].keylist == (
+        [list(a.state)] * 500 + [list(wait.state)] * 500
+    )
@@ -0,0 +1,79 @@
+import copy
+import pickle
+
+import pytest
+
+from ds_tas.basics import a, b, run, wait
+from ds_tas.controller import KeyPress
+
+
+def test_immutable():
+    press = KeyPress(a=1)
+    with pytest.raises(AttributeError):
+        press.a = 0
+    with pytest.raises(AttributeError):
+        press.frames = 5
+    with pytest.raises(AttributeError):
+        press.other = 1
+
+
+def test_operators_return_new_presses():
+    held = a * 5
+    assert held is not a
+    assert a.frames == 1
+    assert held.frames == 5
+    assert a * 1 is a
+    combined = run & b
+    assert (combined.b, combined.l_thumb_y) == (1, run.l_thumb_y)
+    assert run.b == 0
+
+
+def test_equality_and_hash():
+    assert KeyPress(3, a=1) == KeyPress(3, a=1)
+    assert hash(KeyPress(3, a=1)) == hash(KeyPress(3, a=1))
+    assert KeyPress(3, a=1) != KeyPress(2, a=1)
+    assert KeyPress(3, a=1) != KeyPress(3, b=1)
+    assert KeyPress(a=1) != [0] * 10 + [1] + [0] * 9
+    # Presses with no frames have no inputs
+    assert KeyPress(0, a=1) == KeyPress(0, b=1)
+    assert len({KeyPress(2, a=1), a * 2, b * 2}) == 2
+
+
+def test_interned_basics():
+    assert KeyPress.from_list(a.state) is a
+    assert KeyPress(a=1) == a
+    # Longer presses share the interned state
+    assert KeyPress.from_list(a.state, 10).state is a.state
+    assert (a * 10).key is a.key
+
+
+def test_intern():
+    state = [0] * 16 + [123, -456, 0, 0]
+    first = KeyPress.from_list(state, 4)
+    interned = first.intern()
+    assert interned.frames == 1
+    assert interned == first.with_frames(1)
+    assert KeyPress.from_list(state) is interned
+    assert KeyPress.from_list(state, 4).state is interned.state
+    assert first.intern() is interned
+
+
+def test_with_frames():
+    assert a.with_frames(1) is a
+    assert a.with_frames(7) == a * 7
+
+
+def test_invalid_state():
+    with pytest.raises(ValueError):
+        KeyPress(l_thumb_x=40000)
+    with pytest.raises(ValueError):
+        KeyPress.from_list([256] * 20)
+
+
+def test_copy_and_pickle():
+    press = run * 30
+    assert copy.copy(press) is press
+    assert copy.deepcopy(press) is press
+    loaded = pickle.loads(pickle.dumps(press))
+    assert loaded == press
+    assert pickle.loads(pickle.dumps(wait)) is wait
@@ -0,0 +1,142 @@
+import errno
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+if not sys.platform.startswith('linux'):
+    pytest.skip('LinuxProcess needs Linux', allow_module_level=True)
+
+from ds_tas.engine.linux import LinuxProcess, find_process  # noqa: E402
+from ds_tas.exceptions import GameNotRunningError  # noqa: E402
+
+DATA = b'ds_tas test data'
+
+# Stands in for the game: holds a buffer and prints its address
+CHILD = textwrap.dedent('''
+    import ctypes
+    import sys
+    buffer = ctypes.create_string_buffer({data!r}, 64)
+    print(ctypes.addressof(buffer), flush=True)
+    sys.stdin.readline()
+''').format(data=DATA)
+
+
+@pytest.fixture
+def game(tmp_path):
+    """
+    Start a child process to read and write
+
+    :return: (child process, address of its buffer)
+    """
+    # Named like a windows executable, as the game is under Wine
+    script = tmp_path / f'game_{os.getpid()}.exe'
+    script.write_text(CHILD)
+    child = subprocess.Popen(
+        [sys.executable, str(script)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    try:
+        address = int(child.stdout.readline())
+        yield child, address
+    finally:
+        child.kill()
+        child.wait()
+        child.stdin.close()
+        child.stdout.close()
+
+
+@pytest.fixture
+def process(game):
+    child, address = game
+    process = LinuxProcess(child.pid)
+    try:
+        process.read(address, 1)
+    except OSError as e:
+        if e.errno == errno.EPERM:
+            pytest.skip('Not permitted to read other processes')
+        raise
+    return process
+
+
+def test_read(game, process):
+    _, address = game
+    assert process.read(address, len(DATA)) == DATA
+    assert process.read(address + 3, 6) == DATA[3:9]
+
+
+def test_read_into(game, process):
+    _, address = game
+    buffer = process.allocate(len(DATA))
+    process.read_into(address, buffer)
+    assert buffer.raw == DATA
+
+    array = bytearray(6)
+    process.read_into(address + 3, array)
+    assert array == DATA[3:9]
+
+    view = memoryview(bytearray(10))
+    process.read_into(address, view[2:8])
+    assert view.tobytes() == b'\0\0' + DATA[:6] + b'\0\0'
+
+
+def test_read_many(game, process):
+    _, address = game
+    assert process.read_many([
+        (address, 2), (address + 7, 4), (address, 16)
+    ]) == [DATA[:2], DATA[7:11], DATA]
+
+
+def test_write(game, process):
+    _, address = game
+    process.write(address, b'DS')
+    process.write(address + 2, bytearray(b'__'))
+    process.write(address + 4, memoryview(b'TAS'))
+    assert process.read(address, 8) == b'DS__TAS' + DATA[7:8]
+
+
+def test_bad_address(process):
+    for access in (
+        lambda: process.read(0, 4),
+        lambda: process.read_into(0, process.allocate(4)),
+        lambda: process.read_into(0, bytearray(4)),
+        lambda: process.read_many([(0, 4)]),
+        lambda: process.write(0, b'\0'),
+    ):
+        with pytest.raises(OSError) as excinfo:
+            access()
+        assert excinfo.value.errno == errno.EFAULT
+
+
+def test_find_process(game):
+    child, _ = game
+    assert find_process(f'GAME_{os.getpid()}.EXE') == child.pid
+    assert find_process(f'missing_{os.getpid()}.exe') is None
+
+    process = LinuxProcess(process_name=f'game_{os.getpid()}.exe')
+    process.open('game')
+    assert process.pid == child.pid
+
+
+def test_open_missing_process():
+    process = LinuxProcess(process_name=f'missing_{os.getpid()}.exe')
+    with pytest.raises(GameNotRunningError):
+        process.open('game')
+
+
+def test_module_base(process):
+    executable = os.path.basename(os.path.realpath(sys.executable))
+    base = process.module_base(executable.upper())
+    assert process.read(base, 4) == b'\x7fELF'
+    with pytest.raises(OSError):
+        process.module_base('XINPUT1_3.dll')
+
+
+def test_terminate(game, process):
+    child, _ = game
+    assert process.terminate()
+    child.wait()
+    assert child.returncode == -signal.SIGKILL
@@ -0,0 +1,30 @@
+import pytest
+
+from ds_tas.basics import a, b, run
+from ds_tas.controller import KeySequence
+from ds_tas.engine.multi import MultiTAS
+from ds_tas.engine.simulated import SimulatedHook
+
+
+def test_multi_keypress():
+    hooks = [SimulatedHook(step=0.0005), SimulatedHook(step=0.0005)]
+    results = MultiTAS(hooks).run(a * 3)
+    assert not results.failed
+    for hook in hooks:
+        assert [s for _, s in hook.written_inputs()] == (a * 3).keylist
+
+
+def test_multi_iterator_rejected():
+    with pytest.raises(TypeError):
+        MultiTAS(['simulated'] * 2).run(iter((a * 3).keylist))
+
+
+def test_multi_frame_range():
+    seq = KeySequence([a * 10, b * 10, run * 10])
+    hooks = [SimulatedHook(step=0.0005), SimulatedHook(step=0.0005)]
+    results = MultiTAS(hooks).run(seq, start_frame=5, end_frame=15)
+    for hook in hooks:
+        assert [s for _, s in hook.written_inputs()] == seq.keylist[5:15]
+    for result in results.values():
+        assert result.frames == 10
+        assert result.report.frames == 10
@@ -0,0 +1,55 @@
+from ds_tas.basics import a, b, start, select, wait
+from ds_tas.controller import KeySequence
+from ds_tas.engine.recorder import FrameBuffer, Recorder
+from ds_tas.engine.scheduler import FrameScheduler
+from ds_tas.engine.simulated import SimulatedHook
+from ds_tas.exceptions import NullPointerError
+
+
+def make_recorder(hook):
+    return Recorder(hook, scheduler=FrameScheduler(poll_interval=0))
+
+
+def test_record_pad():
+    hook = SimulatedHook(step=0.002)
+    pad = KeySequence([a * 5, b * 5, wait * 5])
+    hook.process.play_pad(pad.keylist + [(start & select).state] * 2)
+    recorder = make_recorder(hook).start()
+    assert recorder.wait(5)
+    assert recorder.error is None
+    recorded = recorder.to_sequence().keylist
+    # Recording starts part way through the first frame the pad is read
+    assert recorded[-10:] == pad.keylist[-10:]
+    assert recorder.missed_frames() == []
+
+
+def test_null_pointer_stops_recorder():
+    hook = SimulatedHook(step=0.002)
+
+    def loading(*fields):
+        raise NullPointerError("Couldn't find the pointer to IGT")
+    hook.snapshot = loading
+
+    recorder = make_recorder(hook).start()
+    assert recorder.wait(5)
+    assert isinstance(recorder.error, NullPointerError)
+
+
+def test_missed_frames_uses_hook_framerate():
+    hook = SimulatedHook(framerate=60, step=0.002)
+    recorder = make_recorder(hook)
+    # Consistent 33ms frames would be taken as the period from the median
+    for delta in (0, 33, 33, 33, 17):
+        recorder.buffer.append(bytes(12), delta)
+    assert recorder.missed_frames() == [(1, 1), (2, 1), (3, 1)]
+    assert recorder.missed_frames(1 / 30) == []
+
+
+def test_frame_buffer_ring():
+    buffer = FrameBuffer(capacity=2, max_frames=3)
+    for value in range(5):
+        buffer.append(bytes([value]) * 12, value)
+    assert len(buffer) == 3
+    assert buffer.dropped == 2
+    assert list(buffer.ordered_deltas()) == [2, 3, 4]
+    assert buffer.igt_jumps(0.001) == [(1, 2), (2, 3)]
@@ -0,0 +1,94 @@
+from ds_tas.basics import a, b, run, wait
+from ds_tas.controller import (
+    KeySequence, PackedKeySequence, RecordingStream, read_recording_header,
+    recording_header, run_record, stream_chunk,
+)
+
+
+def sample():
+    return KeySequence([a * 3, wait * 10, run * 500, b, a * 2])
+
+
+def write_stream(path, seq, **options):
+    stream = RecordingStream(path, **options)
+    for state in seq.keylist:
+        stream.append(state)
+    return stream
+
+
+def read(path):
+    with open(path, 'rb') as indata:
+        return indata.read()
+
+
+def test_stream_round_trip(tmp_path):
+    seq = sample()
+    path = str(tmp_path / 'stream.dstas')
+    with write_stream(path, seq, framerate=60, chunk_runs=2) as stream:
+        pass
+    assert stream.closed
+
+    header = read_recording_header(path)
+    assert header.version == 2
+    assert header.framerate == 60
+    assert header.frames == seq.framecount
+    assert KeySequence.from_file(path).keylist == seq.keylist
+
+
+def test_stream_readable_while_writing(tmp_path):
+    seq = sample()
+    path = str(tmp_path / 'stream.dstas')
+    stream = write_stream(path, seq, chunk_runs=2, flush_frames=100)
+    # Every complete chunk can be read before the stream is closed
+    partial = KeySequence.from_file(path).keylist
+    assert 0 < len(partial) < seq.framecount
+    assert partial == seq.keylist[:len(partial)]
+
+    stream.close()
+    assert KeySequence.from_file(path).keylist == seq.keylist
+
+
+def test_truncated_stream(tmp_path):
+    seq = sample()
+    path = str(tmp_path / 'stream.dstas')
+    write_stream(path, seq, chunk_runs=1).close()
+    data = read(path)
+    first_chunk = stream_chunk.size + run_record.size
+    expected = seq.keylist[:3]
+
+    # Cut off part way through the second chunk
+    cut = recording_header.size + first_chunk + 10
+    loaded = PackedKeySequence.from_bytes(data[:cut])
+    assert loaded.to_sequence().keylist == expected
+
+    # Cut off part way through a chunk header
+    cut = recording_header.size + first_chunk + 4
+    loaded = PackedKeySequence.from_bytes(data[:cut])
+    assert loaded.to_sequence().keylist == expected
+
+
+def test_bad_crc(tmp_path):
+    seq = sample()
+    path = str(tmp_path / 'stream.dstas')
+    write_stream(path, seq, chunk_runs=1).close()
+    data = bytearray(read(path))
+
+    # Damage a state in the second chunk
+    second = recording_header.size + stream_chunk.size + run_record.size
+    state = second + stream_chunk.size + 4
+    data[state] ^= 0xFF
+
+    # Loading stops at the damaged chunk
+    loaded = PackedKeySequence.from_bytes(bytes(data))
+    assert loaded.to_sequence().keylist == seq.keylist[:3]
+
+
+def test_runs_continued_across_chunks(tmp_path):
+    path = str(tmp_path / 'stream.dstas')
+    with RecordingStream(path, flush_frames=10) as stream:
+        for _ in range(25):
+            stream.append(a.state)
+    loaded = PackedKeySequence.from_file(path)
+    # Flushing splits the run between chunks, loading merges it again
+    assert len(loaded) == 1
+    assert loaded.framecount == 25
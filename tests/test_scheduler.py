@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from ds_tas.basics import a, b, run, x
+from ds_tas.controller import KeySequence
+from ds_tas.engine import TAS
+from ds_tas.engine import scheduler
+from ds_tas.engine.scheduler import AdaptiveScheduler
+from ds_tas.engine.simulated import SimulatedHook, SimulatedProcess
+
+
+@pytest.fixture
+def oversleeps(monkeypatch):
+    """
+    Record how much longer than asked each of the scheduler's sleeps took
+    """
+    overruns = []
+
+    def timed_sleep(delay):
+        start = time.perf_counter()
+        time.sleep(delay)
+        overruns.append(time.perf_counter() - start - delay)
+
+    monkeypatch.setattr(scheduler, 'sleep', timed_sleep)
+    return overruns
+
+
+def check_played(hook, seq, oversleeps):
+    """
+    Check the game used every input of the sequence on its own frame.
+
+    These tests run against the clock, if the OS slept for a whole frame
+    longer than asked no scheduler could have kept up.
+    """
+    frames = hook.frame_inputs()
+    start = frames.index(seq.keylist[0])
+    played = frames[start:start + seq.framecount]
+    if played != seq.keylist and max(oversleeps, default=0) > 1 / 60:
+        pytest.skip('The OS overslept by more than a frame')
+    assert played == seq.keylist
+
+
+@pytest.mark.parametrize('jitter', [0, 0.1])
+def test_adaptive_scheduler_60fps(jitter, oversleeps):
+    seq = KeySequence([a, b, run, x] * 15)
+    hook = SimulatedHook(framerate=60, jitter=jitter, seed=1)
+    tas = TAS(hook=hook, scheduler=AdaptiveScheduler())
+    tas.run(seq, display=False)
+    check_played(hook, seq, oversleeps)
+    assert tas.scheduler.period == pytest.approx(1 / 60, rel=0.1)
+
+
+def test_adaptive_scheduler_corrects_period(oversleeps):
+    seq = KeySequence([a, b, run, x] * 15)
+    hook = SimulatedHook(process=SimulatedProcess(framerate=60))
+    # The hook reports the wrong framerate
+    hook.framerate = 30
+    tas = TAS(hook=hook, scheduler=AdaptiveScheduler())
+    tas.run(seq, display=False)
+    check_played(hook, seq, oversleeps)
+    assert tas.scheduler.period == pytest.approx(1 / 60, rel=0.1)
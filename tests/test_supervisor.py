@@ -0,0 +1,57 @@
+import pytest
+
+from ds_tas.basics import a, b, run
+from ds_tas.controller import KeySequence
+from ds_tas.engine import TAS
+from ds_tas.engine.scheduler import FrameScheduler
+from ds_tas.engine.simulated import SimulatedHook
+from ds_tas.engine.supervisor import Supervisor
+
+
+def make_tas():
+    hook = SimulatedHook(step=0.0005)
+    return TAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+
+
+def written(tas):
+    return [state for _, state in tas.h.written_inputs()]
+
+
+def test_supervised_keypress():
+    tas = make_tas()
+    tas.run(a * 5, display=False, supervisor=True)
+    assert written(tas) == (a * 5).keylist
+
+
+def test_supervised_iterator_rejected():
+    tas = make_tas()
+    with pytest.raises(TypeError):
+        tas.run(iter((a * 5).keylist), display=False, supervisor=True)
+
+
+def test_resume_from_checkpoint():
+    seq = KeySequence([a * 100, b * 100, run * 100])
+    tas = make_tas()
+    hook = tas.h
+    write = hook.write_packed_input
+    crashed = []
+
+    def crash_once(data):
+        if tas.position == 150 and not crashed:
+            crashed.append(tas.position)
+            hook.process.terminate()
+        return write(data)
+    hook.write_packed_input = crash_once
+
+    resumed = []
+    supervisor = Supervisor(
+        checkpoints=[0, 100, 200],
+        backoff=0.001,
+        on_resume=lambda engine, frame: resumed.append(frame),
+    )
+    tas.run(seq, display=False, supervisor=supervisor)
+
+    assert resumed == [100]
+    assert [i.frame for i in supervisor.interruptions] == [150]
+    # The restarted game saw the sequence from the checkpoint
+    assert written(tas) == seq.keylist[100:]
@@ -0,0 +1,55 @@
+from ds_tas.basics import a, b, run, start, select
+from ds_tas.controller import KeySequence, read_recording_header
+from ds_tas.engine import TAS
+from ds_tas.engine.scheduler import FrameScheduler
+from ds_tas.engine.simulated import SimulatedHook
+from ds_tas.engine.xinput import compile_inputs
+
+
+def make_tas():
+    hook = SimulatedHook(step=0.0005)
+    return TAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+
+
+def written(tas):
+    return [state for _, state in tas.h.written_inputs()]
+
+
+def test_run_frame_range():
+    seq = KeySequence([a * 10, b * 10, run * 10])
+    tas = make_tas()
+    report = tas.run(seq, display=False, timing=True,
+                     start_frame=5, end_frame=15)
+    assert written(tas) == seq.keylist[5:15]
+    assert report.frames == 10
+    assert tas.position == 15
+    assert len(tas.last_timing.tick_times) == 10
+
+
+def test_run_compiled_from_frame():
+    seq = KeySequence([a * 10, b * 10])
+    tas = make_tas()
+    tas.run(compile_inputs(seq), display=False, start_frame=12)
+    assert written(tas) == seq.keylist[12:]
+
+
+def test_timings_capacity():
+    seq = KeySequence([a * 10, b * 10])
+    assert TAS._timings_capacity(seq) == 20
+    assert TAS._timings_capacity(seq, 5) == 15
+    assert TAS._timings_capacity(seq, 5, 8) == 3
+    assert TAS._timings_capacity(seq, 5, 100) == 15
+    assert TAS._timings_capacity(a * 7, 2) == 5
+    assert TAS._timings_capacity(iter(seq.keylist), 5) == 4096
+
+
+def test_record_stream_framerate(tmp_path):
+    hook = SimulatedHook(framerate=60, step=0.0005)
+    tas = TAS(hook=hook, scheduler=FrameScheduler(poll_interval=0))
+    pad = KeySequence([a * 5, b * 5])
+    hook.process.play_pad(pad.keylist + [(start & select).state] * 2)
+    path = str(tmp_path / 'recording.dstas')
+    recording = tas.record(start_delay=0, button_wait=False, stream_to=path)
+
+    assert read_recording_header(path).framerate == 60
+    assert KeySequence.from_file(path).keylist == recording.keylist